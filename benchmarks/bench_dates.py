@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of timestamp and date validation.
+
+Validates log like sequences of string timestamps and dates, with and without
+date formats.
+
+Usage:
+
+    python benchmarks/bench_dates.py [--items N] [--repeat N]
+"""
+
+# python std lib
+import argparse
+import datetime
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pykwalify imports
+from pykwalify.core import CompiledSchema  # NOQA: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    start = datetime.datetime(2021, 1, 1)
+    times = [start + datetime.timedelta(seconds=37 * i) for i in range(args.items)]
+
+    cases = [
+        ("timestamp iso", {"type": "timestamp"}, [t.isoformat() + "Z" for t in times]),
+        ("timestamp other", {"type": "timestamp"}, [t.strftime("%d %b %Y %H:%M:%S") for t in times]),
+        ("date iso", {"type": "date"}, [t.date().isoformat() for t in times]),
+        ("date formats", {"type": "date", "format": ["%Y-%m-%d", "%d/%m/%Y"]}, [t.strftime("%d/%m/%Y") for t in times]),
+    ]
+
+    for name, rule, data in cases:
+        schema = CompiledSchema(schema_data={"type": "seq", "sequence": [rule]})
+        assert list(schema.iter_errors(data)) == []
+
+        elapsed = min(timeit.repeat(lambda: list(schema.iter_errors(data)), number=1, repeat=args.repeat))
+        print("{0:<16} {1} values: {2:8.3f} s, {3:6.2f} us per value".format(name, len(data), elapsed, elapsed / len(data) * 1000000))
+
+
+if __name__ == "__main__":
+    main()
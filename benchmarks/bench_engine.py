@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of the per-node overhead of the validation engine.
+
+Validates one deep and one wide document against a compiled schema and
+prints the time spent per validated node.
+
+Usage:
+
+    python benchmarks/bench_engine.py [--repeat N]
+"""
+
+# python std lib
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pykwalify imports
+from pykwalify.core import CompiledSchema  # NOQA: E402
+
+
+def count_nodes(data):
+    if isinstance(data, dict):
+        return 1 + sum(count_nodes(v) for v in data.values())
+    if isinstance(data, list):
+        return 1 + sum(count_nodes(v) for v in data)
+    return 1
+
+
+def deep_case(depth=200):
+    """
+    A chain of nested maps where each level holds a few scalars and the next level.
+    """
+    schema = {"schema;level": {
+        "type": "map",
+        "mapping": {
+            "name": {"type": "str", "required": True},
+            "weight": {"type": "int", "range": {"min": 0}},
+            "ratio": {"type": "float"},
+            "next": {"include": "level"},
+        },
+    }, "include": "level"}
+
+    data = {"name": "leaf", "weight": 1, "ratio": 0.5}
+    for i in range(depth):
+        data = {"name": "level{0}".format(i), "weight": i, "ratio": 0.5, "next": data}
+
+    return schema, data
+
+
+def wide_case(items=5000):
+    """
+    A long sequence of flat maps with typical scalar constraints.
+    """
+    schema = {
+        "type": "seq",
+        "sequence": [{
+            "type": "map",
+            "mapping": {
+                "id": {"type": "int", "required": True},
+                "name": {"type": "str", "pattern": "^item[0-9]+$"},
+                "price": {"type": "float", "range": {"min": 0}},
+                "enabled": {"type": "bool"},
+                "tags": {"type": "seq", "sequence": [{"type": "str"}]},
+            },
+        }],
+    }
+
+    data = [
+        {"id": i, "name": "item{0}".format(i), "price": i * 1.5, "enabled": i % 2 == 0, "tags": ["a", "b"]}
+        for i in range(items)
+    ]
+
+    return schema, data
+
+
+def run(name, schema_data, data, repeat):
+    schema = CompiledSchema(schema_data=schema_data)
+    nodes = count_nodes(data)
+    best = min(timeit.repeat(lambda: schema.validate(data), number=1, repeat=repeat))
+    print("{0:<6} nodes: {1:>7}  total: {2:>8.2f} ms  per node: {3:>6.2f} us".format(
+        name, nodes, best * 1000, best / nodes * 1000000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(10000)
+
+    run("deep", *deep_case(), repeat=args.repeat)
+    run("wide", *wide_case(), repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of enum lookups with large enums.
+
+Validates a list of sku codes against a enum of increasing size. Every
+value is taken from the end of the enum so a linear scan is the worst case.
+
+Usage:
+
+    python benchmarks/bench_enum.py [--values N]
+"""
+
+# python std lib
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pykwalify imports
+from pykwalify.core import CompiledSchema  # NOQA: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--values", type=int, default=100000)
+    args = parser.parse_args()
+
+    for size in (10, 100, 1000, 10000):
+        enum = ["sku-{0}".format(i) for i in range(size)]
+        schema = CompiledSchema(schema_data={"type": "seq", "sequence": [{"type": "str", "enum": enum}]})
+        data = [enum[-1 - (i % 10)] for i in range(args.values)]
+
+        start = time.time()
+        errors = list(schema.iter_errors(data))
+        total = time.time() - start
+
+        assert errors == [], errors
+        print("enum size {0:>6}: {1:8.2f} ms, {2:6.3f} us/value".format(size, total * 1000, total * 1e6 / args.values))
+
+
+if __name__ == "__main__":
+    main()
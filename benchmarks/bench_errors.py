@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of documents with a very large number of errors.
+
+Validates a sequence where every item has two errors and measures the time
+and peak memory to collect the error entries and to render their messages.
+
+Usage:
+
+    python benchmarks/bench_errors.py [--items N]
+"""
+
+# python std lib
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pykwalify imports
+from pykwalify.core import CompiledSchema  # NOQA: E402
+
+SCHEMA = {
+    "type": "seq",
+    "sequence": [{
+        "type": "map",
+        "mapping": {
+            "id": {"type": "int", "required": True},
+            "name": {"type": "str", "pattern": "^[a-z]+$"},
+        },
+    }],
+}
+
+
+def measure(func):
+    start = time.time()
+    result = func()
+    elapsed = time.time() - start
+    del result
+
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=250000)
+    args = parser.parse_args()
+
+    schema = CompiledSchema(schema_data=SCHEMA)
+    data = [{"id": "x", "name": "Foo"} for i in range(args.items)]
+
+    cases = [
+        ("collect", lambda: list(schema.iter_errors(data))),
+        ("render", lambda: [str(e) for e in schema.iter_errors(data)]),
+    ]
+
+    print("{0} items, {1} errors".format(args.items, args.items * 2))
+
+    for name, func in cases:
+        elapsed, peak = measure(func)
+        print("    {0:<8} {1:8.3f} s, peak traced memory {2:8.1f} MiB".format(name, elapsed, peak / 1024 / 1024))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of is_valid() and max_errors on invalid documents.
+
+Validates a long sequence of records where every record after the first few
+is invalid and compares collecting all errors, stopping after a few errors
+and the is_valid() yes/no answer.
+
+Usage:
+
+    python benchmarks/bench_fail_fast.py [--items N] [--repeat N]
+"""
+
+# python std lib
+import argparse
+import logging
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pykwalify imports
+from pykwalify.core import CompiledSchema  # NOQA: E402
+
+SCHEMA = {
+    "type": "seq",
+    "sequence": [{
+        "type": "map",
+        "mapping": {
+            "id": {"type": "int", "required": True},
+            "name": {"type": "str", "pattern": "^[a-z]+$"},
+            "score": {"type": "float", "range": {"min": 0, "max": 1}},
+        },
+    }],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    # validate() logs all errors, only the time spent on the validation is measured
+    logging.getLogger("pykwalify").setLevel(logging.CRITICAL)
+
+    schema = CompiledSchema(schema_data=SCHEMA)
+    data = [{"id": i, "name": "foo", "score": 0.5} for i in range(3)]
+    data += [{"id": "x{0}".format(i), "name": "Foo", "score": 2.0} for i in range(args.items)]
+
+    cases = [
+        ("all errors", lambda: list(schema.iter_errors(data))),
+        ("validate", lambda: schema.validate(data, raise_exception=False)),
+        ("max_errors=10", lambda: list(schema.iter_errors(data, max_errors=10))),
+        ("is_valid", lambda: schema.is_valid(data)),
+    ]
+
+    print("{0} records, first error at record 3".format(len(data)))
+
+    for name, func in cases:
+        elapsed = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        print("    {0:<14} {1:10.3f} ms".format(name, elapsed * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of validating a document again after a small edit.
+
+Builds a document with a number of groups where each group has a sequence of records,
+and compares validating the whole document again with IncrementalValidator.revalidate()
+after a JSON patch that replaces one value or adds one record to one group.
+
+Usage:
+
+    python benchmarks/bench_incremental.py [--groups N] [--records N ...]
+"""
+
+# python std lib
+import argparse
+import copy
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pykwalify imports
+from pykwalify.core import CompiledSchema  # NOQA: E402
+from pykwalify.incremental import IncrementalValidator  # NOQA: E402
+
+SCHEMA = {
+    "type": "map",
+    "mapping": {
+        "regex;(^group-)": {
+            "type": "seq",
+            "range": {"min": 1},
+            "sequence": [{
+                "type": "map",
+                "mapping": {
+                    "id": {"type": "int", "required": True, "unique": True},
+                    "event": {"type": "str", "enum": ["click", "view", "purchase"]},
+                    "user": {"type": "str", "pattern": "^u[0-9]+$"},
+                    "tags": {"type": "seq", "sequence": [{"type": "str"}]},
+                },
+            }],
+        },
+    },
+}
+
+
+def build(groups, records):
+    return dict(
+        ("group-{0}".format(g), [
+            {"id": i, "event": ["click", "view", "purchase"][i % 3], "user": "u{0}".format(i), "tags": ["a", "b"]}
+            for i in range(records)
+        ])
+        for g in range(groups)
+    )
+
+
+def best(func, runs=5):
+    times = []
+    for i in range(runs):
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--groups", type=int, default=100)
+    parser.add_argument("--records", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    schema = CompiledSchema(schema_data=SCHEMA)
+
+    for records in args.records:
+        data = build(args.groups, records)
+        validator = IncrementalValidator(schema, copy.deepcopy(data))
+        middle = records // 2
+
+        full = best(lambda: list(schema.iter_errors(data)))
+        edits = [
+            ("replace value", [{"op": "replace", "path": "/group-7/{0}/event".format(middle), "value": "bad"}],
+             [{"op": "replace", "path": "/group-7/{0}/event".format(middle), "value": "view"}]),
+            ("add record", [{"op": "add", "path": "/group-7/0", "value": {"id": 1}}],
+             [{"op": "remove", "path": "/group-7/0"}]),
+        ]
+
+        print("{0} groups with {1} records, full validation {2:.2f} ms".format(args.groups, records, full * 1000))
+
+        for name, patch, undo in edits:
+            def edit():
+                assert len(validator.revalidate(patch)) == 1
+                validator.revalidate(undo)
+
+            # Each run applies the patch and the undo patch so the time is for two edits
+            elapsed = best(edit) / 2
+            print("    {0:<14} {1:>8.3f} ms  {2:>7.0f}x faster".format(name, elapsed * 1000, full / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of streaming JSON Lines validation.
+
+Writes a JSON Lines file with event records to a temporary file and
+validates it with a increasing number of worker processes.
+
+Usage:
+
+    python benchmarks/bench_jsonl.py [--records N] [--chunk-size N] [--jobs N ...] [--trace-memory]
+
+Memory tracing slows down the validation a lot, so throughput and memory is
+measured in separate runs.
+"""
+
+# python std lib
+import argparse
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pykwalify imports
+from pykwalify.core import CompiledSchema  # NOQA: E402
+from pykwalify.jsonl import JsonlValidator  # NOQA: E402
+
+SCHEMA = {
+    "type": "map",
+    "mapping": {
+        "id": {"type": "int", "required": True},
+        "event": {"type": "str", "enum": ["click", "view", "purchase"]},
+        "user": {"type": "str", "pattern": "^u[0-9]+$"},
+        "tags": {"type": "seq", "sequence": [{"type": "str"}]},
+    },
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=200000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--trace-memory", action="store_true")
+    args = parser.parse_args()
+
+    schema = CompiledSchema(schema_data=SCHEMA)
+
+    with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+        for i in range(args.records):
+            f.write(json.dumps({"id": i, "event": ["click", "view", "purchase"][i % 3], "user": "u{0}".format(i), "tags": ["a", "b"]}))
+            f.write("\n")
+
+    try:
+        size = os.path.getsize(f.name)
+
+        for jobs in args.jobs:
+            validator = JsonlValidator(schema, chunk_size=args.chunk_size, jobs=jobs)
+
+            if args.trace_memory:
+                tracemalloc.start()
+
+            with open(f.name) as stream:
+                failed = sum(1 for _ in validator.iter_errors(stream))
+
+            assert failed == 0
+            print("jobs {0}: {1} records ({2:.1f} MiB) in {3:.2f} s, {4:.0f} records/s".format(
+                jobs, validator.records, size / 1024 / 1024, validator.elapsed, validator.records_per_second))
+
+            if args.trace_memory:
+                print("    peak traced memory {0:.0f} KiB".format(tracemalloc.get_traced_memory()[1] / 1024))
+                tracemalloc.stop()
+    finally:
+        os.unlink(f.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of the file loaders.
+
+Writes the same records as a yaml file and a json file and measures the time
+to load them with each loader in pykwalify.loaders.
+
+Usage:
+
+    python benchmarks/bench_loaders.py [--items N] [--repeat N]
+"""
+
+# python std lib
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pykwalify imports
+from pykwalify.loaders import loaders  # NOQA: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    records = [{"id": i, "name": "foo{0}".format(i), "score": 0.5, "tags": ["a", "b", "c"]} for i in range(args.items)]
+    tmp_dir = tempfile.mkdtemp()
+
+    try:
+        yaml_file = os.path.join(tmp_dir, "data.yaml")
+        json_file = os.path.join(tmp_dir, "data.json")
+
+        with open(yaml_file, "w") as stream:
+            for r in records:
+                stream.write("- id: {id}\n  name: {name}\n  score: {score}\n  tags: [a, b, c]\n".format(**r))
+
+        with open(json_file, "w") as stream:
+            json.dump(records, stream)
+
+        cases = [
+            ("yaml-pure", yaml_file),
+            ("yaml", yaml_file),
+            ("json", json_file),
+        ]
+
+        print("{0} records".format(args.items))
+
+        for name, path in cases:
+            loader = loaders[name]
+            assert loader(path) == records
+            elapsed = min(timeit.repeat(lambda: loader(path), number=1, repeat=args.repeat))
+            print("    {0:<10} {1:10.3f} ms".format(name, elapsed * 1000))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
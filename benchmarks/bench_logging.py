@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of the cost of debug logging on the validation hot path when
+logging is disabled.
+
+The same document is validated with the normal module loggers and with
+loggers that do nothing at all. The difference is the time that is spent
+in the logging calls even though no log record is ever emitted.
+
+Usage:
+
+    python benchmarks/bench_logging.py [--items N] [--repeat N]
+"""
+
+# python std lib
+import argparse
+import logging
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pykwalify imports
+import pykwalify.core  # NOQA: E402
+from pykwalify.core import Core  # NOQA: E402
+
+SCHEMA = {
+    "type": "seq",
+    "sequence": [{
+        "type": "map",
+        "mapping": {
+            "id": {"type": "int", "required": True},
+            "name": {"type": "str", "pattern": "^item"},
+            "price": {"type": "float", "range": {"min": 0}},
+            "created": {"type": "date", "format": "%Y-%m-%d"},
+            "tags": {"type": "seq", "sequence": [{"type": "str", "length": {"max": 10}}]},
+            "attributes": {"type": "map", "mapping": {"regex;(^attr_)": {"type": "int"}}},
+        },
+    }],
+}
+
+
+class NullLogger(object):
+    """
+    Logger replacement where every call is a no-op
+    """
+    def isEnabledFor(self, level):
+        return False
+
+    def _noop(self, *args, **kwargs):
+        pass
+
+    debug = info = warning = error = _noop
+
+
+def make_data(items):
+    return [
+        {
+            "id": i,
+            "name": "item{0}".format(i),
+            "price": i * 1.5,
+            "created": "2020-01-01",
+            "tags": ["a", "b", "c"],
+            "attributes": {"attr_a": 1, "attr_b": 2},
+        }
+        for i in range(items)
+    ]
+
+
+def measure(data, repeat):
+    return min(timeit.repeat(lambda: Core(source_data=data, schema_data=SCHEMA).validate(), number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Logging is configured but disabled for debug records, like in a normal production setup
+    logging.basicConfig(level=logging.WARNING)
+
+    data = make_data(args.items)
+
+    with_logging = measure(data, args.repeat)
+
+    real_log = pykwalify.core.log
+    pykwalify.core.log = NullLogger()
+    try:
+        without_logging = measure(data, args.repeat)
+    finally:
+        pykwalify.core.log = real_log
+
+    print("with disabled logging: {0:>8.2f} ms".format(with_logging * 1000))
+    print("without any logging:   {0:>8.2f} ms".format(without_logging * 1000))
+    print("logging overhead:      {0:>8.2f} ms ({1:.1f}%)".format(
+        (with_logging - without_logging) * 1000, (with_logging - without_logging) / with_logging * 100))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of memoizing the validation of repeated subtrees.
+
+Builds a Kubernetes style bundle where every container repeats the same environment, volume
+mounts, resource limits and probes, and compares validating it with and without a memo. A bundle
+where every block is different shows the overhead of building the memo keys when nothing is reused.
+
+Usage:
+
+    python benchmarks/bench_memo.py [--containers N ...]
+"""
+
+# python std lib
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pykwalify imports
+from pykwalify.core import CompiledSchema  # NOQA: E402
+
+PROBE = {
+    "type": "map",
+    "mapping": {
+        "httpGet": {
+            "type": "map",
+            "mapping": {
+                "path": {"type": "str", "pattern": "^/"},
+                "port": {"type": "int", "range": {"min": 1, "max": 65535}},
+            },
+        },
+        "initialDelaySeconds": {"type": "int"},
+        "periodSeconds": {"type": "int"},
+    },
+}
+
+SCHEMA = {
+    "type": "seq",
+    "sequence": [{
+        "type": "map",
+        "mapping": {
+            "name": {"type": "str", "required": True},
+            "image": {"type": "str", "pattern": "^[a-z0-9./-]+:[a-z0-9.-]+$"},
+            "resources": {
+                "type": "map",
+                "mapping": {
+                    "regex;(^(limits|requests)$)": {
+                        "type": "map",
+                        "mapping": {
+                            "cpu": {"type": "str", "pattern": "^[0-9]+m?$"},
+                            "memory": {"type": "str", "pattern": "^[0-9]+(Mi|Gi)$"},
+                        },
+                    },
+                },
+            },
+            "livenessProbe": PROBE,
+            "readinessProbe": PROBE,
+            "labels": {"type": "map", "mapping": {"regex;(.+)": {"type": "str", "length": {"max": 63}}}},
+            "env": {
+                "type": "seq",
+                "sequence": [{
+                    "type": "map",
+                    "mapping": {
+                        "name": {"type": "str", "pattern": "^[A-Z_][A-Z0-9_]*$", "unique": True},
+                        "value": {"type": "str", "length": {"max": 256}},
+                    },
+                }],
+            },
+            "volumeMounts": {
+                "type": "seq",
+                "sequence": [{
+                    "type": "map",
+                    "mapping": {
+                        "name": {"type": "str", "required": True},
+                        "mountPath": {"type": "str", "pattern": "^/"},
+                        "readOnly": {"type": "bool"},
+                        "updated": {"type": "timestamp"},
+                    },
+                }],
+            },
+            "ports": {
+                "type": "seq",
+                "sequence": [{"type": "map", "mapping": {"containerPort": {"type": "int", "unique": True}, "name": {"type": "str"}}}],
+            },
+        },
+    }],
+}
+
+
+def container(i, unique):
+    n = i if unique else 0
+    probe = {"httpGet": {"path": "/healthz", "port": 8080 + n % 1000}, "initialDelaySeconds": 5, "periodSeconds": 10}
+    return {
+        "name": "container-{0}".format(i),
+        "image": "registry.local/app:1.{0}".format(n),
+        "resources": {"limits": {"cpu": "{0}m".format(500 + n), "memory": "512Mi"}, "requests": {"cpu": "250m", "memory": "256Mi"}},
+        "livenessProbe": probe,
+        "readinessProbe": dict(probe),
+        "labels": {"app": "app-{0}".format(n), "tier": "backend", "team": "platform"},
+        "ports": [{"containerPort": 8080 + n % 1000, "name": "http"}, {"containerPort": 9090, "name": "metrics"}],
+        "env": [{"name": "VAR_{0}".format(j), "value": "value-{0}-{1}".format(j, n)} for j in range(20)],
+        "volumeMounts": [
+            {"name": "vol-{0}".format(j), "mountPath": "/mnt/{0}/{1}".format(j, n), "readOnly": True, "updated": "Jan {0} 2021 10:00".format(j + 1)}
+            for j in range(5)
+        ],
+    }
+
+
+def best(func, runs=3):
+    times = []
+    for i in range(runs):
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--containers", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--memo-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    schema = CompiledSchema(schema_data=SCHEMA)
+
+    for containers in args.containers:
+        for name, unique in (("repeated blocks", False), ("unique blocks", True)):
+            data = [container(i, unique) for i in range(containers)]
+            memo_schema = CompiledSchema(schema_data=SCHEMA, memo_size=args.memo_size)
+
+            plain = best(lambda: list(schema.iter_errors(data)))
+            memo = best(lambda: list(memo_schema.iter_errors(data)))
+            print("{0:>6} containers, {1:<16} no memo {2:>8.1f} ms  memo {3:>8.1f} ms  {4:.2f}x".format(
+                containers, name, plain * 1000, memo * 1000, plain / memo))
+
+
+if __name__ == "__main__":
+    main()
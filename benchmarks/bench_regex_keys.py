@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of mappings with many regex keys.
+
+Validates a number of documents where each document is a map with
+thousands of keys that is matched against a list of 'regex;(...)' keys.
+The same keys is used in all documents.
+
+Usage:
+
+    python benchmarks/bench_regex_keys.py [--regex-keys N] [--keys N] [--documents N]
+"""
+
+# python std lib
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pykwalify imports
+from pykwalify.core import CompiledSchema  # NOQA: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--regex-keys", type=int, default=40)
+    parser.add_argument("--keys", type=int, default=5000)
+    parser.add_argument("--documents", type=int, default=10)
+    args = parser.parse_args()
+
+    mapping = {}
+    for i in range(args.regex_keys):
+        mapping["regex;(^group{0}_[a-z]+_[0-9]+$)".format(i)] = {"type": "int", "required": i == 0}
+
+    schema = CompiledSchema(schema_data={"type": "map", "mapping": mapping})
+    document = {"group{0}_key_{1}".format(i % args.regex_keys, i): i for i in range(args.keys)}
+
+    start = time.time()
+    for _ in range(args.documents):
+        errors = list(schema.iter_errors(document))
+        assert errors == [], errors
+    total = time.time() - start
+
+    print("{0} regex keys, {1} keys, {2} documents: {3:.2f} ms, {4:.3f} us/key".format(
+        args.regex_keys, args.keys, args.documents, total * 1000, total * 1e6 / (args.keys * args.documents)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of sharing equal sub rules in large schemas.
+
+Builds a schema with a number of resource types where each resource repeats the same metadata,
+reference and property rules, and reports the number of rule objects and their size before and
+after the equal rules is shared, together with the time to compile the schema and the memory
+allocated by it.
+
+Usage:
+
+    python benchmarks/bench_rule_dedupe.py [--resources N ...] [--properties N]
+"""
+
+# python std lib
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pykwalify imports
+from pykwalify.core import CompiledSchema  # NOQA: E402
+
+REFERENCE = {
+    "type": "map",
+    "mapping": {
+        "kind": {"type": "str", "required": True, "enum": ["user", "group", "service"]},
+        "name": {"type": "str", "required": True, "pattern": "^[a-z][a-z0-9-]*$"},
+    },
+}
+
+
+def build(resources, properties):
+    mapping = {}
+
+    for i in range(resources):
+        props = dict(
+            ("prop{0}".format(j), {"type": ["str", "int", "bool"][j % 3], "required": j % 2 == 0})
+            for j in range(properties)
+        )
+        mapping["resource{0}".format(i)] = {
+            "type": "seq",
+            "sequence": [{
+                "type": "map",
+                "mapping": {
+                    "metadata": {
+                        "type": "map",
+                        "mapping": {
+                            "name": {"type": "str", "required": True, "length": {"max": 63}},
+                            "labels": {"type": "map", "mapping": {"regex;(.+)": {"type": "str"}}},
+                            "owner": REFERENCE,
+                        },
+                    },
+                    "dependsOn": {"type": "seq", "sequence": [REFERENCE]},
+                    "properties": {"type": "map", "mapping": props},
+                },
+            }],
+        }
+
+    return {"type": "map", "mapping": mapping}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resources", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--properties", type=int, default=20)
+    args = parser.parse_args()
+
+    for resources in args.resources:
+        schema_data = build(resources, args.properties)
+
+        start = time.time()
+        CompiledSchema(schema_data=schema_data)
+        elapsed = time.time() - start
+
+        tracemalloc.start()
+        schema = CompiledSchema(schema_data=schema_data, rule_tree_report=True)
+        # The rules that was replaced is in reference cycles with their parent rules
+        gc.collect()
+        allocated = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        print("{0:>5} resources, compiled in {1:>7.1f} ms, {2:>8.1f} KiB kept".format(resources, elapsed * 1000, allocated / 1024.0))
+        print("    {0}".format(schema.rule_tree_report))
+
+
+if __name__ == "__main__":
+    main()
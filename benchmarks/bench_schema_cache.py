@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of loading a large schema file with and without the schema cache.
+
+Writes a schema file with many mappings and measures the time to create a
+CompiledSchema from it, first without a cache directory and then from a cache
+directory that already has the parsed schema.
+
+Usage:
+
+    python benchmarks/bench_schema_cache.py [--mappings N] [--repeat N]
+"""
+
+# python std lib
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pykwalify imports
+from pykwalify.core import CompiledSchema  # NOQA: E402
+
+
+def write_schema(path, mappings):
+    lines = ["type: map", "mapping:"]
+
+    for i in range(mappings):
+        lines += [
+            "  section_{0}:".format(i),
+            "    type: map",
+            "    mapping:",
+            "      name:",
+            "        type: str",
+            "        required: true",
+            "        pattern: ^[a-z_]+$",
+            "      size:",
+            "        type: int",
+            "        range:",
+            "          min: 0",
+            "          max: 100",
+            "      kind:",
+            "        type: str",
+            "        enum: [a, b, c]",
+            "      tags:",
+            "        type: seq",
+            "        sequence:",
+            "          - type: str",
+        ]
+
+    with open(path, "w") as stream:
+        stream.write("\n".join(lines) + "\n")
+
+    return len(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mappings", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+
+    try:
+        schema_file = os.path.join(tmp_dir, "schema.yaml")
+        cache_dir = os.path.join(tmp_dir, "cache")
+        lines = write_schema(schema_file, args.mappings)
+
+        # Fill the cache
+        CompiledSchema(schema_files=[schema_file], cache_dir=cache_dir)
+
+        cases = [
+            ("no cache", lambda: CompiledSchema(schema_files=[schema_file])),
+            ("cached", lambda: CompiledSchema(schema_files=[schema_file], cache_dir=cache_dir)),
+        ]
+
+        print("schema file with {0} lines".format(lines))
+
+        for name, func in cases:
+            elapsed = min(timeit.repeat(func, number=1, repeat=args.repeat))
+            print("    {0:<10} {1:10.3f} ms".format(name, elapsed * 1000))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
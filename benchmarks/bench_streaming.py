@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of validating a yaml document while it is parsed.
+
+Writes yaml files with a sequence of records of increasing size and compares
+loading the whole document and validating it with validating it while it is
+parsed, and the time to the first error with fail fast.
+
+Usage:
+
+    python benchmarks/bench_streaming.py [--records N ...]
+
+Peak memory is measured with tracemalloc in a separate run from the timing.
+"""
+
+# python std lib
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pykwalify imports
+from pykwalify.compat import new_yml  # NOQA: E402
+from pykwalify.core import CompiledSchema  # NOQA: E402
+
+SCHEMA = {
+    "type": "seq",
+    "sequence": [{
+        "type": "map",
+        "mapping": {
+            "id": {"type": "int", "required": True},
+            "event": {"type": "str", "enum": ["click", "view", "purchase"]},
+            "user": {"type": "str", "pattern": "^u[0-9]+$"},
+            "tags": {"type": "seq", "sequence": [{"type": "str"}]},
+        },
+    }],
+}
+
+
+def write_records(f, records, error_at=None):
+    for i in range(records):
+        f.write(u"- id: {0}\n".format("bad" if i == error_at else i))
+        f.write(u"  event: {0}\n".format(["click", "view", "purchase"][i % 3]))
+        f.write(u"  user: u{0}\n".format(i))
+        f.write(u"  tags: [a, b]\n")
+
+
+def measure(func, path):
+    start = time.time()
+    with open(path) as stream:
+        errors = func(stream)
+    elapsed = time.time() - start
+
+    tracemalloc.start()
+    with open(path) as stream:
+        func(stream)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return errors, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    schema = CompiledSchema(schema_data=SCHEMA)
+
+    engines = [
+        ("tree", lambda stream: len(list(schema.iter_errors(new_yml().load(stream))))),
+        ("stream", lambda stream: len(list(schema.iter_stream_errors(stream)))),
+        ("fail fast", lambda stream: len(list(schema.iter_stream_errors(stream, fail_fast=True)))),
+    ]
+
+    for records in args.records:
+        with tempfile.NamedTemporaryFile("w", suffix=".yaml", delete=False) as f:
+            write_records(f, records, error_at=10)
+
+        try:
+            print("{0} records ({1:.1f} MiB), first error at record 10".format(records, os.path.getsize(f.name) / 1024 / 1024))
+
+            for name, func in engines:
+                errors, elapsed, peak = measure(func, f.name)
+                print("    {0:<10} {1:>3} errors in {2:.3f} s, peak traced memory {3:.0f} KiB".format(name, errors, elapsed, peak / 1024))
+        finally:
+            os.unlink(f.name)
+
+
+if __name__ == "__main__":
+    main()
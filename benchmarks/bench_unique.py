@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of unique/ident checking in sequences of maps.
+
+Validates inventory lists of increasing size where every item has an
+'ident' id field and a 'unique' sku field.
+
+Usage:
+
+    python benchmarks/bench_unique.py [--max-exponent N]
+"""
+
+# python std lib
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pykwalify imports
+from pykwalify.core import Core  # NOQA: E402
+
+SCHEMA = {
+    "type": "seq",
+    "sequence": [{
+        "type": "map",
+        "mapping": {
+            "id": {"type": "int", "ident": True},
+            "sku": {"type": "str", "unique": True},
+            "count": {"type": "int"},
+        },
+    }],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-exponent", type=int, default=3)
+    parser.add_argument("--max-exponent", type=int, default=6)
+    args = parser.parse_args()
+
+    # Only measure the validation, not the logging of the found errors
+    logging.basicConfig(level=logging.CRITICAL)
+
+    for exponent in range(args.min_exponent, args.max_exponent + 1):
+        items = 10 ** exponent
+        data = [{"id": i, "sku": "sku-{0}".format(i), "count": i % 7} for i in range(items)]
+
+        # One duplicate at the end so the error path is exercised too
+        data.append({"id": 0, "sku": "sku-0", "count": 0})
+
+        c = Core(source_data=data, schema_data=SCHEMA)
+        start = time.time()
+        c.validate(raise_exception=False)
+        total = time.time() - start
+
+        assert len(c.validation_errors) == 2, c.validation_errors
+
+        print("items: {0:>8}  total: {1:>9.3f} s  per item: {2:>7.2f} us".format(items, total, total / items * 1000000))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,6 @@
 """ pykwalify """
 
 # python stdlib
-import logging
-import logging.config
 import os
 
 __author__ = 'Grokzen <Grokzen@gmail.com>'
@@ -51,7 +49,10 @@ def init_logging(log_level):
         }
     }
 
+    # logging.config is only imported when the logging is configured, usually by the cli
+    import logging.config
     logging.config.dictConfig(logging_conf)
 
 
+# Not used anymore, partial schemas is stored in each CompiledSchema. Kept for backwards compatibility.
 partial_schemas = {}
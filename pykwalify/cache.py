@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+""" pyKwalify - cache.py """
+
+# python std lib
+import hashlib
+import logging
+import os
+import pickle
+import sys
+import tempfile
+
+# pyKwalify imports
+import pykwalify
+
+log = logging.getLogger(__name__)
+
+# Max number of compiled schemas that is kept in one cache directory. The least recently used is removed first.
+MAX_CACHE_ENTRIES = 64
+
+CACHE_FILE_SUFFIX = ".schema-cache"
+
+
+def schema_cache_key(schema_files, strict_rule_validation=False, fix_ruby_style_regex=False, file_encoding=None):
+    """
+    Build the cache key for a schema from the content of the schema files, the pykwalify and
+    python versions and the flags that changes how the rules is parsed.
+
+    A schema file that is changed gets a new key so old entries is never used again, they
+    are removed when the cache directory is full.
+    """
+    digest = hashlib.sha256()
+
+    for part in (pykwalify.__version__, sys.implementation.cache_tag, strict_rule_validation, fix_ruby_style_regex, file_encoding):
+        digest.update(u"{0}\0".format(part).encode("utf-8"))
+
+    for f in schema_files:
+        with open(f, "rb") as stream:
+            content = stream.read()
+
+        # The file ending decides how the file is parsed
+        digest.update(u"{0}\0{1}\0".format(os.path.splitext(f)[1], len(content)).encode("utf-8"))
+        digest.update(content)
+
+    return digest.hexdigest()
+
+
+def load_compiled_schema(cache_dir, key):
+    """
+    Return the cached object for key, or None if there is no usable entry in cache_dir.
+    """
+    path = os.path.join(cache_dir, key + CACHE_FILE_SUFFIX)
+
+    try:
+        with open(path, "rb") as stream:
+            cached = pickle.load(stream)
+    except FileNotFoundError:
+        log.debug(u"No cached schema : %s", path)
+        return None
+    except Exception as e:
+        # A broken or incompatible entry is the same as a missing entry, it is replaced when it is stored again
+        log.debug(u"Unable to load cached schema : %s : %s", path, e)
+        return None
+
+    # Used entries is kept when the cache directory is pruned
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+    log.debug(u"Loaded cached schema : %s", path)
+    return cached
+
+
+def store_compiled_schema(cache_dir, key, obj):
+    """
+    Store obj for key in cache_dir and remove the least recently used entries if there is more than
+    MAX_CACHE_ENTRIES. Errors is only logged as the cache is only used to make loading faster.
+    """
+    path = os.path.join(cache_dir, key + CACHE_FILE_SUFFIX)
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Written to a temp file first so other processes never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as stream:
+                pickle.dump(obj, stream, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    except Exception as e:
+        log.debug(u"Unable to store cached schema : %s : %s", path, e)
+        return
+
+    log.debug(u"Stored cached schema : %s", path)
+    _prune(cache_dir)
+
+
+def _prune(cache_dir):
+    """
+    Remove the least recently used entries so that at most MAX_CACHE_ENTRIES is left
+    """
+    entries = []
+
+    for name in os.listdir(cache_dir):
+        if name.endswith(CACHE_FILE_SUFFIX):
+            path = os.path.join(cache_dir, name)
+            try:
+                entries.append((os.stat(path).st_mtime_ns, path))
+            except OSError:
+                pass
+
+    if len(entries) <= MAX_CACHE_ENTRIES:
+        return
+
+    entries.sort()
+
+    for mtime, path in entries[:len(entries) - MAX_CACHE_ENTRIES]:
+        log.debug(u"Removing cached schema : %s", path)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
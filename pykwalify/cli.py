@@ -3,13 +3,11 @@
 """ pyKwalify - cli.py """
 
 # python std lib
+import glob
 import logging
-import logging.config
+import os
 import sys
 
-# 3rd party imports
-from docopt import docopt
-
 
 def parse_cli():
     """
@@ -25,12 +23,14 @@ def parse_cli():
     #
 
     __docopt__ = """
-usage: pykwalify -d FILE -s FILE ... [-e FILE ...]
+usage: pykwalify -d FILE ... -s FILE ... [-e FILE ...] [-j N] [--all-documents]
        [--strict-rule-validation] [--fix-ruby-style-regex] [--allow-assertions] [--encoding ENCODING]
-       [-v ...] [-q]
+       [--cache-dir DIR] [--loader NAME] [-v ...] [-q]
 
 optional arguments:
-  -d FILE, --data-file FILE            the file to be tested
+  -d FILE, --data-file FILE            the file to be tested. Can be used multiple times and can
+                                       be a glob pattern or a directory with .json/.jsonl/.yaml/.yml files.
+                                       Each line in .jsonl files is validated as one record
   -e FILE, --extension FILE            file containing python extension
   -s FILE, --schema-file FILE          schema definition file
   --fix-ruby-style-regex               This flag fixes some of the quirks of ruby style regex
@@ -41,6 +41,14 @@ optional arguments:
                                        Error will be raised if assertion is used in schema
                                        but this flag is not used. This option enables assert keyword.
   --encoding ENCODING                  Specify encoding to open data and schema files with.
+  --loader NAME                        load all data files with this loader instead of selecting
+                                       the loader by the file ending. One of json, yaml or yaml-pure
+  --cache-dir DIR                      cache the parsed schema in this directory so later runs
+                                       with the same schema files and flags can skip parsing it
+  -j N, --jobs N                       number of processes to validate data files with.
+                                       0 uses one process for each cpu [default: 1]
+  --all-documents                      validate every document in multi-document yaml files
+                                       and report the errors for each document index
   -h, --help                           show this help message and exit
   -q, --quiet                          suppress terminal output
   -v, --verbose                        verbose terminal output (multiple -v increases verbosity)
@@ -50,6 +58,9 @@ optional arguments:
     # Import pykwalify package
     import pykwalify
 
+    # 3rd party imports
+    from docopt import docopt
+
     args = docopt(__docopt__, version=pykwalify.__version__)
 
     pykwalify.init_logging(1 if args["--quiet"] else args["--verbose"])
@@ -62,28 +73,215 @@ optional arguments:
     log.debug("Setting verbose level: %s", args["--verbose"])
     log.debug("Arguments from CLI: %s", args)
 
+    try:
+        args["--jobs"] = int(args["--jobs"])
+    except ValueError:
+        args["--jobs"] = -1
+
+    if args["--jobs"] < 0:
+        sys.exit(u"pykwalify: --jobs must be a positive integer or 0")
+
+    if args["--loader"] is not None:
+        from .loaders import loaders
+
+        if args["--loader"] not in loaders:
+            sys.exit(u"pykwalify: --loader must be one of {0}".format(u", ".join(sorted(loaders))))
+
     return args
 
 
+def expand_data_files(paths):
+    """
+    Expand a list of data file paths, glob patterns and directories into a sorted list of files.
+
+    Directories are searched recursively for .json, .jsonl, .yaml and .yml files. Paths and glob patterns
+    that do not match any file is kept so they are reported as missing files.
+    """
+    data_files = []
+
+    for path in paths:
+        if os.path.isdir(path):
+            found = []
+            for root, dirs, files in os.walk(path):
+                found.extend(os.path.join(root, f) for f in files if f.endswith((".json", ".jsonl", ".yaml", ".yml")))
+            data_files.extend(sorted(found))
+        elif glob.has_magic(path):
+            data_files.extend(sorted(glob.glob(path, recursive=True)) or [path])
+        else:
+            data_files.append(path)
+
+    # Remove duplicates but keep the order
+    return list(dict.fromkeys(data_files))
+
+
+# The schema and options used to validate data files in this process
+_compiled_schema = None
+_file_encoding = None
+_all_documents = False
+_loader = None
+
+
+def _init_worker(schema_args, file_encoding, all_documents=False, loader=None):
+    """
+    Compile the schema once for each process that validates data files
+    """
+    from .core import CompiledSchema
+
+    global _compiled_schema, _file_encoding, _all_documents, _loader
+    _compiled_schema = CompiledSchema(**schema_args)
+    _file_encoding = file_encoding
+    _all_documents = all_documents
+    _loader = loader
+
+
+def _document_errors(data_file):
+    """
+    Validate all documents in a yaml file and return the errors prefixed with the document index
+    """
+    from .compat import unicode
+    from .errors import CoreError
+
+    if not os.path.exists(data_file):
+        raise CoreError(u"Provided source_file do not exists on disk: {0}".format(data_file))
+
+    with open(data_file, "r", encoding=_file_encoding) as stream:
+        return [
+            u"Document {0}: {1}".format(index, unicode(e))
+            for index, errors in _compiled_schema.iter_document_errors(stream)
+            for e in errors
+        ]
+
+
+def _validate_file(data_file):
+    """
+    Validate one data file against the schema of this process.
+
+    Returns a tuple with the data file path and a list of all errors. Errors that
+    happens when the file is loaded is also returned as a error for that file.
+    """
+    from .compat import unicode
+    from .core import Core
+    from .errors import PyKwalifyException
+
+    try:
+        if _all_documents and data_file.endswith((".yaml", ".yml")):
+            errors = _document_errors(data_file)
+        else:
+            c = Core(source_file=data_file, compiled_schema=_compiled_schema, file_encoding=_file_encoding, loader=_loader)
+            errors = [unicode(e) for e in _compiled_schema.iter_errors(c.source)]
+    except PyKwalifyException as e:
+        errors = [e.msg]
+    except Exception as e:
+        errors = [u"{0}: {1}".format(type(e).__name__, e)]
+
+    return data_file, errors
+
+
+def _validate_jsonl_file(data_file, jobs, log):
+    """
+    Validate each line in a JSON Lines file and log the errors for each line as soon as they are found.
+
+    Returns a list of all errors prefixed with the line number.
+    """
+    from .errors import CoreError
+    from .jsonl import JsonlValidator
+
+    if not os.path.exists(data_file):
+        raise CoreError(u"Provided source_file do not exists on disk: {0}".format(data_file))
+
+    validator = JsonlValidator(_compiled_schema, jobs=jobs)
+    all_errors = []
+
+    with open(data_file, "r", encoding=_file_encoding) as stream:
+        for line_number, errors in validator.iter_errors(stream):
+            for error in errors:
+                log.error(u"%s:%s: %s", data_file, line_number, error)
+                all_errors.append(u"Line {0}: {1}".format(line_number, error))
+
+    log.info(u"%s: %s records, %s failed, %.0f records/s", data_file, validator.records, validator.failed_records, validator.records_per_second)
+
+    return all_errors
+
+
 def run(cli_args):
     """
     Split the functionality into 2 methods.
 
     One for parsing the cli and one that runs the application.
+
+    All data files are validated against the schema and a report is logged for each file
+    in the same order as the files was specified. Returns a list of (data_file, errors) tuples.
     """
-    from .core import Core
+    from .errors import PyKwalifyException
 
-    c = Core(
-        source_file=cli_args["--data-file"],
-        schema_files=cli_args["--schema-file"],
-        extensions=cli_args['--extension'],
-        strict_rule_validation=cli_args['--strict-rule-validation'],
-        fix_ruby_style_regex=cli_args['--fix-ruby-style-regex'],
-        allow_assertions=cli_args['--allow-assertions'],
-        file_encoding=cli_args['--encoding'],
-    )
-    c.validate()
-    return c
+    log = logging.getLogger(__name__)
+
+    schema_args = {
+        "schema_files": cli_args["--schema-file"],
+        "extensions": cli_args['--extension'],
+        "strict_rule_validation": cli_args['--strict-rule-validation'],
+        "fix_ruby_style_regex": cli_args['--fix-ruby-style-regex'],
+        "allow_assertions": cli_args['--allow-assertions'],
+        "file_encoding": cli_args['--encoding'],
+        "cache_dir": cli_args.get('--cache-dir'),
+    }
+    data_files = expand_data_files(cli_args["--data-file"])
+    # JSON Lines files is streamed and split over all processes one file at a time
+    other_files = [f for f in data_files if not f.endswith(".jsonl")]
+    jobs = cli_args.get("--jobs", 1)
+
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+
+    file_jobs = min(jobs, len(other_files))
+    worker_args = (schema_args, cli_args['--encoding'], cli_args.get('--all-documents', False), cli_args.get('--loader'))
+
+    # Compile the schema in this process first so schema errors are raised before any data file is validated
+    _init_worker(*worker_args)
+
+    if file_jobs <= 1:
+        file_results = [_validate_file(f) for f in other_files]
+    else:
+        # multiprocessing.Pool is used because ProcessPoolExecutor only takes a initializer from python 3.7
+        from multiprocessing import Pool
+
+        with Pool(processes=file_jobs, initializer=_init_worker, initargs=worker_args) as pool:
+            file_results = pool.map(_validate_file, other_files, chunksize=max(1, len(other_files) // (file_jobs * 4)))
+
+    file_results = dict(file_results)
+    results = []
+    failed = 0
+
+    for data_file in data_files:
+        reported = False
+
+        if data_file in file_results:
+            errors = file_results[data_file]
+        else:
+            try:
+                errors = _validate_jsonl_file(data_file, jobs, log)
+                # The errors for each line is already reported when they was found
+                reported = True
+            except PyKwalifyException as e:
+                errors = [e.msg]
+            except Exception as e:
+                errors = [u"{0}: {1}".format(type(e).__name__, e)]
+
+        results.append((data_file, errors))
+
+        if errors:
+            failed += 1
+            log.error(u"%s: validation.invalid", data_file)
+            if not reported:
+                for error in errors:
+                    log.error(u" - %s", error)
+        else:
+            log.info(u"%s: validation.valid", data_file)
+
+    if len(results) > 1:
+        log.info(u"Validated %s files, %s failed", len(results), failed)
+
+    return results
 
 
 def cli_entrypoint():
@@ -95,4 +293,7 @@ def cli_entrypoint():
     if sys.version_info < (2, 7, 0):
         sys.stderr.write(u"WARNING: pykwalify: It is recommended to run pykwalify on python version 2.7.x or later...\n\n")
 
-    run(parse_cli())
+    results = run(parse_cli())
+
+    if any(errors for data_file, errors in results):
+        sys.exit(1)
@@ -2,12 +2,107 @@
 
 # python stdlib
 import sys
+import threading
 
-# 3rd party imports
-from ruamel import yaml  # NOQA: F401
+# ruamel.yaml is imported the first time a yml object is needed so that validating python
+# objects, and loading schemas from the schema cache, do not pay for the import.
+_python_types_constructor = None
 
-# Build our global yml object that will be used in all other operations in the code
-yml = yaml.YAML(typ='safe', pure=True)
+
+def _get_python_types_constructor():
+    """
+    Build the safe constructor that also handles all the normal python types so we can use all the
+    internal python types in the yaml loading.
+
+    The class is built once and not changed after that. The constructors of the ruamel.yaml
+    SafeConstructor is not changed.
+    """
+    global _python_types_constructor
+
+    if _python_types_constructor is None:
+        from ruamel.yaml.constructor import Constructor, SafeConstructor
+
+        class PythonTypesConstructor(SafeConstructor):
+            pass
+
+        PythonTypesConstructor.__qualname__ = "PythonTypesConstructor"
+
+        for tag, constructor in [
+            ('tag:yaml.org,2002:python/bool', Constructor.construct_yaml_bool),
+            ('tag:yaml.org,2002:python/complex', Constructor.construct_python_complex),
+            ('tag:yaml.org,2002:python/dict', Constructor.construct_yaml_map),
+            ('tag:yaml.org,2002:python/float', Constructor.construct_yaml_float),
+            ('tag:yaml.org,2002:python/int', Constructor.construct_yaml_int),
+            ('tag:yaml.org,2002:python/list', Constructor.construct_yaml_seq),
+            ('tag:yaml.org,2002:python/long', Constructor.construct_python_long),
+            ('tag:yaml.org,2002:python/none', Constructor.construct_yaml_null),
+            ('tag:yaml.org,2002:python/str', Constructor.construct_python_str),
+            ('tag:yaml.org,2002:python/tuple', Constructor.construct_python_tuple),
+            ('tag:yaml.org,2002:python/unicode', Constructor.construct_python_unicode),
+        ]:
+            PythonTypesConstructor.add_constructor(tag, constructor)
+
+        _python_types_constructor = PythonTypesConstructor
+
+    return _python_types_constructor
+
+
+def new_yml(pure=True):
+    """
+    Build a new yml object that loads yaml with the safe loader and the normal python types.
+
+    With pure=False the C based parser of ruamel.yaml is used if it is installed.
+    """
+    from ruamel.yaml import YAML
+
+    y = YAML(typ='safe', pure=pure)
+    y.Constructor = _get_python_types_constructor()
+    return y
+
+
+_thread_local = threading.local()
+
+
+def thread_yml(pure=True):
+    """
+    Return the yml object that belongs to the current thread.
+
+    A YAML object keeps the state of the current load so it can't be used from multiple
+    threads at the same time.
+    """
+    name = "yml" if pure else "c_yml"
+    y = getattr(_thread_local, name, None)
+
+    if y is None:
+        y = new_yml(pure=pure)
+        setattr(_thread_local, name, y)
+
+    return y
+
+
+def __getattr__(name):
+    """
+    The ruamel `yaml` module, the global `yml` object and `PythonTypesConstructor` is still available
+    from this module but they are only imported and built when they are used
+    """
+    global yml
+
+    if name == "yaml":
+        from ruamel import yaml as ruamel_yaml
+        return ruamel_yaml
+    if name == "yml":
+        yml = new_yml()
+        return yml
+    if name == "PythonTypesConstructor":
+        return _get_python_types_constructor()
+    raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
+
+
+if sys.version_info < (3, 7):
+    # Module __getattr__ is only supported from python 3.7
+    from ruamel import yaml  # NOQA: F401
+    yml = new_yml()
+    PythonTypesConstructor = _get_python_types_constructor()
 
 
 if sys.version_info[0] < 3:
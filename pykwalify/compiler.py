@@ -0,0 +1,579 @@
+# -*- coding: utf-8 -*-
+
+""" pyKwalify - compiler.py """
+
+# python std lib
+import logging
+import re
+import sys
+from functools import lru_cache
+
+# pyKwalify imports
+from pykwalify.compat import nativestr
+from pykwalify.errors import CoreError, SchemaError
+from pykwalify.types import is_scalar, tt
+
+log = logging.getLogger(__name__)
+
+# All regex patterns used by any schema, shared between all rules that use the same pattern
+_regex_cache = {}
+
+# All assert expressions used by any schema, shared between all rules that use the same expression
+_assertion_cache = {}
+
+# Max number of data keys that is remembered for each mapping with regex keys
+REGEX_KEY_MEMO_SIZE = 16384
+
+
+def compile_regex(pattern):
+    """
+    Compile a regex pattern once. Rules that use the same pattern gets the same compiled object.
+
+    Raises the same exceptions as re.compile() if the pattern is not a valid regex.
+    """
+    regexp = _regex_cache.get(pattern)
+
+    if regexp is None:
+        regexp = _regex_cache.setdefault(pattern, re.compile(pattern, re.UNICODE))
+
+    return regexp
+
+
+def compile_assertion(assertion):
+    """
+    Compile an assert expression once into a function that evaluates the expression with the
+    validated value bound to the variable 'val' and raises AssertionError if it is false.
+
+    The expression is compiled in eval mode so only a single expression is accepted, statements
+    and newlines can't be used to run other code. Like the assert statement, the expression can
+    be followed by a message as in 'val < 5, "too big"', then only the expression is evaluated.
+    Raises SyntaxError if the expression is not a valid python expression.
+    """
+    func = _assertion_cache.get(assertion)
+
+    if func is None:
+        import ast
+
+        tree = ast.parse(assertion.strip(), u"<assert>", "eval")
+
+        # A tuple is always true, so the only tuple that is accepted is the expression and the message
+        if isinstance(tree.body, ast.Tuple):
+            if len(tree.body.elts) != 2:
+                raise SyntaxError(u"Assertion can only have one message: {0}".format(assertion))
+            tree.body = tree.body.elts[0]
+
+        code = compile(tree, u"<assert>", "eval")
+
+        def func(val):
+            if not eval(code, {}, {"val": val}):
+                raise AssertionError(assertion)
+
+        func = _assertion_cache.setdefault(assertion, func)
+
+    return func
+
+
+class EnumIndex(object):
+    """
+    Hashed index of the items in a enum.
+
+    Bool items are stored with a separate key so that True and 1, or False and 0, is not
+    considered to be the same enum value. Items that can't be hashed are
+    kept in a list that is only scanned if the index contains any such items.
+    """
+
+    def __init__(self, items=None):
+        self.table = set()
+        self.unhashable = []
+
+        for item in items or []:
+            self.add(item)
+
+    # Bool values is stored as a tuple with this marker so they never compare equal to any other value
+    _bool_marker = object()
+
+    @classmethod
+    def key(cls, item):
+        if item is True or item is False:
+            return (cls._bool_marker, item)
+        return item
+
+    def add(self, item):
+        """
+        Add a item to the index. Returns False if the item was already in the index.
+        """
+        if item in self:
+            return False
+
+        key = self.key(item)
+
+        try:
+            self.table.add(key)
+        except TypeError:
+            self.unhashable.append(key)
+
+        return True
+
+    def __contains__(self, item):
+        key = self.key(item)
+
+        try:
+            if key in self.table:
+                return True
+        except TypeError:
+            pass
+
+        return bool(self.unhashable) and key in self.unhashable
+
+
+def find_extension_func(loaded_extensions, func):
+    """
+    Return the function named func from the first extension module that defines it, or None.
+
+    Since the loading order of the extensions is determined it should be easy to determine
+    which file is used before others.
+    """
+    for extension in loaded_extensions:
+        method = getattr(extension, func, None)
+        if method:
+            return method
+
+    return None
+
+
+def compile_rule(rule, fix_ruby_style_regex=False, loaded_extensions=None):
+    """
+    Compile a Rule and all of its sub rules into validation closures.
+
+    Each rule gets a function with the signature `(core, value, path)` stored in `rule.compiled`.
+    The function only contains the checks that the rule actually declares, everything that
+    is known when the schema is parsed is bound into the closure so nothing needs to be looked
+    up on the rule object for each validated value.
+
+    If loaded_extensions is given the 'func' of each rule is looked up in the extension modules
+    and stored in `rule.func_method`. CoreError is raised if no extension defines the function.
+
+    Rules that is already compiled is not compiled again.
+    """
+    if rule.compiled is not None:
+        return rule.compiled
+
+    if rule.sequence is not None:
+        for r in rule.sequence:
+            compile_rule(r, fix_ruby_style_regex, loaded_extensions)
+
+    if rule.mapping is not None:
+        for r in rule.mapping.values():
+            compile_rule(r, fix_ruby_style_regex, loaded_extensions)
+
+    if rule.regex_mappings:
+        rule.regex_mappings_matcher = compile_regex_mappings(rule.regex_mappings)
+
+    if rule.func and loaded_extensions is not None:
+        rule.func_method = find_extension_func(loaded_extensions, rule.func)
+
+        if rule.func_method is None:
+            raise CoreError(u"Did not find method '{0}' in any loaded extension file".format(rule.func))
+
+    rule.compiled = _compile_node(rule, fix_ruby_style_regex)
+    return rule.compiled
+
+
+# Schema keywords that holds sub rules. The sub rules is compared by identity when rules is deduplicated.
+_sub_rule_keywords = frozenset(["map", "mapping", "seq", "sequence"])
+
+# Rule attributes whose values is shared between all rules with equal values
+_interned_attributes = ("type", "pattern", "range", "length", "enum", "desc", "name", "format", "func", "assertion", "default")
+
+# Rule attributes that is not counted in the size of the rule tree, because they are shared with
+# other objects, like the loaded schema, or is created when the rule is compiled
+_unsized_attributes = frozenset([
+    "_assertion_func", "_compiled", "_enum_index", "_func_method", "_map_regex_regexp", "_parent",
+    "_pattern_regexp", "_regex_mappings_matcher", "_schema", "_schema_str",
+])
+
+
+def _freeze_schema_value(value):
+    """
+    Build a hashable key from a schema value where values of different types, like 1 and True, is not equal
+    """
+    if isinstance(value, dict):
+        return (dict, tuple((k.__class__, k, _freeze_schema_value(v)) for k, v in value.items()))
+
+    if isinstance(value, (list, tuple)):
+        return (value.__class__, tuple(_freeze_schema_value(v) for v in value))
+
+    return (value.__class__, value)
+
+
+def _rule_key(rule):
+    """
+    Build a key that is equal for rules that validates data in the same way. The sub rules of the
+    rule must already be deduplicated because they are compared by identity.
+    """
+    if rule.include_name is not None:
+        keywords = ("include", rule.include_name)
+    else:
+        keywords = tuple(sorted(
+            (k, _freeze_schema_value(v)) for k, v in rule.schema_str.items() if k not in _sub_rule_keywords
+        ))
+
+    mapping = None if rule.mapping is None else tuple((k.__class__, k, id(r)) for k, r in rule.mapping.items())
+    sequence = None if rule.sequence is None else tuple(id(r) for r in rule.sequence)
+
+    return (keywords, rule.map_regex_rule, mapping, sequence)
+
+
+def _rule_size(rule, seen):
+    """
+    Size in bytes of rule, its attributes and all attribute values that is not already in seen.
+    Sub rules is not included.
+    """
+    from pykwalify.rule import Rule
+
+    size = 0
+    stack = [rule, rule.__dict__]
+    stack.extend(v for k, v in rule.__dict__.items() if k not in _unsized_attributes)
+
+    while stack:
+        obj = stack.pop()
+
+        if id(obj) in seen or (isinstance(obj, Rule) and obj is not rule):
+            continue
+
+        seen[id(obj)] = obj
+        size += sys.getsizeof(obj)
+
+        if isinstance(obj, dict) and obj is not rule.__dict__:
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set)):
+            stack.extend(obj)
+
+    return size
+
+
+def rule_tree_size(rules):
+    """
+    Returns a tuple with the number of rule objects in the trees of all rules and their size in bytes.
+    Rules and values that is shared is only counted once.
+    """
+    seen = {}
+    nodes = 0
+    size = 0
+    stack = list(rules)
+
+    while stack:
+        rule = stack.pop()
+
+        if id(rule) in seen:
+            continue
+
+        nodes += 1
+        size += _rule_size(rule, seen)
+
+        stack.extend(rule.sequence or [])
+        stack.extend((rule.mapping or {}).values())
+
+    return nodes, size
+
+
+class RuleTreeReport(object):
+    """
+    Number of rule objects and their size in bytes before and after the rules of a schema was deduplicated
+    """
+
+    def __init__(self, nodes_before, bytes_before, nodes_after, bytes_after):
+        self.nodes_before = nodes_before
+        self.bytes_before = bytes_before
+        self.nodes_after = nodes_after
+        self.bytes_after = bytes_after
+
+    def __str__(self):
+        return u"Rule tree: {0} rules ({1:.1f} KiB) before deduplication, {2} rules ({3:.1f} KiB) after".format(
+            self.nodes_before, self.bytes_before / 1024.0, self.nodes_after, self.bytes_after / 1024.0)
+
+    __repr__ = __str__
+
+
+def dedupe_rules(root_rule, partial_schemas, report=False):
+    """
+    Replace all sub rules that validates data in the same way with one shared rule object, and share
+    the values of the keywords in _interned_attributes between all rules where they are equal.
+
+    Must be done before the rules is compiled and the rules must not be changed afterwards.
+    The partial_schemas dict is updated in place. Returns a tuple with the deduplicated root rule
+    and a RuleTreeReport, the report is only built if report is True because it needs to
+    walk the whole rule tree before and after.
+    """
+    all_rules = [root_rule] + list(partial_schemas.values())
+    before = rule_tree_size(all_rules) if report else (None, None)
+
+    # The shared rule for each rule key, the (rule, shared rule) for the id() of each visited rule
+    # and the shared value for each keyword value
+    canonical = {}
+    visited = {}
+    values = {}
+
+    def dedupe(rule):
+        done = visited.get(id(rule))
+        if done is not None:
+            return done[1]
+
+        if rule.sequence is not None:
+            rule.sequence = [dedupe(r) for r in rule.sequence]
+
+        if rule.mapping is not None:
+            for k, r in rule.mapping.items():
+                rule.mapping[k] = dedupe(r)
+
+        if rule.regex_mappings:
+            rule.regex_mappings = [dedupe(r) for r in rule.regex_mappings]
+
+        try:
+            shared = canonical.setdefault(_rule_key(rule), rule)
+        except TypeError:
+            # Rules with unhashable values in the schema is never shared
+            shared = rule
+
+        if shared is rule:
+            for name in _interned_attributes:
+                value = getattr(rule, name)
+
+                if value is None:
+                    continue
+
+                try:
+                    key = (name, _freeze_schema_value(value))
+                except TypeError:
+                    continue
+
+                if name == "enum":
+                    rule.enum, rule.enum_index = values.setdefault(key, (value, rule.enum_index))
+                else:
+                    setattr(rule, name, values.setdefault(key, value))
+
+        # The rule is kept so its id() can't be reused by another rule
+        visited[id(rule)] = (rule, shared)
+        return shared
+
+    root_rule = dedupe(root_rule)
+
+    for name, rule in partial_schemas.items():
+        partial_schemas[name] = dedupe(rule)
+
+    tree_report = None
+
+    if report:
+        after = rule_tree_size([root_rule] + list(partial_schemas.values()))
+        tree_report = RuleTreeReport(before[0], before[1], after[0], after[1])
+        log.debug(u"%s", tree_report)
+
+    return root_rule, tree_report
+
+
+def compile_regex_mappings(regex_rules):
+    """
+    Build a function that returns a tuple with all regex rules, in schema order, that matches a key.
+
+    The result is remembered for the last REGEX_KEY_MEMO_SIZE keys as the same keys is usually
+    used in all validated documents.
+    """
+    regex_rules = tuple(regex_rules)
+
+    @lru_cache(maxsize=REGEX_KEY_MEMO_SIZE)
+    def match_key(key):
+        return tuple(r for r in regex_rules if r.map_regex_regexp.search(key))
+
+    return match_key
+
+
+def _compile_node(rule, fix_ruby_style_regex):
+    """
+    Build the closure that validates any value against the rule, including the checks
+    for required and nullable values that is done before the value itself is validated.
+    """
+    if rule.include_name is not None:
+        def validate_value(core, value, path):
+            core._validate_include(value, rule, path)
+    elif rule.sequence is not None:
+        def validate_value(core, value, path):
+            core._validate_sequence(value, rule, path)
+    elif rule.mapping is not None or rule.allowempty_map:
+        def validate_value(core, value, path):
+            core._validate_mapping(value, rule, path)
+    else:
+        validate_value = _compile_scalar(rule, fix_ruby_style_regex)
+
+    required = rule.required and rule.type != "none"
+    not_nullable = not rule.nullable and rule.type != "none"
+
+    if not required and not not_nullable:
+        return validate_value
+
+    def validate_node(core, value, path):
+        if value is None:
+            if required:
+                core.errors.append(SchemaError.SchemaErrorEntry(
+                    msg=u"required.novalue : '{path}'",
+                    path=path,
+                    value=value,
+                    code=u"required_novalue",
+                ))
+                return
+
+            core.errors.append(SchemaError.SchemaErrorEntry(
+                msg=u"nullable.novalue : '{path}'",
+                path=path,
+                value=value,
+                code=u"nullable_novalue",
+            ))
+            return
+
+        validate_value(core, value, path)
+
+    return validate_node
+
+
+def _compile_scalar(rule, fix_ruby_style_regex):
+    """
+    Build the closure that validates a scalar value. Only the checks that is defined
+    in the rule is added.
+    """
+    # Checks that is done on all values, even None values
+    pre_checks = []
+    # Checks that is done on values that is not None and that has the correct type
+    post_checks = []
+
+    if rule.func:
+        def check_func(core, value, path):
+            core._handle_func(value, rule, path)
+        pre_checks.append(check_func)
+
+    if rule.assertion is not None:
+        def check_assert(core, value, path):
+            core._validate_assert(rule, value, path)
+        pre_checks.append(check_assert)
+
+    enum = rule.enum
+    enum_index = None
+
+    if enum is not None:
+        enum_index = rule.enum_index if rule.enum_index is not None else EnumIndex(enum)
+    rule_type = rule.type
+    type_check = tt.get(rule_type)
+
+    if rule.pattern is not None:
+        post_checks.append(_compile_pattern(rule, fix_ruby_style_regex))
+
+    if rule.range is not None:
+        post_checks.append(_compile_range(rule))
+
+    if rule.length is not None:
+        length = rule.length
+
+        def check_length(core, value, path):
+            core._validate_length(length, value, path, 'scalar')
+        post_checks.append(check_length)
+
+    if rule_type == "timestamp":
+        def check_timestamp(core, value, path):
+            core._validate_scalar_timestamp(value, path)
+        post_checks.append(check_timestamp)
+
+    if rule_type == "date":
+        date_format = rule.format
+        # The date format that matched the last value is tried first for the next value
+        last_format = [None]
+
+        def check_date(core, value, path):
+            if not is_scalar(value):
+                raise CoreError(u'value is not a valid scalar')
+            matched = core._validate_scalar_date(value, date_format, path, last_format[0])
+            if matched is not None:
+                last_format[0] = matched
+        post_checks.append(check_date)
+
+    def validate_scalar(core, value, path):
+        for check in pre_checks:
+            check(core, value, path)
+
+        if value is None:
+            return
+
+        if enum_index is not None and value not in enum_index:
+            core.errors.append(SchemaError.SchemaErrorEntry(
+                msg=u"Enum '{value}' does not exist. Path: '{path}' Enum: {enum_values}",
+                path=path,
+                value=nativestr(value) if tt['str'](value) else value,
+                enum_values=enum,
+                code=u"enum_notexist",
+            ))
+
+        # The generic type validation is only used to report the error or to raise
+        # the error for a type that has no type check
+        if type_check is None or not type_check(value):
+            if not core._validate_scalar_type(value, rule_type, path):
+                return
+
+        for check in post_checks:
+            check(core, value, path)
+
+    return validate_scalar
+
+
+def _compile_pattern(rule, fix_ruby_style_regex):
+    """
+    """
+    pattern = rule.pattern
+
+    #
+    # Try to trim away the surrounding slashes around ruby style /<regex>/ if they are defined.
+    # This is a quirk from ruby that they define regex patterns with surrounding slashes.
+    # Docs on how ruby regex works can be found here: https://ruby-doc.org/core-2.4.0/Regexp.html
+    # The original ruby implementation uses this code to validate patterns
+    #   unless value.to_s =~ rule.regexp
+    # Becuase python do not work with surrounding slashes we have to trim them away in order to make the regex work
+    #
+    if pattern.startswith('/') and pattern.endswith('/') and fix_ruby_style_regex:
+        pattern = pattern[1:-1]
+        log.debug(u"Trimming slashes around ruby style regex. New pattern value: '%s'", pattern)
+        match = compile_regex(pattern).match
+    else:
+        match = rule.pattern_regexp.match
+
+    def check_pattern(core, value, path):
+        try:
+            res = match(value)
+        except TypeError:
+            res = None
+
+        if res is None:  # Not matching
+            core.errors.append(SchemaError.SchemaErrorEntry(
+                msg=u"Value '{value}' does not match pattern '{pattern}'. Path: '{path}'",
+                path=path,
+                value=nativestr(str(value)),
+                pattern=pattern,
+                code=u"pattern_unmatch"))
+
+    return check_pattern
+
+
+def _compile_range(rule):
+    """
+    """
+    r = rule.range
+    max_, min_, max_ex, min_ex = r.get("max"), r.get("min"), r.get("max-ex"), r.get("min-ex")
+
+    def check_range(core, value, path):
+        if not is_scalar(value):
+            raise CoreError(u"value is not a valid scalar")
+
+        try:
+            value = len(value)
+        except Exception:
+            pass
+
+        core._validate_range(max_, min_, max_ex, min_ex, value, path, "scalar")
+
+    return check_range
@@ -4,42 +4,469 @@
 
 # python std lib
 import datetime
-import json
 import logging
 import os
 import re
 import sys
-import traceback
 import time
-from io import open
-from importlib.machinery import SourceFileLoader
 
 # pyKwalify imports
-import pykwalify
 from pykwalify.compat import unicode, nativestr, basestring
-from pykwalify.errors import CoreError, SchemaError, NotMappingError, NotSequenceError
+from pykwalify.compiler import compile_rule, dedupe_rules, find_extension_func
+from pykwalify.errors import CoreError, SchemaError, NotMappingError, NotSequenceError, join_path
+from pykwalify.loaders import file_endings, loader_for_file
 from pykwalify.rule import Rule
-from pykwalify.types import is_scalar, is_string, tt
+from pykwalify.types import is_string, tt
 
 # 3rd party imports
-from dateutil.parser import parse
-from pykwalify.compat import yml
-from ruamel.yaml.constructor import Constructor
+from pykwalify.compat import new_yml, thread_yml
+
+# Modules that is only needed for some schemas or data files, like dateutil, ruamel.yaml, json and the
+# schema cache, is imported when they are first used to keep the import of pykwalify fast.
 
 log = logging.getLogger(__name__)
 
+# Extension modules that is already loaded, by absolute file path. Each entry is ((mtime, size), module)
+# so that a file that is changed on disk is loaded again.
+_extension_cache = {}
+
+# Dates and timestamps in the common ISO 8601 formats like '2021-01-31', '2021-01-31T10:00:00Z'
+# and '2021-01-31 10:00:00.123+01:00' is validated without dateutil
+_iso_datetime_re = re.compile(
+    r"^([0-9]{4})-([0-9]{2})-([0-9]{2})"
+    r"(?:[T ]([0-9]{2}):([0-9]{2})(?::([0-9]{2})(?:\.[0-9]{1,6})?)?"
+    r"(?:Z|[+-]([0-9]{2}):?([0-9]{2}))?)?$"
+)
+
+
+def _parse_datetime(value):
+    """
+    Parse a date or timestamp string with dateutil. Raises an exception if it is not valid.
+    """
+    from dateutil.parser import parse
+    return parse(value)
+
+
+def _is_iso_datetime(value):
+    """
+    Returns True if value is a valid date or datetime in one of the common ISO 8601 formats.
+
+    False do not mean that the value is invalid, only that it has to be parsed by dateutil.
+    All values that is accepted here is also accepted by dateutil.
+    """
+    match = _iso_datetime_re.match(value)
+
+    if match is None:
+        return False
+
+    year, month, day, hour, minute, second, tz_hour, tz_minute = match.groups()
+
+    try:
+        datetime.datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0), int(second or 0))
+    except ValueError:
+        return False
+
+    return tz_hour is None or (int(tz_hour) < 24 and int(tz_minute) < 60)
+
+
+class _ErrorLimitReached(Exception):
+    """
+    Raised internally to stop the validation when the max number of errors is found
+    """
+
+
+class _ErrorList(list):
+    """
+    Error list that stops the validation with _ErrorLimitReached when `limit` errors is added.
+
+    Errors that might be removed again, like the errors from the items in sequences with
+    matching '*', is added while `suspended` is larger then 0 and do not stop the validation.
+    """
+
+    def __init__(self, limit):
+        super(_ErrorList, self).__init__()
+        self.limit = limit
+        self.suspended = 0
+
+    def append(self, error):
+        super(_ErrorList, self).append(error)
+
+        if self.suspended == 0 and len(self) >= self.limit:
+            raise _ErrorLimitReached()
+
+
+def _load_schema_files(schema_files, file_encoding=None):
+    """
+    Load all schema files and merge them into one single schema dict for easy parsing
+    """
+    if not isinstance(schema_files, list):
+        raise CoreError(u"schema_files must be of list type")
+
+    schema_data = {}
+
+    for f in schema_files:
+        if not os.path.exists(f):
+            raise CoreError(u"Provided source_file do not exists on disk : {0}".format(f))
+
+        loader = loader_for_file(f)
+
+        if loader is None:
+            raise CoreError(u"Unable to load file : {0} : Unknown file format. Supported file endings is [{1}]".format(
+                f, u", ".join(sorted(file_endings))))
+
+        data = loader(f, file_encoding)
+
+        if not data:
+            raise CoreError(u"No data loaded from file : {0}".format(f))
+
+        for key in data.keys():
+            if key in schema_data.keys():
+                raise CoreError(u"Parsed key : {0} : two times in schema files...".format(key))
+
+        schema_data = dict(schema_data, **data)
+
+    return schema_data
+
+
+def _load_extensions(extensions):
+    """
+    Load all extension files and return the list of loaded modules.
+
+    Each file is only executed once per process, the module is reused until the file is changed on disk.
+    """
+    log.debug(u"loading all extensions : %s", extensions)
+
+    loaded_extensions = []
+
+    for f in extensions:
+        if not os.path.isabs(f):
+            f = os.path.abspath(f)
+
+        if not os.path.exists(f):
+            raise CoreError(u"Extension file: {0} not found on disk".format(f))
+
+        stat = os.stat(f)
+        version = (stat.st_mtime_ns, stat.st_size)
+        cached = _extension_cache.get(f)
+
+        if cached is not None and cached[0] == version:
+            module = cached[1]
+        else:
+            log.debug(u"Executing extension file : %s", f)
+            import hashlib
+            from importlib.machinery import SourceFileLoader
+            from importlib.util import module_from_spec, spec_from_file_location
+
+            # Each file gets its own module in sys.modules, named after the path of the file, so code in the
+            # extension that looks up its module, like dataclasses and pickle, works
+            name = u"pykwalify_ext_{0}".format(hashlib.sha1(f.encode("utf-8", "surrogateescape")).hexdigest())
+            spec = spec_from_file_location(name, f, loader=SourceFileLoader(name, f))
+            module = module_from_spec(spec)
+            sys.modules[name] = module
+
+            try:
+                spec.loader.exec_module(module)
+            except BaseException:
+                del sys.modules[name]
+                raise
+
+            _extension_cache[f] = (version, module)
+
+        loaded_extensions.append(module)
+
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug(loaded_extensions)
+        log.debug([dir(m) for m in loaded_extensions])
+
+    return loaded_extensions
+
+
+class _UniqueIndex(object):
+    """
+    Hash index of the values seen so far for one unique constraint. Values that can't
+    be hashed is kept in a list and is compared one by one.
+    """
+
+    def __init__(self):
+        self.table = {}
+        self.unhashable = []
+
+    def add(self, val, index):
+        """
+        Add val that was found at index. Returns the index where val was first seen
+        if val is a duplicate, otherwise None.
+        """
+        try:
+            if val in self.table:
+                return self.table[val]
+
+            self.table[val] = index
+            return None
+        except TypeError:
+            for prev_val, prev_index in self.unhashable:
+                if prev_val == val:
+                    return prev_index
+
+            self.unhashable.append((val, index))
+            return None
+
+
+class CompiledSchema(object):
+    """
+    A schema that is loaded, parsed into a Rule tree and has all its extensions loaded once.
+
+    The same object can then be used to validate any number of documents where only the
+    per-document work is done for each call to validate() or iter_errors().
+    """
+
+    def __init__(self, schema_files=None, schema_data=None, extensions=None, strict_rule_validation=False,
+                 fix_ruby_style_regex=False, allow_assertions=False, file_encoding=None, schema_file_obj=None, cache_dir=None,
+                 memo_size=None, rule_tree_report=False):
+        """
+        :param extensions:
+            List of paths to python files that should be imported and available via 'func' keywork.
+            Any files specified by the `extensions` list keyword at the top level of the schema is
+            loaded after these files.
+        :param cache_dir:
+            Directory where the parsed rules of schemas loaded from schema_files is cached. The cached
+            rules is used as long as the content of the schema files, the pykwalify version and the
+            flags is the same. The cache is pickled python objects so only trusted directories should be used.
+        :param memo_size:
+            Remember the errors found in up to this number of different mappings and sequences, so repeated
+            identical subtrees is only validated once. Rules that use func, assert or default, or has such a
+            rule below them, is never memoized. Disabled if None and not used when validated with max_errors.
+        :param rule_tree_report:
+            Count the rule objects of the schema and their size in memory before and after equal sub rules
+            is replaced with shared rule objects, and store it as a RuleTreeReport in `rule_tree_report`.
+        """
+        if schema_files is None:
+            schema_files = []
+        if extensions is None:
+            extensions = []
+
+        log.debug(u"schema_file: %s", schema_files)
+        log.debug(u"schema_data: %s", schema_data)
+        log.debug(u"extension files: %s", extensions)
+
+        self.strict_rule_validation = strict_rule_validation
+        self.fix_ruby_style_regex = fix_ruby_style_regex
+        self.allow_assertions = allow_assertions
+        self.memo_size = memo_size
+        self.memo = None
+        self.rule_tree_report = None
+
+        schema = None
+        cache_key = None
+        cached = None
+
+        if schema_file_obj:
+            try:
+                schema = thread_yml(pure=False).load(schema_file_obj.read())
+            except Exception:
+                raise CoreError("Unable to load schema_file_obj")
+
+        if len(schema_files) > 0:
+            if cache_dir is not None:
+                from pykwalify.cache import load_compiled_schema, schema_cache_key
+
+                try:
+                    cache_key = schema_cache_key(schema_files, strict_rule_validation, fix_ruby_style_regex, file_encoding)
+                except (IOError, OSError):
+                    # Missing files is reported when they are loaded below
+                    pass
+                else:
+                    cached = load_compiled_schema(cache_dir, cache_key)
+
+            if cached is not None:
+                schema, self.schema, self.partial_schemas, self.root_rule = cached
+            else:
+                schema = _load_schema_files(schema_files, file_encoding)
+
+        if schema is None:
+            log.debug(u"No schema file loaded, trying schema data variable")
+            schema = schema_data
+
+        if schema is None:
+            raise CoreError(u"No schema file/data was loaded")
+
+        # Everything that is needed to build the same schema again in another process
+        self._pickle_args = {
+            "schema_data": schema,
+            "extensions": list(extensions),
+            "strict_rule_validation": strict_rule_validation,
+            "fix_ruby_style_regex": fix_ruby_style_regex,
+            "allow_assertions": allow_assertions,
+            "memo_size": memo_size,
+        }
+
+        # Merge any extensions defined in the schema with the provided list of extensions
+        self.extensions = list(extensions) + list(schema.get('extensions', []))
+
+        if not all(is_string(e) for e in self.extensions):
+            raise CoreError(u"Specified extensions must be a list of file paths")
+
+        self.loaded_extensions = _load_extensions(self.extensions)
+
+        if self.strict_rule_validation:
+            log.info("Using strict rule keywords validation...")
+
+        if cached is not None:
+            # The rules is already parsed, only the closures and the extension functions is bound again
+            for r in self.partial_schemas.values():
+                compile_rule(r, self.fix_ruby_style_regex, self.loaded_extensions)
+            compile_rule(self.root_rule, self.fix_ruby_style_regex, self.loaded_extensions)
+            log.debug(u"Using cached rules for schema files: %s", schema_files)
+
+            if rule_tree_report:
+                # The cached rules is already deduplicated so the report is built from newly parsed rules
+                root_schema, partial_schemas, root_rule = self._parse_rules(schema)
+                self.rule_tree_report = dedupe_rules(root_rule, partial_schemas, report=True)[1]
+
+            self._init_memo()
+            return
+
+        self.schema, self.partial_schemas, self.root_rule = self._parse_rules(schema)
+
+        # Equal sub rules in the root rule and all partial schemas is replaced with one shared rule object
+        self.root_rule, self.rule_tree_report = dedupe_rules(self.root_rule, self.partial_schemas, report=rule_tree_report)
+
+        for r in self.partial_schemas.values():
+            compile_rule(r, self.fix_ruby_style_regex, self.loaded_extensions)
+        compile_rule(self.root_rule, self.fix_ruby_style_regex, self.loaded_extensions)
+
+        if cache_key is not None:
+            from pykwalify.cache import store_compiled_schema
+            store_compiled_schema(cache_dir, cache_key, (schema, self.schema, self.partial_schemas, self.root_rule))
+
+        self._init_memo()
+
+    def _parse_rules(self, schema):
+        """
+        Parse the partial schemas and the root rule of a loaded schema.
+
+        Returns a tuple with the schema without the partial schemas, a dict with the
+        rule of each partial schema and the root rule.
+        """
+        partial_schemas = {}
+        root_schema = {}
+
+        # Look for schema; tags so they can be parsed before the root rule is parsed
+        for k, v in schema.items():
+            if k.startswith("schema;"):
+                log.debug(u"Found partial schema; : %s", v)
+                r = Rule(schema=v)
+                log.debug(u" Partial schema : %s", r)
+                partial_schemas[k.split(";", 1)[1]] = r
+            else:
+                # readd all items that is not schema; so they can be parsed
+                root_schema[k] = v
+
+        log.debug(u"Building root rule object")
+        root_rule = Rule(schema=root_schema)
+        log.debug(u"Done building root rule")
+        log.debug(u"Root rule: %s", root_rule)
+
+        return root_schema, partial_schemas, root_rule
+
+    def _init_memo(self):
+        """
+        """
+        if self.memo_size is not None:
+            from pykwalify.memo import SubtreeMemo
+
+            if self.memo_size < 1:
+                raise CoreError(u"memo_size must be at least 1")
+
+            self.memo = SubtreeMemo(self.memo_size, self.root_rule, self.partial_schemas)
+
+    def __reduce__(self):
+        """
+        The compiled rules can't be pickled so a pickled schema is compiled again from the
+        loaded schema data when it is unpickled, for example when it is sent to a worker process.
+        """
+        return (_unpickle_compiled_schema, (self._pickle_args, ))
+
+    def iter_errors(self, data, max_errors=None):
+        """
+        Validate data against this schema and return an iterator over all found
+        SchemaError.SchemaErrorEntry objects.
+
+        With max_errors the validation is stopped when that many errors is found.
+        """
+        core = Core._from_compiled_schema(self, data, max_errors=max_errors)
+        core._start_validate(data)
+        return iter(core.errors)
+
+    def is_valid(self, data):
+        """
+        Returns True if data is valid against this schema. The validation is stopped at the first error.
+        """
+        core = Core._from_compiled_schema(self, data, max_errors=1)
+        core._start_validate(data)
+        return len(core.errors) == 0
+
+    def iter_document_errors(self, stream):
+        """
+        Validate each document in a multi-document yaml stream against this schema.
+
+        Yields a tuple (index, errors) for each document in the stream where errors is a list of all
+        SchemaError.SchemaErrorEntry objects found in that document. Documents are loaded one at a time
+        when the next result is requested, so only one document is kept in memory.
+        """
+        # A new yml object is used because a YAML object can only load one stream at a time
+        for index, document in enumerate(new_yml(pure=False).load_all(stream)):
+            yield index, list(self.iter_errors(document))
+
+    def iter_stream_errors(self, stream, fail_fast=False, max_errors=None):
+        """
+        Validate the single yaml document in the stream against this schema while it is parsed,
+        without building the whole document in memory. See StreamValidator for details.
+
+        With fail_fast the parsing is stopped at the first found error and with max_errors
+        when that many errors is found.
+        Returns an iterator over all found SchemaError.SchemaErrorEntry objects.
+        """
+        from pykwalify.streaming import StreamValidator
+        return iter(StreamValidator(self, fail_fast=fail_fast, max_errors=max_errors).validate(stream))
+
+    def validate(self, data, raise_exception=True, max_errors=None):
+        """
+        Validate data against this schema.
+
+        Raises SchemaError if any validation error is found and raise_exception is True.
+        With max_errors the validation is stopped when that many errors is found.
+        Returns the validated data.
+        """
+        core = Core._from_compiled_schema(self, data, max_errors=max_errors)
+        return core.validate(raise_exception=raise_exception)
+
+
+def _unpickle_compiled_schema(kwargs):
+    """
+    """
+    return CompiledSchema(**kwargs)
+
 
 class Core(object):
     """ Core class of pyKwalify """
 
     def __init__(self, source_file=None, schema_files=None, source_data=None, schema_data=None, extensions=None, strict_rule_validation=False,
-                 fix_ruby_style_regex=False, allow_assertions=False, file_encoding=None, schema_file_obj=None, data_file_obj=None):
+                 fix_ruby_style_regex=False, allow_assertions=False, file_encoding=None, schema_file_obj=None, data_file_obj=None,
+                 compiled_schema=None, max_errors=None, loader=None):
         """
         :param extensions:
             List of paths to python files that should be imported and available via 'func' keywork.
             This list of extensions can be set manually or they should be provided by the `--extension`
             flag from the cli. This list should not contain files specified by the `extensions` list keyword
             that can be defined at the top level of the schema.
+        :param compiled_schema:
+            A CompiledSchema object to validate against. When used, all other schema and extension
+            arguments are ignored and the schema is not loaded or parsed again.
+        :param max_errors:
+            Stop the validation when this number of errors is found. All errors is collected if None.
+        :param loader:
+            Name of the loader in pykwalify.loaders that source_file is loaded with, for example 'json',
+            'yaml' or 'yaml-pure'. If None the loader is selected by the file ending of source_file.
         """
         if schema_files is None:
             schema_files = []
@@ -47,45 +474,20 @@ class Core(object):
             extensions = []
 
         log.debug(u"source_file: %s", source_file)
-        log.debug(u"schema_file: %s", schema_files)
         log.debug(u"source_data: %s", source_data)
-        log.debug(u"schema_data: %s", schema_data)
-        log.debug(u"extension files: %s", extensions)
 
-        self.source = None
-        self.schema = None
-        self.validation_errors = None
-        self.validation_errors_exceptions = None
-        self.root_rule = None
-        self.extensions = extensions
-        self.errors = []
-        self.strict_rule_validation = strict_rule_validation
-        self.fix_ruby_style_regex = fix_ruby_style_regex
-        self.allow_assertions = allow_assertions
-
-        # Patch in all the normal python types into the yaml load instance so we can use all the
-        # internal python types in the yaml loading.
-        yml.constructor.add_constructor('tag:yaml.org,2002:python/bool', Constructor.construct_yaml_bool)
-        yml.constructor.add_constructor('tag:yaml.org,2002:python/complex', Constructor.construct_python_complex)
-        yml.constructor.add_constructor('tag:yaml.org,2002:python/dict', Constructor.construct_yaml_map)
-        yml.constructor.add_constructor('tag:yaml.org,2002:python/float', Constructor.construct_yaml_float)
-        yml.constructor.add_constructor('tag:yaml.org,2002:python/int', Constructor.construct_yaml_int)
-        yml.constructor.add_constructor('tag:yaml.org,2002:python/list', Constructor.construct_yaml_seq)
-        yml.constructor.add_constructor('tag:yaml.org,2002:python/long', Constructor.construct_python_long)
-        yml.constructor.add_constructor('tag:yaml.org,2002:python/none', Constructor.construct_yaml_null)
-        yml.constructor.add_constructor('tag:yaml.org,2002:python/str', Constructor.construct_python_str)
-        yml.constructor.add_constructor('tag:yaml.org,2002:python/tuple', Constructor.construct_python_tuple)
-        yml.constructor.add_constructor('tag:yaml.org,2002:python/unicode', Constructor.construct_python_unicode)
+        source = None
+        schema = None
 
         if data_file_obj:
             try:
-                self.source = yml.load(data_file_obj.read())
+                source = thread_yml(pure=False).load(data_file_obj.read())
             except Exception as e:
                 raise CoreError("Unable to load data_file_obj input")
 
-        if schema_file_obj:
+        if schema_file_obj and compiled_schema is None:
             try:
-                self.schema = yml.load(schema_file_obj.read())
+                schema = thread_yml(pure=False).load(schema_file_obj.read())
             except Exception as e:
                 raise CoreError("Unable to load schema_file_obj")
 
@@ -93,87 +495,78 @@ class Core(object):
             if not os.path.exists(source_file):
                 raise CoreError(u"Provided source_file do not exists on disk: {0}".format(source_file))
 
-            with open(source_file, "r", encoding=file_encoding) as stream:
-                if source_file.endswith(".json"):
-                    self.source = json.load(stream)
-                elif source_file.endswith(".yaml") or source_file.endswith('.yml'):
-                    self.source = yml.load(stream)
-                else:
-                    raise CoreError(u"Unable to load source_file. Unknown file format of specified file path: {0}".format(source_file))
-
-        if not isinstance(schema_files, list):
-            raise CoreError(u"schema_files must be of list type")
-
-        # Merge all schema files into one single file for easy parsing
-        if len(schema_files) > 0:
-            schema_data = {}
-            for f in schema_files:
-                if not os.path.exists(f):
-                    raise CoreError(u"Provided source_file do not exists on disk : {0}".format(f))
+            source_loader = loader_for_file(source_file, loader)
 
-                with open(f, "r", encoding=file_encoding) as stream:
-                    if f.endswith(".json"):
-                        data = json.load(stream)
-                    elif f.endswith(".yaml") or f.endswith(".yml"):
-                        data = yml.load(stream)
-                        if not data:
-                            raise CoreError(u"No data loaded from file : {0}".format(f))
-                    else:
-                        raise CoreError(u"Unable to load file : {0} : Unknown file format. Supported file endings is [.json, .yaml, .yml]")
+            if source_loader is None:
+                raise CoreError(u"Unable to load source_file. Unknown file format of specified file path: {0}".format(source_file))
 
-                    for key in data.keys():
-                        if key in schema_data.keys():
-                            raise CoreError(u"Parsed key : {0} : two times in schema files...".format(key))
+            source = source_loader(source_file, file_encoding)
 
-                    schema_data = dict(schema_data, **data)
+        if compiled_schema is None:
+            if not isinstance(schema_files, list):
+                raise CoreError(u"schema_files must be of list type")
 
-            self.schema = schema_data
+            if len(schema_files) > 0:
+                schema = _load_schema_files(schema_files, file_encoding)
 
         # Nothing was loaded so try the source_data variable
-        if self.source is None:
+        if source is None:
             log.debug(u"No source file loaded, trying source data variable")
-            self.source = source_data
-        if self.schema is None:
+            source = source_data
+        if schema is None:
             log.debug(u"No schema file loaded, trying schema data variable")
-            self.schema = schema_data
+            schema = schema_data
 
         # Test if anything was loaded
-        if self.source is None:
+        if source is None:
             raise CoreError(u"No source file/data was loaded")
-        if self.schema is None:
+        if schema is None and compiled_schema is None:
             raise CoreError(u"No schema file/data was loaded")
 
-        # Merge any extensions defined in the schema with the provided list of extensions from the cli
-        for f in self.schema.get('extensions', []):
-            self.extensions.append(f)
-
-        if not isinstance(self.extensions, list) and all(isinstance(e, str) for e in self.extensions):
-            raise CoreError(u"Specified extensions must be a list of file paths")
-
-        self._load_extensions()
+        if compiled_schema is None:
+            compiled_schema = CompiledSchema(
+                schema_data=schema,
+                extensions=extensions,
+                strict_rule_validation=strict_rule_validation,
+                fix_ruby_style_regex=fix_ruby_style_regex,
+                allow_assertions=allow_assertions,
+            )
 
-        if self.strict_rule_validation:
-            log.info("Using strict rule keywords validation...")
+        self._init_state(compiled_schema, source, max_errors)
 
-    def _load_extensions(self):
+    @classmethod
+    def _from_compiled_schema(cls, compiled_schema, source, max_errors=None):
         """
-        Load all extension files into the namespace pykwalify.ext
+        Create a Core object without loading or parsing anything. All per-document
+        state is fresh and everything else is shared with compiled_schema.
         """
-        log.debug(u"loading all extensions : %s", self.extensions)
-
-        self.loaded_extensions = []
-
-        for f in self.extensions:
-            if not os.path.isabs(f):
-                f = os.path.abspath(f)
+        core = cls.__new__(cls)
+        core._init_state(compiled_schema, source, max_errors)
+        return core
 
-            if not os.path.exists(f):
-                raise CoreError(u"Extension file: {0} not found on disk".format(f))
-
-            self.loaded_extensions.append(SourceFileLoader("", f).load_module())
-
-        log.debug(self.loaded_extensions)
-        log.debug([dir(m) for m in self.loaded_extensions])
+    def _init_state(self, compiled_schema, source, max_errors=None):
+        """
+        """
+        self.compiled_schema = compiled_schema
+        self.source = source
+        self.schema = compiled_schema.schema
+        self.root_rule = compiled_schema.root_rule
+        self.partial_schemas = compiled_schema.partial_schemas
+        self.extensions = compiled_schema.extensions
+        self.loaded_extensions = compiled_schema.loaded_extensions
+        self.strict_rule_validation = compiled_schema.strict_rule_validation
+        self.fix_ruby_style_regex = compiled_schema.fix_ruby_style_regex
+        self.allow_assertions = compiled_schema.allow_assertions
+        self.validation_errors_exceptions = None
+        self._validation_errors = None
+        self.max_errors = max_errors
+        self.errors = self._new_error_list()
+        self.trace = log.isEnabledFor(logging.DEBUG)
+        # With max_errors the errors is found in another order and the validation can stop inside a subtree,
+        # so the memo is neither used nor filled
+        self.memo = compiled_schema.memo if max_errors is None else None
+        # The memo keys of the values in the outermost memoized subtree that is validated
+        self._frozen = None
 
     def validate(self, raise_exception=True):
         """
@@ -181,8 +574,8 @@ class Core(object):
         log.debug(u"starting core")
 
         self._start_validate(self.source)
-        self.validation_errors = [unicode(error) for error in self.errors]
         self.validation_errors_exceptions = self.errors
+        self._validation_errors = None
 
         if self.errors is None or len(self.errors) == 0:
             log.info(u"validation.valid")
@@ -199,71 +592,97 @@ class Core(object):
         # Return validated data
         return self.source
 
+    @property
+    def validation_errors(self):
+        """
+        The messages of all errors found by validate(). The messages is only rendered when they are used.
+        """
+        if self.validation_errors_exceptions is None:
+            return None
+
+        if self._validation_errors is None:
+            self._validation_errors = [unicode(error) for error in self.validation_errors_exceptions]
+
+        return self._validation_errors
+
     def _start_validate(self, value=None):
         """
         """
         path = ""
-        self.errors = []
+        self.errors = self._new_error_list()
         done = []
 
-        s = {}
+        # Debug logging is only checked once per validation run. All tracing
+        # in the validation methods is skipped when it is disabled.
+        self.trace = log.isEnabledFor(logging.DEBUG)
 
-        # Look for schema; tags so they can be parsed before the root rule is parsed
-        for k, v in self.schema.items():
-            if k.startswith("schema;"):
-                log.debug(u"Found partial schema; : %s", v)
-                r = Rule(schema=v)
-                log.debug(u" Partial schema : %s", r)
-                pykwalify.partial_schemas[k.split(";", 1)[1]] = r
-            else:
-                # readd all items that is not schema; so they can be parsed
-                s[k] = v
+        try:
+            self._validate(value, self.root_rule, path, done)
+        except _ErrorLimitReached:
+            log.debug(u"Stopped validation after %s errors", self.max_errors)
 
-        self.schema = s
+    def _new_error_list(self):
+        """
+        """
+        if self.max_errors is None:
+            return []
 
-        log.debug(u"Building root rule object")
-        root_rule = Rule(schema=self.schema)
-        self.root_rule = root_rule
-        log.debug(u"Done building root rule")
-        log.debug(u"Root rule: %s", self.root_rule)
+        if self.max_errors < 1:
+            raise CoreError(u"max_errors must be at least 1")
 
-        self._validate(value, root_rule, path, done)
+        return _ErrorList(self.max_errors)
 
     def _validate(self, value, rule, path, done):
         """
+        Validate value against the compiled closure of the rule.
         """
-        log.debug(u"Core validate")
-        log.debug(u" Root validate : Rule: %s", rule)
-        log.debug(u" Root validate : Rule_type: %s", rule.type)
-        log.debug(u" Root validate : Seq: %s", rule.sequence)
-        log.debug(u" Root validate : Map: %s", rule.mapping)
-        log.debug(u" Root validate : Done: %s", done)
+        check = rule.compiled
 
-        if rule.required and value is None and not rule.type == 'none':
-            self.errors.append(SchemaError.SchemaErrorEntry(
-                msg=u"required.novalue : '{path}'",
-                path=path,
-                value=value.encode('unicode_escape') if value else value,
-            ))
+        # Rules that is not part of a compiled schema is compiled the first time they are used
+        if check is None:
+            check = compile_rule(rule, self.fix_ruby_style_regex)
+
+        memo = self.memo
+        if memo is not None and id(rule) in memo.rules and isinstance(value, (dict, list)):
+            self._validate_memoized(memo, check, value, rule, path)
+        else:
+            check(self, value, path)
+
+    def _validate_memoized(self, memo, check, value, rule, path):
+        """
+        Reuse the errors from a earlier validation of an equal value against the same rule, with
+        the paths changed to path. Otherwise validate the value and remember the errors.
+        """
+        frozen = self._frozen
+        outermost = frozen is None
+        if outermost:
+            # Nothing can change the values in a memoized subtree while it is validated
+            # so the keys of all values below it is only built once
+            frozen = {}
+
+        key = memo.key(rule, value, frozen)
+
+        if key is None:
+            check(self, value, path)
             return
 
-        if not rule.nullable and value is None and not rule.type == 'none':
-            self.errors.append(SchemaError.SchemaErrorEntry(
-                msg=u"nullable.novalue : '{path}'",
-                path=path,
-                value=value.encode('unicode_escape') if value else value,
-            ))
+        templates = memo.get(key)
+
+        if templates is not None:
+            for template in templates:
+                self.errors.append(template.create(path))
             return
 
-        log.debug(u" ? ValidateRule: %s", rule)
-        if rule.include_name is not None:
-            self._validate_include(value, rule, path, done=None)
-        elif rule.sequence is not None:
-            self._validate_sequence(value, rule, path, done=None)
-        elif rule.mapping is not None or rule.allowempty_map:
-            self._validate_mapping(value, rule, path, done=None)
-        else:
-            self._validate_scalar(value, rule, path, done=None)
+        if outermost:
+            self._frozen = frozen
+
+        try:
+            start = len(self.errors)
+            check(self, value, path)
+            memo.put(key, self.errors[start:], path)
+        finally:
+            if outermost:
+                self._frozen = None
 
     def _handle_func(self, value, rule, path, done=None):
         """
@@ -276,32 +695,29 @@ class Core(object):
         if not func:
             return
 
-        found_method = False
-
-        for extension in self.loaded_extensions:
-            method = getattr(extension, func, None)
-            if method:
-                found_method = True
+        # The function is bound to the rule when the schema is compiled
+        method = rule.func_method
 
-                # No exception will should be caught. If one is raised it should bubble up all the way.
-                ret = method(value, rule, path)
-                if ret is not True and ret is not None:
-                    msg = '%s. Path: {path}' % unicode(ret)
-                    self.errors.append(SchemaError.SchemaErrorEntry(
-                                    msg=msg,
-                                    path=path,
-                                    value=None))
+        # Rules that is not part of a compiled schema looks it up in the loaded extensions
+        if method is None:
+            method = find_extension_func(self.loaded_extensions, func)
 
-                # If False or None or some other object that is interpreted as False
-                if not ret:
-                    raise CoreError(u"Error when running extension function : {0}".format(func))
+            if method is None:
+                raise CoreError(u"Did not find method '{0}' in any loaded extension file".format(func))
 
-                # Only run the first matched function. Sinc loading order is determined
-                # it should be easy to determine which file is used before others
-                break
+        # No exception will should be caught. If one is raised it should bubble up all the way.
+        ret = method(value, rule, join_path(path))
+        if ret is not True and ret is not None:
+            self.errors.append(SchemaError.SchemaErrorEntry(
+                            msg=u"{func_msg}. Path: {path}",
+                            path=path,
+                            value=None,
+                            func_msg=unicode(ret),
+                            code=u"func_failed"))
 
-        if not found_method:
-            raise CoreError(u"Did not find method '{0}' in any loaded extension file".format(func))
+        # If False or None or some other object that is interpreted as False
+        if not ret:
+            raise CoreError(u"Error when running extension function : {0}".format(func))
 
     def _validate_include(self, value, rule, path, done=None):
         """
@@ -311,17 +727,19 @@ class Core(object):
             self.errors.append(SchemaError.SchemaErrorEntry(
                 msg=u'Include name not valid',
                 path=path,
-                value=value.encode('unicode_escape')))
+                value=value.encode('unicode_escape'),
+                code=u"include_invalid"))
             return
         include_name = rule.include_name
-        partial_schema_rule = pykwalify.partial_schemas.get(include_name)
+        partial_schema_rule = self.partial_schemas.get(include_name)
         if not partial_schema_rule:
             self.errors.append(SchemaError.SchemaErrorEntry(
                 msg=u"Cannot find partial schema with name '{include_name}'. Existing partial schemas: '{existing_schemas}'. Path: '{path}'",
                 path=path,
                 value=value,
                 include_name=include_name,
-                existing_schemas=", ".join(sorted(pykwalify.partial_schemas.keys()))))
+                existing_schemas=", ".join(sorted(self.partial_schemas.keys())),
+                code=u"include_notfound"))
             return
 
         self._validate(value, partial_schema_rule, path, done)
@@ -329,19 +747,21 @@ class Core(object):
     def _validate_sequence(self, value, rule, path, done=None):
         """
         """
-        log.debug(u"Core Validate sequence")
-        log.debug(u" Sequence : Data: %s", value)
-        log.debug(u" Sequence : Rule: %s", rule)
-        log.debug(u" Sequence : RuleType: %s", rule.type)
-        log.debug(u" Sequence : Path: %s", path)
-        log.debug(u" Sequence : Seq: %s", rule.sequence)
-        log.debug(u" Sequence : Map: %s", rule.mapping)
+        trace = self.trace
+
+        if trace:
+            log.debug(u"Core Validate sequence")
+            log.debug(u" Sequence : Data: %s", value)
+            log.debug(u" Sequence : Rule: %s", rule)
+            log.debug(u" Sequence : RuleType: %s", rule.type)
+            log.debug(u" Sequence : Path: %s", join_path(path))
 
         if len(rule.sequence) <= 0:
-            raise CoreError(u"Sequence must contains atleast one item : {0}".format(path))
+            raise CoreError(u"Sequence must contains atleast one item : {0}".format(join_path(path)))
 
         if value is None:
-            log.debug(u" * Core seq: sequence data is None")
+            if trace:
+                log.debug(u" * Core seq: sequence data is None")
             return
 
         if not isinstance(value, list):
@@ -351,6 +771,7 @@ class Core(object):
                 u"Value '{value}' is not a list. Value path: '{path}'",
                 path,
                 value,
+                code=u"type_notseq",
             ))
             return
 
@@ -360,127 +781,54 @@ class Core(object):
         ok_values = []
         error_tracker = []
 
-        unique_errors = {}
-        map_unique_errors = {}
+        # Errors from the items can be removed again if they are allowed to fail, so they can't
+        # stop the validation until it is known that they are kept
+        suspend = self.max_errors is not None and (
+            rule.matching == "*" or (rule.matching == "any" and len(rule.sequence) > 1))
 
-        for i, item in enumerate(value):
-            processed = []
+        if suspend:
+            self.errors.suspended += 1
 
-            for r in rule.sequence:
-                tmp_errors = []
+        # Otherwise the errors from failed items is always kept. They are added as soon as the item
+        # is validated so they count against max_errors, instead of after all items is validated.
+        keep_failed = self.max_errors is not None and not suspend
+        first_error = len(self.errors)
 
-                try:
-                    # Create a sub core object to enable error tracking that do not
-                    #  collide with this Core objects errors
-                    tmp_core = Core(source_data={}, schema_data={})
-                    tmp_core.fix_ruby_style_regex = self.fix_ruby_style_regex
-                    tmp_core.allow_assertions = self.allow_assertions
-                    tmp_core.strict_rule_validation = self.strict_rule_validation
-                    tmp_core.loaded_extensions = self.loaded_extensions
-                    tmp_core._validate(item, r, "{0}/{1}".format(path, i), done)
-                    tmp_errors = tmp_core.errors
-                except NotMappingError:
-                    # For example: If one type was specified as 'map' but data
-                    # was 'str' a exception will be thrown but we should ignore it
-                    pass
-                except NotSequenceError:
-                    # For example: If one type was specified as 'seq' but data
-                    # was 'str' a exception will be thrown but we shold ignore it
-                    pass
+        for i, item in enumerate(value):
+            ok, processed = self._validate_sequence_item(item, rule, path, i, done)
+            error_tracker.append(processed)
 
-                processed.append(tmp_errors)
-
-                if r.type == "map":
-                    log.debug(u" * Found map inside sequence")
-                    unique_keys = []
-
-                    if r.mapping is None:
-                        log.debug(u" + No rule to apply, prolly because of allowempty: True")
-                        return
-
-                    for k, _rule in r.mapping.items():
-                        log.debug(u" * Key: %s", k)
-                        log.debug(u" * Rule: %s", _rule)
-
-                        if _rule.unique or _rule.ident:
-                            unique_keys.append(k)
-
-                    if len(unique_keys) > 0:
-                        for v in unique_keys:
-                            table = {}
-                            for j, V in enumerate(value):
-                                # If key do not exists it should be ignored by unique because that is not a broken constraint
-                                val = V.get(v, None)
-
-                                if val is None:
-                                    continue
-
-                                if val in table:
-                                    curr_path = "{0}/{1}/{2}".format(path, j, v)
-                                    prev_path = "{0}/{1}/{2}".format(path, table[val], v)
-                                    s = SchemaError.SchemaErrorEntry(
-                                        msg=u"Value '{duplicate}' is not unique. Previous path: '{prev_path}'. Path: '{path}'",
-                                        path=curr_path,
-                                        value=value,
-                                        duplicate=val,
-                                        prev_path=prev_path,
-                                    )
-                                    map_unique_errors[s.__repr__()] = s
-                                else:
-                                    table[val] = j
-                elif r.unique:
-                    log.debug(u" * Found unique value in sequence")
-                    table = {}
-
-                    for j, val in enumerate(value):
-                        if val is None:
-                            continue
-
-                        if val in table:
-                            curr_path = "{0}/{1}".format(path, j)
-                            prev_path = "{0}/{1}".format(path, table[val])
-                            s = SchemaError.SchemaErrorEntry(
-                                msg=u"Value '{duplicate}' is not unique. Previous path: '{prev_path}'. Path: '{path}'",
-                                path=curr_path,
-                                value=value,
-                                duplicate=val,
-                                prev_path=prev_path,
-                            )
-                            unique_errors[s.__repr__()] = s
-                        else:
-                            table[val] = j
+            if keep_failed and not ok:
+                # Mark the item as ok so the errors is not added again below
+                ok = True
+                for error in processed:
+                    for e in error:
+                        self.errors.append(e)
 
-            error_tracker.append(processed)
-            no_errors = []
-            for _errors in processed:
-                no_errors.append(len(_errors) == 0)
-
-            if rule.matching == "any":
-                log.debug(u" * any rule %s", True in no_errors)
-                ok_values.append(True in no_errors)
-            elif rule.matching == "all":
-                log.debug(u" * all rule".format(all(no_errors)))
-                ok_values.append(all(no_errors))
-            elif rule.matching == "*":
-                log.debug(u" * star rule", "...")
-                ok_values.append(True)
+            ok_values.append(ok)
 
-        for _error in unique_errors:
-            self.errors.append(_error)
+        if suspend:
+            self.errors.suspended -= 1
 
-        for _error in map_unique_errors:
-            self.errors.append(_error)
+        if len(value) > 0:
+            unique_checkpoint = len(self.errors)
+            self._validate_sequence_unique(value, rule, path)
 
-        log.debug(u" * ok : %s", ok_values)
+            # Unique errors is reported before the errors from the items
+            if keep_failed and unique_checkpoint > first_error:
+                unique_errors = self.errors[unique_checkpoint:]
+                del self.errors[unique_checkpoint:]
+                self.errors[first_error:first_error] = unique_errors
 
         # All values must pass the validation, otherwise add the parsed errors
         # to the global error list and throw up some error.
         if not all(ok_values):
             # Ignore checking for '*' type because it should allways go through
-            if rule.matching == "any":
-                log.debug(u" * Value: %s did not validate against one or more sequence schemas", value)
-            elif rule.matching == "all":
-                log.debug(u" * Value: %s did not validate against all possible sequence schemas", value)
+            if trace:
+                if rule.matching == "any":
+                    log.debug(u" * Value: %s did not validate against one or more sequence schemas", value)
+                elif rule.matching == "all":
+                    log.debug(u" * Value: %s did not validate against all possible sequence schemas", value)
 
             for i, is_ok in enumerate(ok_values):
                 if not is_ok:
@@ -488,7 +836,8 @@ class Core(object):
                         for e in error:
                             self.errors.append(e)
 
-        log.debug(u" * Core seq: validation recursivley done...")
+        if trace:
+            log.debug(u" * Core seq: validation recursivley done...")
 
         if rule.range is not None:
             rr = rule.range
@@ -503,34 +852,203 @@ class Core(object):
                 "seq",
             )
 
+    def _validate_sequence_item(self, item, rule, path, i, done=None):
+        """
+        Validate the item at index i in a sequence against the rules of the sequence.
+
+        Returns a tuple with True if the item matches the rules and a list with the errors from each
+        rule that was tried. The errors is not kept in the errors of this Core object.
+        """
+        processed = []
+
+        for r in rule.sequence:
+            # Checkpoint the error list so all errors from this rule can be tracked
+            # separately and removed again from the errors of this Core object
+            checkpoint = len(self.errors)
+
+            try:
+                self._validate(item, r, (path, i), done)
+            except NotMappingError:
+                # For example: If one type was specified as 'map' but data
+                # was 'str' a exception will be thrown but we should ignore it
+                pass
+            except NotSequenceError:
+                # For example: If one type was specified as 'seq' but data
+                # was 'str' a exception will be thrown but we shold ignore it
+                pass
+
+            tmp_errors = self.errors[checkpoint:]
+            del self.errors[checkpoint:]
+
+            processed.append(tmp_errors)
+
+            # With matching 'any' the item is valid as soon as one rule matches
+            # and the errors from the other rules is never reported
+            if rule.matching == "any" and len(tmp_errors) == 0:
+                break
+
+        no_errors = []
+        for _errors in processed:
+            no_errors.append(len(_errors) == 0)
+
+        if rule.matching == "any":
+            ok = True in no_errors
+        elif rule.matching == "all":
+            ok = all(no_errors)
+        else:
+            ok = True
+
+        if self.trace:
+            log.debug(u" * %s rule %s : %s", rule.matching, i, ok)
+
+        return ok, processed
+
+    def _sequence_unique_keys(self, rule):
+        """
+        Returns a tuple with True if any scalar rule in the sequence is unique, and the list of
+        keys that is unique or ident in the mapping rules of the sequence.
+        """
+        # Scalar rules with unique all share the same index because they check the same values
+        scalar_unique = False
+        unique_keys = []
+
+        for r in rule.sequence:
+            if r.type == "map":
+                if r.mapping is None:
+                    continue
+
+                for k, _rule in r.mapping.items():
+                    if (_rule.unique or _rule.ident) and k not in unique_keys:
+                        unique_keys.append(k)
+            elif r.unique:
+                scalar_unique = True
+
+        return scalar_unique, unique_keys
+
+    def _validate_sequence_unique(self, value, rule, path):
+        """
+        Check the unique and ident constraints of all rules in the sequence against all items in value.
+
+        All constraints is checked in one single pass over the items with one hash index per unique key.
+        """
+        scalar_unique, unique_keys = self._sequence_unique_keys(rule)
+
+        if not scalar_unique and not unique_keys:
+            return
+
+        if self.trace:
+            log.debug(u" * Found unique values in sequence. Keys: %s", unique_keys)
+
+        unique_table = _UniqueIndex() if scalar_unique else None
+        key_tables = [(k, _UniqueIndex()) for k in unique_keys]
+
+        unique_errors = []
+        map_unique_errors = dict((k, []) for k in unique_keys)
+
+        for j, item in enumerate(value):
+            if unique_table is not None and item is not None:
+                prev_j = unique_table.add(item, j)
+                if prev_j is not None:
+                    unique_errors.append(self._unique_error(value, (path, j), item, (path, prev_j)))
+
+            # Items that is not a map can't break a unique key constraint
+            if not key_tables or not isinstance(item, dict):
+                continue
+
+            for k, table in key_tables:
+                # If key do not exists it should be ignored by unique because that is not a broken constraint
+                val = item.get(k, None)
+
+                if val is None:
+                    continue
+
+                prev_j = table.add(val, j)
+                if prev_j is not None:
+                    map_unique_errors[k].append(self._unique_error(value, ((path, j), k), val, ((path, prev_j), k)))
+
+        for _error in unique_errors:
+            self.errors.append(_error)
+
+        for k in unique_keys:
+            for _error in map_unique_errors[k]:
+                self.errors.append(_error)
+
+    def _unique_error(self, value, path, duplicate, prev_path):
+        """
+        The error for a duplicate value at path in the sequence value, that was first found at prev_path
+        """
+        return SchemaError.SchemaErrorEntry(
+            msg=u"Value '{duplicate}' is not unique. Previous path: '{prev_path}'. Path: '{path}'",
+            path=path,
+            value=value,
+            duplicate=duplicate,
+            prev_path=join_path(prev_path),
+            code=u"value_notunique",
+        )
+
     def _validate_mapping(self, value, rule, path, done=None):
         """
         """
-        log.debug(u"Validate mapping")
-        log.debug(u" Mapping : Data: %s", value)
-        log.debug(u" Mapping : Rule: %s", rule)
-        log.debug(u" Mapping : RuleType: %s", rule.type)
-        log.debug(u" Mapping : Path: %s", path)
-        log.debug(u" Mapping : Seq: %s", rule.sequence)
-        log.debug(u" Mapping : Map: %s", rule.mapping)
+        trace = self.trace
+
+        if trace:
+            log.debug(u"Validate mapping")
+            log.debug(u" Mapping : Data: %s", value)
+            log.debug(u" Mapping : Rule: %s", rule)
+            log.debug(u" Mapping : RuleType: %s", rule.type)
+            log.debug(u" Mapping : Path: %s", join_path(path))
 
         if not isinstance(value, dict):
             self.errors.append(SchemaError.SchemaErrorEntry(
                 u"Value '{value}' is not a dict. Value path: '{path}'",
                 path,
                 value,
+                code=u"type_notmap",
             ))
             return
 
         if rule.mapping is None:
-            log.debug(u" + No rule to apply, prolly because of allowempty: True")
+            if trace:
+                log.debug(u" + No rule to apply, prolly because of allowempty: True")
             return
 
         # Handle 'func' argument on this mapping
         self._handle_func(value, rule, path, done)
 
+        regex_key_matches = self._validate_mapping_keys(value, rule, path)
+
+        if regex_key_matches is None:
+            return
+
+        m = rule.mapping
+
+        for k, v in value.items():
+            # If no other case was a match, check if a default mapping is valid/present and use
+            # that one instead
+            r = m.get(k, m.get('='))
+
+            if trace:
+                log.debug(u"  Mapping-value : %s %s", k, v)
+
+            if r is not None:
+                # validate recursively
+                self._validate(v, r, (path, k), done)
+            else:
+                self._validate_mapping_regex_value(value, k, rule, path, regex_key_matches, done)
+
+    def _validate_mapping_keys(self, value, rule, path, matched_regex_rules=None):
+        """
+        Check the size of the mapping and that all required keys is present, and add the default value
+        of the keys that is missing.
+
+        matched_regex_rules is the set of regex rules that matches at least one key in value. It is
+        found from the keys in value when a regex key is required if it is not given.
+
+        Returns None if a included partial schema is missing, then the values in the mapping is not
+        validated. Otherwise returns a dict with the regex rules that matches each key in value, that
+        is empty if they was not needed.
+        """
         m = rule.mapping
-        log.debug(u"   Mapping: Rule-Mapping: %s", m)
 
         if rule.range is not None:
             r = rule.range
@@ -545,11 +1063,18 @@ class Core(object):
                 "map",
             )
 
+        match_regex_key = rule.regex_mappings_matcher
+        # The regex rules that matches each key in the data. Only found if a regex key is required.
+        regex_key_matches = {}
+
         for k, rr in m.items():
+            # Regex rules is present if any key matches the regex
+            regex_rule = rr if rr.map_regex_regexp is not None else None
+
             # Handle if the value of the key contains a include keyword
             if rr.include_name is not None:
                 include_name = rr.include_name
-                partial_schema_rule = pykwalify.partial_schemas.get(include_name)
+                partial_schema_rule = self.partial_schemas.get(include_name)
 
                 if not partial_schema_rule:
                     self.errors.append(SchemaError.SchemaErrorEntry(
@@ -557,25 +1082,25 @@ class Core(object):
                         path=path,
                         value=value,
                         include_name=include_name,
-                        existing_schemas=", ".join(sorted(pykwalify.partial_schemas.keys()))))
-                    return
+                        existing_schemas=", ".join(sorted(self.partial_schemas.keys())),
+                        code=u"include_notfound"))
+                    return None
 
                 rr = partial_schema_rule
 
-            # Find out if this is a regex rule
-            is_regex_rule = False
-            required_regex = ""
-            for regex_rule in rule.regex_mappings:
-                if k == "regex;({})".format(regex_rule.map_regex_rule) or k == "re;({})".format(regex_rule.map_regex_rule):
-                    is_regex_rule = True
-                    required_regex = regex_rule.map_regex_rule
-
             # Check for the presense of the required key
-            is_present = False
-            if not is_regex_rule:
+            if regex_rule is None:
                 is_present = k in value
+            elif not rr.required:
+                is_present = False
             else:
-                is_present = any([re.search(required_regex, str(v)) for v in value])
+                if matched_regex_rules is None:
+                    regex_key_matches = {data_key: match_regex_key(str(data_key)) for data_key in value}
+                    matched_regex_rules = set()
+                    for regex_rules in regex_key_matches.values():
+                        matched_regex_rules.update(regex_rules)
+
+                is_present = regex_rule in matched_regex_rules
 
             # Specifying =: as key is considered the "default" if no other keys match
             if rr.required and not is_present and k != "=":
@@ -583,172 +1108,62 @@ class Core(object):
                     msg=u"Cannot find required key '{key}'. Path: '{path}'",
                     path=path,
                     value=value,
-                    key=k))
+                    key=k,
+                    code=u"required_nokey"))
             if k not in value and rr.default is not None:
                 value[k] = rr.default
 
-        for k, v in value.items():
-            # If no other case was a match, check if a default mapping is valid/present and use
-            # that one instead
-            r = m.get(k, m.get('='))
-            log.debug(u"  Mapping-value : %s", m)
-            log.debug(u"  Mapping-value : %s %s", k, v)
-            log.debug(u"  Mapping-value : %s", r)
-
-            regex_mappings = [(regex_rule, re.search(regex_rule.map_regex_rule, str(k))) for regex_rule in rule.regex_mappings]
-            log.debug(u"  Mapping-value: Mapping Regex matches: %s", regex_mappings)
+        return regex_key_matches
 
-            if r is not None:
-                # validate recursively
-                log.debug(u"  Mapping-value: Core Map: validate recursively: %s", r)
-                self._validate(v, r, u"{0}/{1}".format(path, k), done)
-            elif any(regex_mappings):
-                sub_regex_result = []
-
-                # Found at least one that matches a mapping regex
-                for mm in regex_mappings:
-                    if mm[1]:
-                        log.debug(u"  Mapping-value: Matching regex patter: %s", mm[0])
-                        self._validate(v, mm[0], "{0}/{1}".format(path, k), done)
-                        sub_regex_result.append(True)
-                    else:
-                        sub_regex_result.append(False)
-
-                if rule.matching_rule == "any":
-                    if any(sub_regex_result):
-                        log.debug(u"  Mapping-value: Matched at least one regex")
-                    else:
-                        log.debug(u"  Mapping-value: No regex matched")
-                        self.errors.append(SchemaError.SchemaErrorEntry(
-                            msg=u"Key '{key}' does not match any regex '{regex}'. Path: '{path}'",
-                            path=path,
-                            value=value,
-                            key=k,
-                            regex="' or '".join(sorted([mm[0].map_regex_rule for mm in regex_mappings]))))
-                elif rule.matching_rule == "all":
-                    if all(sub_regex_result):
-                        log.debug(u"  Mapping-value: Matched all regex rules")
-                    else:
-                        log.debug(u"  Mapping-value: Did not match all regex rules")
-                        self.errors.append(SchemaError.SchemaErrorEntry(
-                            msg=u"Key '{key}' does not match all regex '{regex}'. Path: '{path}'",
-                            path=path,
-                            value=value,
-                            key=k,
-                            regex="' and '".join(sorted([mm[0].map_regex_rule for mm in regex_mappings]))))
-                else:
-                    log.debug(u"  Mapping-value: No mapping rule defined")
-            else:
-                if not rule.allowempty_map:
-                    self.errors.append(SchemaError.SchemaErrorEntry(
-                        msg=u"Key '{key}' was not defined. Path: '{path}'",
-                        path=path,
-                        value=value,
-                        key=k))
-
-    def _validate_scalar(self, value, rule, path, done=None):
+    def _validate_mapping_regex_value(self, value, k, rule, path, regex_key_matches, done=None):
         """
+        Validate the value of key k in the mapping value, when the key has no rule of its own, against
+        the regex rules that matches the key. The key is undefined if there is no regex rules.
         """
-        log.debug(u"Validate scalar")
-        log.debug(u" Scalar : Value : %s", value)
-        log.debug(u" Scalar : Rule :  %s", rule)
-        log.debug(u" Scalar : RuleType : %s", rule.type)
-        log.debug(u" Scalar : Path %s", path)
-
-        # Handle 'func' argument on this scalar
-        self._handle_func(value, rule, path, done)
-
-        if rule.assertion is not None:
-            self._validate_assert(rule, value, path)
-
-        if value is None:
-            return True
-
-        if rule.enum is not None and value not in rule.enum:
-            self.errors.append(SchemaError.SchemaErrorEntry(
-                msg=u"Enum '{value}' does not exist. Path: '{path}' Enum: {enum_values}",
-                path=path,
-                value=nativestr(value) if tt['str'](value) else value,
-                enum_values=rule.enum,
-            ))
+        trace = self.trace
 
-        # Set default value
-        if rule.default and value is None:
-            value = rule.default
-
-        if not self._validate_scalar_type(value, rule.type, path):
-            return
-
-        if value is None:
-            return
-
-        if rule.pattern is not None:
-            #
-            # Try to trim away the surrounding slashes around ruby style /<regex>/ if they are defined.
-            # This is a quirk from ruby that they define regex patterns with surrounding slashes.
-            # Docs on how ruby regex works can be found here: https://ruby-doc.org/core-2.4.0/Regexp.html
-            # The original ruby implementation uses this code to validate patterns
-            #   unless value.to_s =~ rule.regexp
-            # Becuase python do not work with surrounding slashes we have to trim them away in order to make the regex work
-            #
-            if rule.pattern.startswith('/') and rule.pattern.endswith('/') and self.fix_ruby_style_regex:
-                rule.pattern = rule.pattern[1:-1]
-                log.debug("Trimming slashes around ruby style regex. New pattern value: '{0}'".format(rule.pattern))
-
-            try:
-                log.debug("Matching pattern '{0}' to regex '{1}".format(rule.pattern, value))
-                res = re.match(rule.pattern, value, re.UNICODE)
-            except TypeError:
-                res = None
-
-            if res is None:  # Not matching
+        if not rule.regex_mappings:
+            if not rule.allowempty_map:
                 self.errors.append(SchemaError.SchemaErrorEntry(
-                    msg=u"Value '{value}' does not match pattern '{pattern}'. Path: '{path}'",
+                    msg=u"Key '{key}' was not defined. Path: '{path}'",
                     path=path,
-                    value=nativestr(str(value)),
-                    pattern=rule._pattern))
-            else:
-                log.debug("Pattern matched...")
-
-        if rule.range is not None:
-            if not is_scalar(value):
-                raise CoreError(u"value is not a valid scalar")
-
-            r = rule.range
+                    value=value,
+                    key=k,
+                    code=u"key_undefined"))
+            return
 
-            try:
-                v = len(value)
-                value = v
-            except Exception:
-                pass
+        matching_regex_rules = regex_key_matches.get(k)
 
-            self._validate_range(
-                r.get("max"),
-                r.get("min"),
-                r.get("max-ex"),
-                r.get("min-ex"),
-                value,
-                path,
-                "scalar",
-            )
+        if matching_regex_rules is None:
+            matching_regex_rules = rule.regex_mappings_matcher(str(k))
 
-        if rule.length is not None:
-            self._validate_length(
-                rule.length,
-                value,
-                path,
-                'scalar',
-            )
+        if trace:
+            log.debug(u"  Mapping-value: Mapping Regex matches: %s", [mm.map_regex_rule for mm in matching_regex_rules])
 
-        # Validate timestamp
-        if rule.type == "timestamp":
-            self._validate_scalar_timestamp(value, path)
+        # Found at least one that matches a mapping regex
+        for mm in matching_regex_rules:
+            self._validate(value[k], mm, (path, k), done)
 
-        if rule.type == "date":
-            if not is_scalar(value):
-                raise CoreError(u'value is not a valid scalar')
-            date_format = rule.format
-            self._validate_scalar_date(value, date_format, path)
+        if rule.matching_rule == "any":
+            if not matching_regex_rules:
+                self.errors.append(SchemaError.SchemaErrorEntry(
+                    msg=u"Key '{key}' does not match any regex '{regex}'. Path: '{path}'",
+                    path=path,
+                    value=value,
+                    key=k,
+                    regex="' or '".join(sorted([mm.map_regex_rule for mm in rule.regex_mappings])),
+                    code=u"regex_unmatch"))
+        elif rule.matching_rule == "all":
+            if len(matching_regex_rules) != len(rule.regex_mappings):
+                self.errors.append(SchemaError.SchemaErrorEntry(
+                    msg=u"Key '{key}' does not match all regex '{regex}'. Path: '{path}'",
+                    path=path,
+                    value=value,
+                    key=k,
+                    regex="' and '".join(sorted([mm.map_regex_rule for mm in rule.regex_mappings])),
+                    code=u"regex_unmatch_all"))
+        elif trace:
+            log.debug(u"  Mapping-value: No mapping rule defined")
 
     def _validate_scalar_timestamp(self, timestamp_value, path):
         """
@@ -763,6 +1178,7 @@ class Core(object):
                     path=path,
                     value=timestamp,
                     timestamp=str(timestamp),
+                    code=u"timestamp_toosmall",
                 ))
             if timestamp > 2147483647:
                 # Timestamp integers can't be above the upper limit of
@@ -772,6 +1188,7 @@ class Core(object):
                     path=path,
                     value=timestamp,
                     timestamp=str(timestamp),
+                    code=u"timestamp_toolarge",
                 ))
 
         if isinstance(timestamp_value, (int, float)):
@@ -790,7 +1207,8 @@ class Core(object):
                     msg=u"Timestamp value is empty. Path: '{path}'",
                     path=path,
                     value=nativestr(timestamp_value),
-                    timestamp=nativestr(timestamp_value)))
+                    timestamp=nativestr(timestamp_value),
+                    code=u"timestamp_empty"))
             else:
                 # A string can contain a valid unit timestamp integer. Check if it is valid and validate it
                 try:
@@ -799,60 +1217,75 @@ class Core(object):
                 except ValueError:
                     # Just continue to parse it as a timestamp
                     try:
-                        parse(timestamp_value)
                         # If it can be parsed then it is valid
+                        if not _is_iso_datetime(timestamp_value):
+                            _parse_datetime(timestamp_value)
                     except Exception:
                         self.errors.append(SchemaError.SchemaErrorEntry(
                             msg=u"Timestamp: '{timestamp}'' is invalid. Path: '{path}'",
                             path=path,
                             value=nativestr(timestamp_value),
-                            timestamp=nativestr(timestamp_value)))
+                            timestamp=nativestr(timestamp_value),
+                            code=u"timestamp_invalid"))
         else:
             self.errors.append(SchemaError.SchemaErrorEntry(
                 msg=u"Not a valid timestamp",
                 path=path,
                 value=timestamp_value,
                 timestamp=timestamp_value,
+                code=u"timestamp_invalid",
             ))
 
-    def _validate_scalar_date(self, date_value, date_formats, path):
-        log.debug(u"Validate date : %(value)s : %(format)s : %(path)s" % {
-            'value': date_value,
-            'format': date_formats,
-            'path': path,
-        })
+    def _validate_scalar_date(self, date_value, date_formats, path, preferred_format=None):
+        """
+        Returns the date format that matched the value, if date formats is used.
+
+        preferred_format is tried before all other date formats, for example the format
+        that matched the last validated value.
+        """
+        if self.trace:
+            log.debug(u"Validate date : %s : %s : %s", date_value, date_formats, join_path(path))
 
         if isinstance(date_value, str):
             # If a date_format is specefied then use strptime on all formats
             # If no date_format is specefied then use dateutils.parse() to test the value
-            log.debug(date_formats)
-
             if date_formats:
                 # Run through all date_formats and it is valid if atleast one of them passed time.strptime() parsing
-                valid = False
+                if preferred_format is not None:
+                    try:
+                        time.strptime(date_value, preferred_format)
+                        return preferred_format
+                    except ValueError:
+                        pass
+
                 for date_format in date_formats:
+                    if date_format == preferred_format:
+                        continue
+
                     try:
                         time.strptime(date_value, date_format)
-                        valid = True
+                        return date_format
                     except ValueError:
                         pass
 
-                if not valid:
-                    self.errors.append(SchemaError.SchemaErrorEntry(
-                        msg=u"Not a valid date: {value} format: {format}. Path: '{path}'",
-                        path=path,
-                        value=date_value,
-                        format=date_format,
-                    ))
-                    return
+                self.errors.append(SchemaError.SchemaErrorEntry(
+                    msg=u"Not a valid date: {value} format: {format}. Path: '{path}'",
+                    path=path,
+                    value=date_value,
+                    format=date_formats[-1],
+                    code=u"date_invalid",
+                ))
+                return
             else:
                 try:
-                    parse(date_value)
+                    if not _is_iso_datetime(date_value):
+                        _parse_datetime(date_value)
                 except ValueError:
                     self.errors.append(SchemaError.SchemaErrorEntry(
                         msg=u"Not a valid date: {value} Path: '{path}'",
                         path=path,
                         value=date_value,
+                        code=u"date_invalid",
                     ))
         elif isinstance(date_value, (datetime.date, datetime.datetime)):
             # If the object already is a datetime or date object it passes validation
@@ -864,6 +1297,7 @@ class Core(object):
                 path=path,
                 value=date_value,
                 type=type(date_value).__name__,
+                code=u"date_invalid",
             ))
 
     def _validate_length(self, rule, value, path, prefix):
@@ -873,10 +1307,11 @@ class Core(object):
         value_length = len(str(value))
         max_, min_, max_ex, min_ex = rule.get('max'), rule.get('min'), rule.get('max-ex'), rule.get('min-ex')
 
-        log.debug(
-            u"Validate length : %s : %s : %s : %s : %s : %s",
-            max, min, max_ex, min_ex, value, path,
-        )
+        if self.trace:
+            log.debug(
+                u"Validate length : %s : %s : %s : %s : %s : %s",
+                max_, min_, max_ex, min_ex, value, join_path(path),
+            )
 
         if max_ is not None and max_ < value_length:
             self.errors.append(SchemaError.SchemaErrorEntry(
@@ -885,7 +1320,8 @@ class Core(object):
                 path=path,
                 value=len(value),
                 prefix=prefix,
-                max_=max_))
+                max_=max_,
+                code=u"length_toolong"))
 
         if min_ is not None and min_ > value_length:
             self.errors.append(SchemaError.SchemaErrorEntry(
@@ -894,7 +1330,8 @@ class Core(object):
                 path=path,
                 value=len(value),
                 prefix=prefix,
-                min_=min_))
+                min_=min_,
+                code=u"length_tooshort"))
 
         if max_ex is not None and max_ex <= value_length:
             self.errors.append(SchemaError.SchemaErrorEntry(
@@ -903,7 +1340,8 @@ class Core(object):
                 path=path,
                 value=len(value),
                 prefix=prefix,
-                max_ex=max_ex))
+                max_ex=max_ex,
+                code=u"length_toolong_ex"))
 
         if min_ex is not None and min_ex >= value_length:
             self.errors.append(SchemaError.SchemaErrorEntry(
@@ -912,31 +1350,28 @@ class Core(object):
                 path=path,
                 value=len(value),
                 prefix=prefix,
-                min_ex=min_ex))
+                min_ex=min_ex,
+                code=u"length_tooshort_ex"))
 
     def _validate_assert(self, rule, value, path):
         if not self.allow_assertions:
             raise CoreError('To allow usage of keyword "assert" you must use cli flag "--allow-assertions" or set the keyword "allow_assert" in Core class')
 
-        # Small hack to make strings work as a value.
-        if isinstance(value, str):
-            assert_value_str = '"{0}"'.format(value)
-        else:
-            assert_value_str = '{0}'.format(value)
-
-        assertion_string = "val = {0}; assert {1}".format(assert_value_str, rule.assertion)
         try:
-            exec(assertion_string, {}, {})
+            rule.assertion_func(value)
         except AssertionError:
             self.errors.append(SchemaError.SchemaErrorEntry(
-                msg=u"Value: '{0}' assertion expression failed ({1})".format(value, rule.assertion),
+                msg=u"Value: '{value}' assertion expression failed ({assertion})",
                 path=path,
                 value=value,
+                assertion=rule.assertion,
+                code=u"assert_failed",
             ))
             return
         except Exception as err:
             error_class = err.__class__.__name__
             detail = err.args[0]
+            import traceback
             cl, exc, tb = sys.exc_info()
             line_number = traceback.extract_tb(tb)[-1][1]
             raise Exception("Unknown error during assertion\n{0}\n{1}\n{2}\n{3}\n{4}\n{5}".format(
@@ -950,15 +1385,16 @@ class Core(object):
         if not isinstance(value, int) and not isinstance(value, float):
             raise CoreError("Value must be a integer type")
 
-        log.debug(
-            u"Validate range : %s : %s : %s : %s : %s : %s",
-            max_,
-            min_,
-            max_ex,
-            min_ex,
-            value,
-            path,
-        )
+        if self.trace:
+            log.debug(
+                u"Validate range : %s : %s : %s : %s : %s : %s",
+                max_,
+                min_,
+                max_ex,
+                min_ex,
+                value,
+                join_path(path),
+            )
 
         if max_ is not None and max_ < value:
                 self.errors.append(SchemaError.SchemaErrorEntry(
@@ -966,7 +1402,8 @@ class Core(object):
                     path=path,
                     value=nativestr(value) if tt['str'](value) else value,
                     prefix=prefix,
-                    max_=max_))
+                    max_=max_,
+                    code=u"range_toolarge"))
 
         if min_ is not None and min_ > value:
                 self.errors.append(SchemaError.SchemaErrorEntry(
@@ -974,7 +1411,8 @@ class Core(object):
                     path=path,
                     value=nativestr(value) if tt['str'](value) else value,
                     prefix=prefix,
-                    min_=min_))
+                    min_=min_,
+                    code=u"range_toosmall"))
 
         if max_ex is not None and max_ex <= value:
                 self.errors.append(SchemaError.SchemaErrorEntry(
@@ -982,7 +1420,8 @@ class Core(object):
                     path=path,
                     value=nativestr(value) if tt['str'](value) else value,
                     prefix=prefix,
-                    max_ex=max_ex))
+                    max_ex=max_ex,
+                    code=u"range_toolarge_ex"))
 
         if min_ex is not None and min_ex >= value:
                 self.errors.append(SchemaError.SchemaErrorEntry(
@@ -990,24 +1429,23 @@ class Core(object):
                     path=path,
                     value=nativestr(value) if tt['str'](value) else value,
                     prefix=prefix,
-                    min_ex=min_ex))
+                    min_ex=min_ex,
+                    code=u"range_toosmall_ex"))
 
     def _validate_scalar_type(self, value, t, path):
         """
         """
-        log.debug(u" # Core scalar: validating scalar type : %s", t)
-        log.debug(u" # Core scalar: scalar type: %s", type(value))
-
         try:
             if not tt[t](value):
                 self.errors.append(SchemaError.SchemaErrorEntry(
                     msg=u"Value '{value}' is not of type '{scalar_type}'. Path: '{path}'",
                     path=path,
                     value=unicode(value) if tt['str'](value) else value,
-                    scalar_type=t))
+                    scalar_type=t,
+                    code=u"type_unmatch"))
                 return False
             return True
         except KeyError as e:
             # Type not found in valid types mapping
             log.debug(e)
-            raise CoreError(u"Unknown type check: {0!s} : {1!s} : {2!s}".format(path, value, t))
+            raise CoreError(u"Unknown type check: {0!s} : {1!s} : {2!s}".format(join_path(path), value, t))
@@ -41,6 +41,26 @@ retcodes = {
 retnames = dict((v, k) for (k, v) in retcodes.items())
 
 
+def join_path(path):
+    """
+    Build the '/a/0/b' path string from a path used during validation.
+
+    During validation the path of a value is a (parent_path, key) tuple that is only
+    turned into a string when it is needed, the root path is a string.
+    """
+    if path.__class__ is not tuple:
+        return path
+
+    keys = []
+    while path.__class__ is tuple:
+        path, key = path
+        keys.append(u"{0}".format(key))
+    keys.append(path)
+    keys.reverse()
+
+    return u"/".join(keys)
+
+
 class PyKwalifyException(RuntimeError):
     """
     """
@@ -149,18 +169,83 @@ class SchemaError(PyKwalifyException):
     """
     class SchemaErrorEntry(object):
         """
+        One validation error.
+
+        `msg` is a format string that is only rendered with the path, value and args of the error
+        when the error is turned into a string. `code` identifies the kind of error, for example
+        'required_nokey'. Two errors are equal if they have the same code, path and args.
         """
-        def __init__(self, msg, path, value, **kwargs):
+        __slots__ = ("msg", "_path", "value", "code", "_arg_names", "_arg_values")
+
+        # One shared tuple of arg names for each combination of arg names
+        _arg_names_cache = {}
+
+        def __init__(self, msg, path, value, code=None, **kwargs):
             """
             """
             self.msg = msg
-            self.path = path
+            self._path = path
             self.value = value
-            for key, value in kwargs.items():
-                self.__setattr__(key, value)
+            self.code = code
+
+            if kwargs:
+                names = tuple(kwargs)
+                self._arg_names = self._arg_names_cache.setdefault(names, names)
+                self._arg_values = tuple(kwargs.values())
+            else:
+                self._arg_names = self._arg_values = ()
+
+        @property
+        def path(self):
+            # The path string is built the first time it is used
+            path = self._path
+            if path.__class__ is tuple:
+                path = self._path = join_path(path)
+            return path
+
+        @property
+        def args(self):
+            return dict(zip(self._arg_names, self._arg_values))
+
+        def __getattr__(self, name):
+            """
+            The args of the error is available as attributes
+            """
+            if not name.startswith("_"):
+                try:
+                    return self._arg_values[self._arg_names.index(name)]
+                except ValueError:
+                    pass
+            raise AttributeError(name)
+
+        def _key(self):
+            return (self.code or self.msg, self.path, self._arg_names, self._arg_values)
+
+        def __eq__(self, other):
+            if not isinstance(other, SchemaError.SchemaErrorEntry):
+                return NotImplemented
+            return self._key() == other._key()
+
+        def __ne__(self, other):
+            result = self.__eq__(other)
+            return result if result is NotImplemented else not result
+
+        def __hash__(self):
+            # Arg values can be lists or dicts so only the code and path is hashed
+            return hash((self.code or self.msg, self.path))
+
+        def __getstate__(self):
+            return (self.msg, self.path, self.value, self.code, self.args)
+
+        def __setstate__(self, state):
+            msg, path, value, code, args = state
+            self.__init__(msg, path, value, code, **args)
 
         def __repr__(self):
-            return self.msg.format(**self.__dict__)
+            fields = self.args
+            fields["path"] = self.path
+            fields["value"] = self.value
+            return self.msg.format_map(fields)
 
     def __init__(self, *args, **kwargs):
         """
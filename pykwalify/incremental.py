@@ -0,0 +1,1065 @@
+# -*- coding: utf-8 -*-
+
+""" pyKwalify - incremental.py """
+
+# python std lib
+import copy
+import logging
+from bisect import bisect_left, insort
+
+# pyKwalify imports
+from pykwalify.core import Core
+from pykwalify.errors import CoreError, SchemaError, join_path
+from pykwalify.memo import pure_rules
+from pykwalify.types import is_string
+
+log = logging.getLogger(__name__)
+
+# Mappings and sequences with more keys or items than this keeps their state between validations even if
+# nothing in them has any errors, so a change in them only visits the changed keys and items.
+MIN_STATE_WIDTH = 64
+
+# The distance between the labels of two items in a sequence when the items is labeled again
+_LABEL_GAP = 1 << 32
+
+
+class _DirtyNode(object):
+    """
+    One node in the tree of changed paths.
+
+    A full node is changed together with everything below it. Otherwise only the children is changed.
+    For a sequence `shifts` is the (index, 1) or (index, -1) of each item that was added or removed, in
+    order, and all items from index `tail` and forward is changed.
+    """
+
+    __slots__ = ("full", "tail", "children", "shifts")
+
+    def __init__(self, full=False):
+        self.full = full
+        self.tail = None
+        self.children = {}
+        self.shifts = []
+
+    def child(self, key):
+        """
+        Return the node for key in the value of this node or None if nothing changed below key
+        """
+        if self.full:
+            return self
+
+        if self.tail is not None and isinstance(key, int) and key >= self.tail:
+            return _FULL
+
+        return self.children.get(u"{0}".format(key))
+
+    def shift(self, index, delta):
+        """
+        Record that a item was added at index, with delta 1, or removed from index, with delta -1. The
+        changed items after index is moved with the items.
+        """
+        self.shifts.append((index, delta))
+
+        if self.tail is not None and self.tail > index:
+            self.tail = index
+
+        children = {}
+
+        for token, node in self.children.items():
+            i = int(token)
+
+            if i > index or (i == index and delta > 0):
+                token = u"{0}".format(i + delta)
+            elif i == index:
+                continue
+
+            children[token] = node
+
+        self.children = children
+
+
+# Used for everything below a full node
+_FULL = _DirtyNode(full=True)
+
+
+def parse_pointer(pointer):
+    """
+    Split a RFC 6901 JSON pointer into a list of unescaped reference tokens. The empty pointer is the whole document.
+    """
+    if not is_string(pointer):
+        raise CoreError(u"JSON pointer must be a string: {0}".format(pointer))
+
+    if pointer == "":
+        return []
+
+    if not pointer.startswith("/"):
+        raise CoreError(u"JSON pointer must start with '/': {0}".format(pointer))
+
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer.split("/")[1:]]
+
+
+def _list_index(container, token, pointer, allow_end=False):
+    """
+    """
+    if token == "-" and allow_end:
+        return len(container)
+
+    if not token.isdigit() or (token != "0" and token.startswith("0")):
+        raise CoreError(u"Invalid sequence index '{0}' in JSON pointer: {1}".format(token, pointer))
+
+    index = int(token)
+
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise CoreError(u"Sequence index {0} is out of range in JSON pointer: {1}".format(index, pointer))
+
+    return index
+
+
+def _resolve(document, tokens, pointer):
+    """
+    Return the value that the tokens of pointer refers to in document
+    """
+    value = document
+
+    for token in tokens:
+        if isinstance(value, list):
+            value = value[_list_index(value, token, pointer)]
+        elif isinstance(value, dict) and token in value:
+            value = value[token]
+        else:
+            raise CoreError(u"Path do not exists in document: {0}".format(pointer))
+
+    return value
+
+
+def _move_errors(errors, old_path, new_path):
+    """
+    Return copies of errors found below the path string old_path with the paths moved to new_path
+    """
+    moved = []
+    start = len(old_path)
+
+    for error in errors:
+        args = error.args
+        prev_path = args.get("prev_path")
+
+        if prev_path is not None and (prev_path == old_path or prev_path.startswith(old_path + u"/")):
+            args["prev_path"] = new_path + prev_path[start:]
+
+        moved.append(SchemaError.SchemaErrorEntry(error.msg, new_path + error.path[start:], error.value, error.code, **args))
+
+    return moved
+
+
+def _reversed_keys(mapping):
+    """
+    """
+    try:
+        return reversed(mapping)
+    except TypeError:
+        # Dicts can only be reversed from python 3.8
+        return reversed(list(mapping))
+
+
+class IncrementalValidator(object):
+    """
+    Validates a document once and then only the parts of it that is changed by later edits.
+
+    The result of each value and rule is kept between the validations. For mappings and sequences it
+    includes a label for each key and item that keeps their order, the results of the keys and items
+    with errors, the unique indexes of the sequence and the number of keys that matches each regex key.
+    When the document is changed only the changed values, and the mappings and sequences that contains
+    them, is validated again and their state is updated with the changed keys and items. `required`,
+    `range`, `unique` and `ident` is checked against the kept state, so the time for an edit depends on
+    the size of the changed values, the depth of the document and the number of errors and not on the
+    number of keys and items in the containers above them.
+
+    `func` on a mapping or sequence is called with the whole value each time it is validated. Items
+    with a `func` rule below them is validated again when they are moved to another index, because the
+    function gets the path of the value.
+
+    The errors is always the same, in the same order, as when the whole document is validated again.
+    """
+
+    def __init__(self, compiled_schema, data):
+        """
+        :param compiled_schema:
+            The CompiledSchema object that the document is validated against.
+        :param data:
+            The document. Patches passed to revalidate() is applied to this object.
+        """
+        self.compiled_schema = compiled_schema
+        self.data = data
+
+        self._core = _IncrementalCore._from_compiled_schema(compiled_schema, data)
+        # True if the last validation failed, the kept results is not complete then
+        self._failed = False
+        self._validate(_DirtyNode(full=True))
+
+    @property
+    def errors(self):
+        """
+        All SchemaError.SchemaErrorEntry objects found in the current document
+        """
+        return list(self._core.errors)
+
+    def revalidate(self, changes, data=None):
+        """
+        Validate the parts of the document that is changed and return the errors for the whole document.
+
+        :param changes:
+            Either a RFC 6902 JSON patch, a list of operations like `{"op": "replace", "path": "/a/0", "value": 1}`,
+            that is applied to the document before it is validated, or a list of RFC 6901 JSON pointers to all
+            values that is already changed, added or removed in the document. For a pointer to a sequence item
+            all items after it is also validated again, because their index could have changed.
+            If a operation in a patch fails CoreError is raised and the operations before it is already applied
+            and validated.
+        :param data:
+            The changed document, if it is another object than the validated document. The
+            values that is not covered by the changes must be equal to the last validated document.
+        """
+        if data is not None:
+            self.data = data
+
+        root = _DirtyNode()
+
+        try:
+            for change in changes:
+                if isinstance(change, dict):
+                    self._apply(root, change)
+                else:
+                    self._mark(root, parse_pointer(change), tail=True)
+        except CoreError:
+            self._validate(root)
+            raise
+
+        return self._validate(root)
+
+    def _validate(self, root):
+        """
+        """
+        core = self._core
+
+        if self._failed:
+            root = _DirtyNode(full=True)
+
+        results = {}
+        core._child = (root, core._results, results, None)
+        core.source = self.data
+
+        self._failed = True
+        core._start_validate(self.data)
+        core._results = results
+        self._failed = False
+
+        return self.errors
+
+    def _mark(self, root, tokens, shift=0, tail=False):
+        """
+        Mark the value at tokens as changed. A shift of 1 or -1 means that the value was added to or
+        removed from its sequence, so the items after it is moved. With tail all items after the value
+        in its sequence is marked as changed as well.
+        """
+        node = root
+        value = self.data
+
+        for i, token in enumerate(tokens):
+            if node.full:
+                return
+
+            last = i == len(tokens) - 1
+
+            if isinstance(value, list):
+                index = len(value) if token == "-" else int(token) if token.isdigit() else None
+
+                if index is None:
+                    # Not a index in the sequence so the whole sequence is validated again
+                    break
+
+                token = u"{0}".format(index)
+
+                if last and tail:
+                    node.tail = index if node.tail is None else min(node.tail, index)
+                    return
+
+                if last and shift:
+                    node.shift(index, shift)
+
+                    if shift < 0:
+                        return
+
+                value = value[index] if index < len(value) else None
+            else:
+                value = value.get(token) if isinstance(value, dict) else None
+
+            node = node.children.setdefault(token, _DirtyNode())
+
+        node.full = True
+        node.tail = None
+        node.children = {}
+        node.shifts = []
+
+    def _apply(self, root, operation):
+        """
+        Apply one RFC 6902 operation to the document and mark the values it changes
+        """
+        op = operation.get("op")
+        pointer = operation.get("path")
+        tokens = parse_pointer(pointer)
+
+        if op == "test":
+            if _resolve(self.data, tokens, pointer) != operation.get("value"):
+                raise CoreError(u"Test operation failed for path: {0}".format(pointer))
+            return
+
+        if op in ("add", "replace"):
+            if "value" not in operation:
+                raise CoreError(u"Operation '{0}' is missing value: {1}".format(op, pointer))
+            value = operation["value"]
+        elif op in ("move", "copy"):
+            from_pointer = operation.get("from")
+            from_tokens = parse_pointer(from_pointer)
+            value = _resolve(self.data, from_tokens, from_pointer)
+
+            if op == "move":
+                if tokens[:len(from_tokens)] == from_tokens and tokens != from_tokens:
+                    raise CoreError(u"Can't move a value into itself: {0} to {1}".format(from_pointer, pointer))
+
+                self._remove(from_tokens, from_pointer)
+                self._mark(root, from_tokens, shift=-1)
+            else:
+                value = copy.deepcopy(value)
+
+            op = "add"
+        elif op != "remove":
+            raise CoreError(u"Unknown JSON patch operation '{0}' for path: {1}".format(op, pointer))
+
+        if not tokens:
+            if op == "remove":
+                raise CoreError(u"Can't remove the whole document")
+
+            self.data = value
+            self._mark(root, tokens)
+            return
+
+        container = _resolve(self.data, tokens[:-1], pointer)
+        token = tokens[-1]
+
+        # The values is marked after they are changed so nothing is marked for a operation that fails
+        if op == "remove":
+            self._remove(tokens, pointer)
+            self._mark(root, tokens, shift=-1)
+        elif isinstance(container, list):
+            if op == "add":
+                index = _list_index(container, token, pointer, allow_end=True)
+                container.insert(index, value)
+                self._mark(root, tokens[:-1] + [u"{0}".format(index)], shift=1)
+            else:
+                index = _list_index(container, token, pointer)
+                container[index] = value
+                self._mark(root, tokens)
+        elif isinstance(container, dict):
+            if op == "replace" and token not in container:
+                raise CoreError(u"Path do not exists in document: {0}".format(pointer))
+
+            container[token] = value
+            self._mark(root, tokens)
+        else:
+            raise CoreError(u"Path do not exists in document: {0}".format(pointer))
+
+    def _remove(self, tokens, pointer):
+        """
+        """
+        container = _resolve(self.data, tokens[:-1], pointer)
+        token = tokens[-1]
+
+        if isinstance(container, list):
+            del container[_list_index(container, token, pointer)]
+        elif isinstance(container, dict) and token in container:
+            del container[token]
+        else:
+            raise CoreError(u"Path do not exists in document: {0}".format(pointer))
+
+
+class _Result(object):
+    """
+    The errors found when a value was validated against a rule. `children` is the results of the rules
+    that was validated against the same value, like a included partial schema, and `state` is the state
+    of a mapping or sequence.
+    """
+
+    __slots__ = ("errors", "children", "state")
+
+    def __init__(self):
+        self.errors = None
+        self.children = None
+        self.state = None
+
+
+class _Item(object):
+    """
+    The result of one item in a sequence.
+
+    `index` is the index the item was validated at and `tried` the number of rules that was tried.
+    `results` is the results of the rules by id() of the rule, or None if the item was moved to
+    another index after it was validated. `errors` is the errors of the item if it failed.
+    """
+
+    __slots__ = ("index", "tried", "results", "errors")
+
+    def __init__(self, index, tried, results, errors):
+        self.index = index
+        self.tried = tried
+        self.results = results
+        self.errors = errors
+
+
+class _LabelIndex(object):
+    """
+    The labels of the items where each value was found, for one unique constraint in a sequence.
+    `duplicates` is the sorted labels of all items where the value was already found in a earlier item.
+    """
+
+    __slots__ = ("table", "duplicates")
+
+    def __init__(self):
+        self.table = {}
+        self.duplicates = []
+
+    def add(self, val, label):
+        """
+        Raises TypeError if val can't be hashed
+        """
+        labels = self.table.get(val)
+
+        if labels is None:
+            self.table[val] = [label]
+            return
+
+        i = bisect_left(labels, label)
+        labels.insert(i, label)
+        insort(self.duplicates, labels[1] if i == 0 else label)
+
+    def remove(self, val, label):
+        """
+        """
+        labels = self.table[val]
+        i = bisect_left(labels, label)
+        del labels[i]
+
+        if not labels:
+            del self.table[val]
+            return
+
+        # The item after the removed first item is no longer a duplicate
+        duplicate = labels[0] if i == 0 else label
+        del self.duplicates[bisect_left(self.duplicates, duplicate)]
+
+    def relabel(self, labels):
+        """
+        """
+        self.table = dict((val, [labels[label] for label in found]) for val, found in self.table.items())
+        self.duplicates = [labels[label] for label in self.duplicates]
+
+
+class _SequenceState(object):
+    """
+    What is kept of a sequence between validations.
+
+    Each item has a label that is larger than the labels of the items before it, labels is kept when
+    items is added or removed so the index of a item is found from its label. The results of the items
+    is kept by label, `failed` is the sorted labels of the items that failed. The unique values of each
+    item is kept in one index for each unique constraint. If a unique value can't be hashed the indexes
+    is dropped and the unique constraints is checked against all items.
+    """
+
+    __slots__ = ("labels", "items", "failed", "values", "scalar_index", "key_indexes", "unhashable")
+
+    def __init__(self, length, scalar_unique, unique_keys):
+        self.labels = [i * _LABEL_GAP for i in range(length)]
+        self.items = {}
+        self.failed = []
+        self.values = {} if scalar_unique or unique_keys else None
+        self.scalar_index = _LabelIndex() if scalar_unique else None
+        self.key_indexes = [(k, _LabelIndex()) for k in unique_keys]
+        self.unhashable = False
+
+    def index(self, label):
+        """
+        """
+        return bisect_left(self.labels, label)
+
+    def update(self, node, length):
+        """
+        Add and remove the items that was added and removed in node. Returns False if the
+        number of items is not length afterwards.
+        """
+        labels = self.labels
+
+        for index, delta in node.shifts:
+            if delta > 0 and index <= len(labels):
+                self.insert(index)
+            elif delta < 0 and index < len(labels):
+                self.remove(index)
+            else:
+                return False
+
+        if node.tail is not None:
+            while len(labels) > node.tail:
+                self.remove(len(labels) - 1)
+
+            while len(labels) < length:
+                self.insert(len(labels))
+
+        return len(labels) == length
+
+    def insert(self, index):
+        """
+        """
+        labels = self.labels
+
+        if not labels:
+            label = 0
+        elif index == len(labels):
+            label = labels[-1] + _LABEL_GAP
+        elif index == 0:
+            label = labels[0] - _LABEL_GAP
+        else:
+            if labels[index] - labels[index - 1] < 2:
+                self.relabel()
+
+            label = (labels[index - 1] + labels[index]) // 2
+
+        labels.insert(index, label)
+
+    def remove(self, index):
+        """
+        """
+        label = self.labels.pop(index)
+        self.set_item(label, None)
+        self.unset_values(label)
+
+    def relabel(self):
+        """
+        Give all items new labels with the same distance between them
+        """
+        labels = dict((label, i * _LABEL_GAP) for i, label in enumerate(self.labels))
+
+        # The list is changed in place because the callers can hold it
+        self.labels[:] = [labels[label] for label in self.labels]
+        self.items = dict((labels[label], item) for label, item in self.items.items())
+        self.failed = [labels[label] for label in self.failed]
+
+        if self.values is not None:
+            self.values = dict((labels[label], values) for label, values in self.values.items())
+
+            for index in self._indexes():
+                index.relabel(labels)
+
+    def set_item(self, label, item):
+        """
+        """
+        old = self.items.pop(label, None)
+
+        if old is not None and old.errors is not None:
+            del self.failed[bisect_left(self.failed, label)]
+
+        if item is not None:
+            self.items[label] = item
+
+            if item.errors is not None:
+                insort(self.failed, label)
+
+    def _indexes(self):
+        """
+        """
+        if self.scalar_index is not None:
+            yield self.scalar_index
+
+        for k, index in self.key_indexes:
+            yield index
+
+    def set_values(self, label, item):
+        """
+        Add the unique values of item
+        """
+        if self.values is None:
+            return
+
+        scalar = item if self.scalar_index is not None else None
+        keys = tuple([item.get(k) for k, index in self.key_indexes]) if isinstance(item, dict) else ()
+
+        if scalar is None and keys.count(None) == len(keys):
+            return
+
+        try:
+            if scalar is not None:
+                self.scalar_index.add(scalar, label)
+
+            for (k, index), val in zip(self.key_indexes, keys):
+                if val is not None:
+                    index.add(val, label)
+        except TypeError:
+            self.values = self.scalar_index = None
+            self.key_indexes = []
+            self.unhashable = True
+            return
+
+        self.values[label] = (scalar, keys)
+
+    def unset_values(self, label):
+        """
+        Remove the unique values of the item with label
+        """
+        if self.values is None or label not in self.values:
+            return
+
+        scalar, keys = self.values.pop(label)
+
+        if scalar is not None:
+            self.scalar_index.remove(scalar, label)
+
+        for (k, index), val in zip(self.key_indexes, keys):
+            if val is not None:
+                index.remove(val, label)
+
+    def unique_errors(self, core, value, path):
+        """
+        The errors for all duplicate values, in the same order as Core._validate_sequence_unique() finds them
+        """
+        errors = []
+
+        if self.scalar_index is not None:
+            for label in self.scalar_index.duplicates:
+                scalar = self.values[label][0]
+                first = self.index(self.scalar_index.table[scalar][0])
+                errors.append(core._unique_error(value, (path, self.index(label)), scalar, (path, first)))
+
+        for n, (k, index) in enumerate(self.key_indexes):
+            for label in index.duplicates:
+                val = self.values[label][1][n]
+                first = self.index(index.table[val][0])
+                errors.append(core._unique_error(value, ((path, self.index(label)), k), val, ((path, first), k)))
+
+        return errors
+
+
+class _MappingState(object):
+    """
+    What is kept of a mapping between validations.
+
+    Each key has a label that is larger than the labels of the keys before it. The results and errors of
+    the keys with errors is kept by key, `failed` is the sorted (label, key) of the keys with errors. For
+    a mapping with regex keys the regex rules that matches each key and the number of keys that matches
+    each regex rule is kept.
+    """
+
+    __slots__ = ("labels", "next_label", "keys", "failed", "regex_matches", "regex_counts", "plain")
+
+    def __init__(self):
+        self.labels = {}
+        self.next_label = 0
+        self.keys = {}
+        self.failed = []
+        self.regex_matches = {}
+        self.regex_counts = {}
+        # True if all keys is strings, so they can be found from the changed paths
+        self.plain = True
+
+    def add(self, k, match_regex_key, regex_matches=None):
+        """
+        Add k as the last key
+        """
+        self.labels[k] = self.next_label
+        self.next_label += 1
+
+        if not is_string(k):
+            self.plain = False
+
+        if match_regex_key is None:
+            return
+
+        if regex_matches is None:
+            regex_matches = match_regex_key(str(k))
+
+        if regex_matches:
+            self.regex_matches[k] = regex_matches
+
+            for regex_rule in regex_matches:
+                self.regex_counts[regex_rule] = self.regex_counts.get(regex_rule, 0) + 1
+
+    def remove(self, k):
+        """
+        """
+        self.set_key(k, None, None)
+        del self.labels[k]
+
+        for regex_rule in self.regex_matches.pop(k, ()):
+            self.regex_counts[regex_rule] -= 1
+
+            if not self.regex_counts[regex_rule]:
+                del self.regex_counts[regex_rule]
+
+    def move_last(self, k):
+        """
+        Give k a new label after all other keys
+        """
+        kept = self.keys.get(k)
+        self.set_key(k, None, None)
+        self.labels[k] = self.next_label
+        self.next_label += 1
+
+        if kept is not None:
+            self.set_key(k, *kept)
+
+    def set_key(self, k, results, errors):
+        """
+        """
+        old = self.keys.pop(k, None)
+
+        if old is not None and old[1]:
+            del self.failed[bisect_left(self.failed, (self.labels[k], ))]
+
+        if results or errors:
+            self.keys[k] = (results, errors)
+
+            if errors:
+                insort(self.failed, (self.labels[k], k))
+
+    def update(self, node, value, match_regex_key):
+        """
+        Remove the changed keys that no longer exists in value and add the changed keys that is new.
+        Returns False if the keys can't be found from the changed paths or if a new key is not last.
+        """
+        if not self.plain:
+            return False
+
+        changed = node.children
+
+        for k in changed:
+            if k not in value and k in self.labels:
+                self.remove(k)
+
+        # A key that is removed and added again is last in the mapping, so all changed keys
+        # at the end of the mapping is given new labels in their current order
+        last_keys = []
+
+        for k in _reversed_keys(value):
+            if not is_string(k) or k not in changed:
+                break
+            last_keys.append(k)
+
+        for k in reversed(last_keys):
+            if k in self.labels:
+                self.move_last(k)
+            else:
+                self.add(k, match_regex_key)
+
+        return all(k in self.labels for k in changed if k in value) and len(self.labels) == len(value)
+
+
+class _IncrementalCore(Core):
+    """
+    Core that keeps the result of each value and rule and reuses them for the values that is not changed.
+    """
+
+    def _init_state(self, compiled_schema, source, max_errors=None):
+        """
+        """
+        super(_IncrementalCore, self)._init_state(compiled_schema, source, max_errors)
+
+        # The results below a memoized value is needed when only a part of it is changed
+        self.memo = None
+
+        # The results of the root value by id() of the rule
+        self._results = {}
+        # (dirty node, results from the last validation, results of this validation, id() of the rules
+        # that was tried last time or None if all was tried) of the values that is validated next
+        self._child = None
+        # (dirty node, result from the last validation, result of this validation) of the value that is validated now
+        self._frame = None
+        # Values with these rules can be moved to another path without validating them again, because
+        # no func below them gets the path
+        self._movable = pure_rules(self.root_rule, self.partial_schemas, impure=lambda rule: bool(rule.func))
+
+    def _validate(self, value, rule, path, done):
+        """
+        Reuse the result from the last validation if nothing below the value is changed. Otherwise the
+        value is validated again and the result is kept if it has errors or any state.
+        """
+        node, last_results, results, tried = self._child
+        last = last_results.get(id(rule)) if last_results else None
+
+        if node is None:
+            # Nothing below this value is changed so the errors from the last validation is reused
+            if last is not None:
+                self.errors.extend(last.errors)
+                results[id(rule)] = last
+            return
+
+        if id(rule) in results:
+            # The same rule is used twice for the same value, like in a sequence with matching 'all'
+            self.errors.extend(results[id(rule)].errors)
+            return
+
+        start = len(self.errors)
+
+        if rule.sequence is None and rule.mapping is None and rule.include_name is None:
+            # Nothing below a scalar is validated so only the errors is kept
+            super(_IncrementalCore, self)._validate(value, rule, path, done)
+
+            if len(self.errors) > start:
+                res = results[id(rule)] = _Result()
+                res.errors = self.errors[start:]
+            return
+
+        if node.full or (tried is not None and id(rule) not in tried):
+            # A rule in a sequence with matching 'any' that was not tried last time has no result to reuse
+            node = _FULL
+            last = None
+
+        res = _Result()
+        same = {}
+        child, frame = self._child, self._frame
+        self._child = (node, last.children if last is not None else None, same, None)
+        self._frame = (node, last, res)
+
+        try:
+            super(_IncrementalCore, self)._validate(value, rule, path, done)
+        finally:
+            self._child, self._frame = child, frame
+
+        if same:
+            res.children = same
+
+        if len(self.errors) > start or res.children is not None or res.state is not None:
+            res.errors = self.errors[start:]
+            results[id(rule)] = res
+
+    def _is_movable(self, rule):
+        """
+        True if the items in a sequence with rule can be moved to another index without validating them again
+        """
+        for r in rule.sequence:
+            if r.sequence is None and r.mapping is None and r.include_name is None:
+                if r.func:
+                    return False
+            elif id(r) not in self._movable:
+                return False
+
+        return True
+
+    def _validate_sequence(self, value, rule, path, done=None):
+        """
+        Validate only the changed items in the sequence and update the state of the sequence with them
+        """
+        node, last, res = self._frame
+
+        if len(rule.sequence) <= 0 or not isinstance(value, list):
+            super(_IncrementalCore, self)._validate_sequence(value, rule, path, done)
+            return
+
+        # Handle 'func' argument on this sequence
+        self._handle_func(value, rule, path, done)
+
+        movable = self._is_movable(rule)
+        state = last.state if last is not None else None
+
+        if state is not None:
+            # The state is changed in place and belongs to the new result
+            last.state = None
+
+            if not state.update(node, len(value)):
+                state = None
+                node = _FULL
+
+        if state is None:
+            state = _SequenceState(len(value), *self._sequence_unique_keys(rule))
+
+            # The unique values of the items that is not validated again
+            if not node.full and state.values is not None:
+                for label, item in zip(state.labels, value):
+                    state.set_values(label, item)
+
+        if node.full:
+            changed = range(len(value))
+        else:
+            changed = set(int(token) for token in node.children if int(token) < len(value))
+            start = len(value) if node.tail is None else node.tail
+
+            # Items where a func gets the path is validated again when they are moved
+            if node.shifts and not movable:
+                start = min(start, min(index for index, delta in node.shifts))
+
+            changed.update(range(start, len(value)))
+            changed = sorted(changed)
+
+        any_matching = rule.matching == "any"
+
+        for i in changed:
+            label = state.labels[i]
+            item = value[i]
+            old = state.items.get(label)
+            item_node = node.child(i)
+
+            if item_node is None or (old is not None and (old.index != i or old.results is None)):
+                item_node = _FULL
+
+            tried = None
+            if any_matching and not item_node.full:
+                tried = tuple(id(r) for r in rule.sequence[:1 if old is None else old.tried])
+
+            results = {}
+            self._child = (item_node, old.results if old is not None else None, results, tried)
+            ok, processed = self._validate_sequence_item(item, rule, path, i, done)
+
+            errors = None if ok else [e for _errors in processed for e in _errors]
+            state.set_item(label, _Item(i, len(processed), results, errors) if results or errors else None)
+            state.unset_values(label)
+            state.set_values(label, item)
+
+        if len(value) > 0:
+            if state.unhashable:
+                self._validate_sequence_unique(value, rule, path)
+            else:
+                self.errors.extend(state.unique_errors(self, value, path))
+
+        for label in state.failed:
+            item = state.items[label]
+            i = state.index(label)
+
+            if item.index != i:
+                # The item was moved by items added or removed before it
+                item.errors = _move_errors(item.errors, join_path((path, item.index)), join_path((path, i)))
+                item.index = i
+                item.results = None
+
+            self.errors.extend(item.errors)
+
+        if rule.range is not None:
+            rr = rule.range
+
+            self._validate_range(
+                rr.get("max"),
+                rr.get("min"),
+                rr.get("max-ex"),
+                rr.get("min-ex"),
+                len(value),
+                path,
+                "seq",
+            )
+
+        if state.items or len(value) > MIN_STATE_WIDTH:
+            res.state = state
+
+    def _adds_default(self, value, rule):
+        """
+        True if any missing key in value gets a default value
+        """
+        for k, rr in rule.mapping.items():
+            if k in value:
+                continue
+
+            if rr.include_name is not None:
+                rr = self.partial_schemas.get(rr.include_name, rr)
+
+            if rr.default is not None:
+                return True
+
+        return False
+
+    def _validate_mapping(self, value, rule, path, done=None):
+        """
+        Validate only the changed keys in the mapping and update the state of the mapping with them
+        """
+        node, last, res = self._frame
+
+        if not isinstance(value, dict) or rule.mapping is None:
+            super(_IncrementalCore, self)._validate_mapping(value, rule, path, done)
+            return
+
+        # Handle 'func' argument on this mapping
+        self._handle_func(value, rule, path, done)
+
+        match_regex_key = rule.regex_mappings_matcher if rule.regex_mappings else None
+        state = last.state if last is not None else None
+
+        if state is not None:
+            # The state is changed in place and belongs to the new result
+            last.state = None
+
+        if state is not None and not node.full and not self._adds_default(value, rule) and state.update(node, value, match_regex_key):
+            regex_key_matches = self._validate_mapping_keys(value, rule, path, set(state.regex_counts))
+
+            if regex_key_matches is None:
+                return
+
+            for k in sorted((k for k in node.children if k in value), key=state.labels.get):
+                kept = state.keys.get(k)
+                start = len(self.errors)
+                results = self._validate_mapping_key(value, k, rule, path, node.child(k), kept, regex_key_matches, done)
+                state.set_key(k, results, self.errors[start:])
+                del self.errors[start:]
+
+            for label, k in state.failed:
+                self.errors.extend(state.keys[k][1])
+        else:
+            # All keys is visited. The keys that gets a default value is validated as new keys.
+            missing = [k for k in rule.mapping if k not in value]
+            regex_key_matches = self._validate_mapping_keys(value, rule, path)
+
+            if regex_key_matches is None:
+                return
+
+            added = set(k for k in missing if k in value)
+            last_state = state
+            kept_keys = []
+
+            for k in value:
+                key_node = node.child(k)
+                kept = last_state.keys.get(k) if last_state is not None else None
+
+                if key_node is None and k not in added and (last_state is None or k in last_state.labels):
+                    # The key is not changed
+                    if kept is not None:
+                        kept_keys.append((k, kept[0], kept[1]))
+                        self.errors.extend(kept[1] or ())
+                    continue
+
+                start = len(self.errors)
+                results = self._validate_mapping_key(value, k, rule, path, key_node or _FULL, kept, regex_key_matches, done)
+
+                if results or len(self.errors) > start:
+                    kept_keys.append((k, results, self.errors[start:]))
+
+            if not kept_keys and len(value) <= MIN_STATE_WIDTH:
+                return
+
+            state = _MappingState()
+
+            for k in value:
+                state.add(k, match_regex_key, regex_key_matches.get(k))
+
+            for k, results, errors in kept_keys:
+                state.set_key(k, results, errors)
+
+        if state.keys or len(value) > MIN_STATE_WIDTH:
+            res.state = state
+
+    def _validate_mapping_key(self, value, k, rule, path, node, kept, regex_key_matches, done):
+        """
+        Validate the value of key k in the mapping. Returns the results of the rules that was validated.
+        """
+        m = rule.mapping
+        results = {}
+        self._child = (node, kept[0] if kept is not None else None, results, None)
+
+        # If no other case was a match, check if a default mapping is valid/present and use
+        # that one instead
+        r = m.get(k, m.get('='))
+
+        if r is not None:
+            self._validate(value[k], r, (path, k), done)
+        else:
+            self._validate_mapping_regex_value(value, k, rule, path, regex_key_matches, done)
+
+        return results
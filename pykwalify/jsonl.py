@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+""" pyKwalify - jsonl.py """
+
+# python std lib
+import json
+import logging
+import time
+from collections import deque
+from itertools import islice
+
+# pyKwalify imports
+from pykwalify.compat import unicode
+from pykwalify.errors import CoreError
+
+log = logging.getLogger(__name__)
+
+# The schema used to validate chunks in a worker process
+_worker_schema = None
+
+
+def _init_worker(compiled_schema):
+    """
+    Store the schema in the worker process. The schema is compiled again in each worker
+    process when it is unpickled.
+    """
+    global _worker_schema
+    _worker_schema = compiled_schema
+
+
+def _validate_lines(lines, compiled_schema=None):
+    """
+    Validate a chunk of (line_number, line) tuples.
+
+    Returns a tuple with the number of validated records and a list of (line_number, errors)
+    tuples for all lines that failed.
+    """
+    schema = compiled_schema if compiled_schema is not None else _worker_schema
+    failed = []
+
+    for line_number, line in lines:
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            failed.append((line_number, [u"Unable to parse line as json: {0}".format(e)]))
+            continue
+
+        errors = [unicode(e) for e in schema.iter_errors(data)]
+
+        if errors:
+            failed.append((line_number, errors))
+
+    return len(lines), failed
+
+
+class JsonlValidator(object):
+    """
+    Validates JSON Lines streams where each line is one record that is validated against the same schema.
+
+    The stream is read in chunks of `chunk_size` lines. With `jobs` larger then 1 the chunks is
+    validated by a pool of worker processes and at most two chunks for each process is read ahead
+    of the results, so memory usage depends on the chunk size and not on the size of the stream.
+    """
+
+    def __init__(self, compiled_schema, chunk_size=1000, jobs=1):
+        """
+        :param compiled_schema:
+            The CompiledSchema object that each record is validated against.
+        """
+        if chunk_size < 1:
+            raise CoreError(u"chunk_size must be at least 1")
+
+        self.compiled_schema = compiled_schema
+        self.chunk_size = chunk_size
+        self.jobs = jobs
+        self.records = 0
+        self.failed_records = 0
+        self.elapsed = 0.0
+
+    @property
+    def records_per_second(self):
+        return self.records / self.elapsed if self.elapsed > 0 else 0.0
+
+    def _chunks(self, stream):
+        """
+        Split the stream into lists of (line_number, line) tuples. Empty lines is skipped.
+        """
+        lines = ((i, line) for i, line in enumerate(stream, 1) if line.strip())
+
+        while True:
+            chunk = list(islice(lines, self.chunk_size))
+
+            if not chunk:
+                return
+
+            yield chunk
+
+    def iter_errors(self, stream):
+        """
+        Validate all records in the stream.
+
+        Yields a tuple (line_number, errors) for each line that failed, in the same order as the lines
+        in the stream, as soon as the chunk that the line belongs to is validated. Line numbers start at 1.
+        """
+        self.records = 0
+        self.failed_records = 0
+        start = time.time()
+
+        def collect(result):
+            records, failed = result
+            self.records += records
+            self.failed_records += len(failed)
+            self.elapsed = time.time() - start
+            return failed
+
+        if self.jobs <= 1:
+            for chunk in self._chunks(stream):
+                for failed in collect(_validate_lines(chunk, self.compiled_schema)):
+                    yield failed
+            return
+
+        # multiprocessing.Pool is used because ProcessPoolExecutor only takes a initializer from python 3.7
+        from multiprocessing import Pool
+
+        with Pool(processes=self.jobs, initializer=_init_worker, initargs=(self.compiled_schema, )) as pool:
+            pending = deque()
+
+            for chunk in self._chunks(stream):
+                pending.append(pool.apply_async(_validate_lines, (chunk, )))
+
+                if len(pending) >= self.jobs * 2:
+                    for failed in collect(pending.popleft().get()):
+                        yield failed
+
+            while pending:
+                for failed in collect(pending.popleft().get()):
+                    yield failed
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+""" pyKwalify - loaders.py """
+
+# python std lib
+import logging
+import os
+
+# pyKwalify imports
+from pykwalify.compat import thread_yml
+from pykwalify.errors import CoreError
+
+log = logging.getLogger(__name__)
+
+# All loaders by name. A loader is a function (path, encoding) that returns the data in the file.
+loaders = {}
+
+# The name of the loader that is used for each file ending
+file_endings = {}
+
+
+def register_loader(name, func, endings=None):
+    """
+    Register a loader function with the signature (path, encoding) under name. Files with any of the
+    file endings in `endings` is loaded with this loader unless another loader is asked for.
+    """
+    loaders[name] = func
+
+    for ending in endings or []:
+        file_endings[ending] = name
+
+
+def get_loader(name):
+    """
+    Return the loader function that is registered under name
+    """
+    try:
+        return loaders[name]
+    except KeyError:
+        raise CoreError(u"Unknown loader: {0}. Available loaders is [{1}]".format(name, u", ".join(sorted(loaders))))
+
+
+def loader_for_file(path, name=None):
+    """
+    Return the loader function for path. If name is None the loader is selected by the file ending
+    and None is returned if no loader is registered for it.
+    """
+    if name is not None:
+        return get_loader(name)
+
+    name = file_endings.get(os.path.splitext(path)[1])
+    return None if name is None else loaders[name]
+
+
+def _read(path, encoding):
+    """
+    Read the content of path as bytes, or as text if a encoding is given
+    """
+    with open(path, "rb") as stream:
+        content = stream.read()
+
+    return content if encoding is None else content.decode(encoding)
+
+
+def load_json(path, encoding=None):
+    """
+    Load a json file. Without a encoding the bytes is passed directly to json and the encoding
+    is detected from the content, utf-8, utf-16 or utf-32.
+    """
+    import json
+    return json.loads(_read(path, encoding))
+
+
+def load_yaml(path, encoding=None):
+    """
+    Load a yaml file with the C based parser of ruamel.yaml if it is installed, otherwise with the pure python parser.
+    """
+    return thread_yml(pure=False).load(_read(path, encoding))
+
+
+def load_yaml_pure(path, encoding=None):
+    """
+    Load a yaml file with the pure python parser of ruamel.yaml
+    """
+    return thread_yml().load(_read(path, encoding))
+
+
+register_loader("json", load_json, [".json"])
+register_loader("yaml", load_yaml, [".yaml", ".yml"])
+register_loader("yaml-pure", load_yaml_pure)
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+
+""" pyKwalify - memo.py """
+
+# python std lib
+import logging
+import threading
+from collections import OrderedDict
+
+# pyKwalify imports
+from pykwalify.errors import SchemaError, join_path
+
+log = logging.getLogger(__name__)
+
+# Mappings and sequences with more keys or items than this is not memoized. Large values is seldom repeated
+# and the key of a value is built from all values below it, so a memoized root would build the key of the whole document.
+MAX_MEMO_WIDTH = 64
+
+# Mappings and sequences with more values than this in total, at all levels below them, is not memoized.
+# Building the key of such a value is stopped when the limit is reached, so the memo never keeps larger keys.
+MAX_MEMO_SIZE = 512
+
+# A rule is no longer memoized when this many values is looked up and less than MIN_HIT_RATE of them was found
+MIN_LOOKUPS = 100
+MIN_HIT_RATE = 0.25
+
+# Scalar types where equal values always is rendered the same in error messages
+_plain_scalar_types = frozenset([str, int, bool, type(None)])
+
+
+def _impure(rule):
+    """
+    True if the result of rule depends on more than the validated value or if it changes the value
+    """
+    return bool(rule.func) or rule.assertion is not None or rule.default is not None
+
+
+def _child_rules(rule, partial_schemas):
+    """
+    """
+    children = list(rule.sequence or [])
+    children.extend((rule.mapping or {}).values())
+    children.extend(rule.regex_mappings or [])
+
+    if rule.include_name is not None and rule.include_name in partial_schemas:
+        children.append(partial_schemas[rule.include_name])
+
+    return children
+
+
+def pure_rules(root_rule, partial_schemas, impure=_impure):
+    """
+    Return the set of id() of all mapping, sequence and include rules in the schema where no rule
+    in their subtree, including included partial schemas, uses func, assert or default. Another
+    test of which rules is impure can be given with impure.
+    """
+    rules = {}
+    stack = [root_rule] + list(partial_schemas.values())
+
+    while stack:
+        rule = stack.pop()
+        if id(rule) not in rules:
+            rules[id(rule)] = (rule, _child_rules(rule, partial_schemas))
+            stack.extend(rules[id(rule)][1])
+
+    # Rules in recursive partial schemas depends on themselves, so all rules starts as pure and
+    # rules is marked as impure until nothing changes
+    impure_ids = set(rule_id for rule_id, (rule, children) in rules.items() if impure(rule))
+    changed = True
+
+    while changed:
+        changed = False
+        for rule_id, (rule, children) in rules.items():
+            if rule_id not in impure_ids and any(id(c) in impure_ids for c in children):
+                impure_ids.add(rule_id)
+                changed = True
+
+    return set(
+        rule_id for rule_id, (rule, children) in rules.items()
+        if rule_id not in impure_ids and (rule.sequence is not None or rule.mapping is not None or rule.include_name is not None)
+    )
+
+
+class _Frozen(object):
+    """
+    The memo key of a mapping or sequence. The hash is only calculated once so the keys of
+    parents can be hashed without hashing all values below them again. The size is the number
+    of values at all levels in the key.
+    """
+
+    __slots__ = ("structure", "hash", "size")
+
+    def __init__(self, structure, size):
+        self.structure = structure
+        self.hash = hash(structure)
+        self.size = size
+
+    def __hash__(self):
+        return self.hash
+
+    def __eq__(self, other):
+        return other.__class__ is _Frozen and self.hash == other.hash and self.structure == other.structure
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+
+class KeyTooLarge(Exception):
+    """
+    Raised by freeze() when a key would have more values than the max size
+    """
+
+
+def freeze(value, frozen, max_size=None):
+    """
+    Build a hashable key from the structure and content of a mapping or sequence. Two values have equal
+    keys only if they have the same types, keys in the same order and values. Scalars of other types than
+    str, int, bool and None must also have the same repr(), so for example 0.0 and -0.0 is not equal.
+
+    The key of every mapping and sequence is stored in frozen by id() so it is only built once.
+    Raises TypeError if value contains a unhashable scalar, and KeyTooLarge if max_size is given
+    and value contains more than max_size values at all levels.
+    """
+    cached = frozen.get(id(value))
+
+    if cached is not None:
+        key = cached[1]
+        if max_size is not None and key.size > max_size:
+            raise KeyTooLarge()
+        return key
+
+    if isinstance(value, dict):
+        keys = tuple(value)
+        key_types = tuple(map(type, keys))
+        values = tuple(value.values())
+    else:
+        keys = key_types = None
+        values = tuple(value)
+
+    size = len(values)
+
+    if max_size is not None and size > max_size:
+        raise KeyTooLarge()
+
+    value_types = tuple(map(type, values))
+
+    # Mappings and sequences with only plain scalars is the common case and is built without a loop in python
+    if not _plain_scalar_types.issuperset(value_types):
+        items = []
+
+        for item, item_type in zip(values, value_types):
+            if item_type in _plain_scalar_types:
+                items.append(item)
+            elif isinstance(item, (dict, list)):
+                # The values below item can only use what is left of max_size
+                item = freeze(item, frozen, None if max_size is None else max_size - size)
+                size += item.size
+                items.append(item)
+            else:
+                # Unhashable values raises TypeError here instead of when the key is used
+                hash(item)
+                items.append((item, repr(item)))
+
+        values = tuple(items)
+
+    key = _Frozen((value.__class__, keys, key_types, values, value_types), size)
+
+    # The value is kept so its id() can't be reused by another object
+    frozen[id(value)] = (value, key)
+    return key
+
+
+class _ErrorTemplate(object):
+    """
+    A error found in a memoized subtree with its path relative to the root of the subtree
+    """
+
+    __slots__ = ("error", "keys", "args")
+
+    def __init__(self, error, keys, args):
+        self.error = error
+        self.keys = keys
+        self.args = args
+
+    def create(self, path):
+        """
+        Create the error for the subtree at path
+        """
+        error_path = path
+        for key in self.keys:
+            error_path = (error_path, key)
+
+        args = self.args
+        if "prev_path" in args:
+            args = dict(args, prev_path=join_path(path) + args["prev_path"])
+
+        return SchemaError.SchemaErrorEntry(self.error.msg, error_path, self.error.value, self.error.code, **args)
+
+
+def error_templates(errors, path):
+    """
+    Build templates for errors found in the subtree at path. Returns None if any error is outside
+    of the subtree, then the subtree can't be memoized.
+    """
+    templates = []
+    root = None
+
+    for error in errors:
+        keys = []
+        error_path = error._path
+
+        while error_path is not path:
+            if error_path.__class__ is not tuple:
+                return None
+            error_path, key = error_path
+            keys.append(key)
+
+        keys.reverse()
+        args = error.args
+
+        # The previous path of unique errors is stored relative to the root of the subtree
+        if "prev_path" in args:
+            if root is None:
+                root = join_path(path)
+            if not args["prev_path"].startswith(root):
+                return None
+            args["prev_path"] = args["prev_path"][len(root):]
+
+        templates.append(_ErrorTemplate(error, tuple(keys), args))
+
+    return templates
+
+
+class SubtreeMemo(object):
+    """
+    The errors found when a mapping or sequence is validated against a rule, remembered for the
+    last `max_entries` different (rule, value) pairs.
+
+    Only rules where no rule below them uses func, assert or default is memoized, because their
+    result do not only depend on the validated value. The same memo is shared by all threads that
+    validate data against the schema.
+    """
+
+    def __init__(self, max_entries, root_rule, partial_schemas):
+        """
+        """
+        self.max_entries = max_entries
+        self.rules = pure_rules(root_rule, partial_schemas)
+        self.hits = 0
+        self.misses = 0
+        # [lookups, hits] for each memoized rule
+        self._rule_stats = {}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        log.debug(u"Memoizing %s rules", len(self.rules))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, rule, value, frozen):
+        """
+        Return the memo key for value validated against rule, or None if value should not be memoized
+        because it is too large or contains unhashable scalars
+        """
+        if len(value) > MAX_MEMO_WIDTH:
+            return None
+
+        try:
+            return (id(rule), freeze(value, frozen, MAX_MEMO_SIZE))
+        except (TypeError, KeyTooLarge):
+            return None
+
+    def get(self, key):
+        """
+        Return the error templates for key or None if it is not memoized
+        """
+        with self._lock:
+            templates = self._entries.get(key)
+            stats = self._rule_stats.setdefault(key[0], [0, 0])
+            stats[0] += 1
+
+            if templates is None:
+                self.misses += 1
+
+                # Values of this rule is seldom repeated so the time to build the keys is wasted
+                if stats[0] >= MIN_LOOKUPS and stats[1] < stats[0] * MIN_HIT_RATE:
+                    self.rules.discard(key[0])
+                    log.debug(u"Stopped memoizing rule after %s lookups with %s hits", stats[0], stats[1])
+            else:
+                self.hits += 1
+                stats[1] += 1
+                self._entries.move_to_end(key)
+
+        return templates
+
+    def put(self, key, errors, path):
+        """
+        Remember the errors found when the value at path was validated. Nothing is remembered if
+        any error is outside of the value.
+        """
+        templates = error_templates(errors, path)
+
+        if templates is None:
+            return
+
+        with self._lock:
+            self._entries[key] = templates
+
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        """
+        with self._lock:
+            self._entries.clear()
+            self._rule_stats.clear()
+            self.hits = 0
+            self.misses = 0
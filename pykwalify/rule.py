@@ -4,10 +4,10 @@
 
 # python stdlib
 import logging
-import re
 
 # pykwalify imports
 from pykwalify.compat import basestring
+from pykwalify.compiler import EnumIndex, compile_assertion, compile_regex
 from pykwalify.errors import SchemaConflict, RuleError
 from pykwalify.types import (
     DEFAULT_TYPE,
@@ -32,16 +32,21 @@ class Rule(object):
     def __init__(self, schema=None, parent=None, strict_rule_validation=False):
         self._allowempty_map = None
         self._assertion = None
+        self._assertion_func = None
+        self._compiled = None
         self._default = None
         self._desc = None
         self._enum = None
+        self._enum_index = None
         self._example = None
         self._extensions = None
         self._format = None
         self._func = None
+        self._func_method = None
         self._ident = None
         self._include_name = None
         self._length = None
+        self._map_regex_regexp = None
         self._map_regex_rule = None
         self._mapping = None
         # Possible values: [any, all, *]
@@ -54,6 +59,7 @@ class Rule(object):
         self._pattern_regexp = None
         self._range = None
         self._regex_mappings = None
+        self._regex_mappings_matcher = None
         self._required = False
         self._schema = schema
         self._schema_str = schema
@@ -83,6 +89,22 @@ class Rule(object):
     def assertion(self, value):
         self._assertion = value
 
+    @property
+    def assertion_func(self):
+        return self._assertion_func
+
+    @assertion_func.setter
+    def assertion_func(self, value):
+        self._assertion_func = value
+
+    @property
+    def compiled(self):
+        return self._compiled
+
+    @compiled.setter
+    def compiled(self, value):
+        self._compiled = value
+
     @property
     def default(self):
         return self._default
@@ -107,6 +129,14 @@ class Rule(object):
     def enum(self, value):
         self._enum = value
 
+    @property
+    def enum_index(self):
+        return self._enum_index
+
+    @enum_index.setter
+    def enum_index(self, value):
+        self._enum_index = value
+
     @property
     def example(self):
         return self._example
@@ -139,6 +169,14 @@ class Rule(object):
     def func(self, value):
         self._func = value
 
+    @property
+    def func_method(self):
+        return self._func_method
+
+    @func_method.setter
+    def func_method(self, value):
+        self._func_method = value
+
     @property
     def ident(self):
         return self._ident
@@ -163,6 +201,14 @@ class Rule(object):
     def length(self, value):
         self._length = value
 
+    @property
+    def map_regex_regexp(self):
+        return self._map_regex_regexp
+
+    @map_regex_regexp.setter
+    def map_regex_regexp(self, value):
+        self._map_regex_regexp = value
+
     @property
     def map_regex_rule(self):
         return self._map_regex_rule
@@ -251,6 +297,14 @@ class Rule(object):
     def regex_mappings(self, value):
         self._regex_mappings = value
 
+    @property
+    def regex_mappings_matcher(self):
+        return self._regex_mappings_matcher
+
+    @regex_mappings_matcher.setter
+    def regex_mappings_matcher(self, value):
+        self._regex_mappings_matcher = value
+
     @property
     def required(self):
         return self._required
@@ -318,6 +372,30 @@ class Rule(object):
     def __str__(self):
         return "Rule: {0}".format(str(self.schema_str))
 
+    def __getstate__(self):
+        """
+        The compiled closures and the functions bound from assertions and extensions can't be
+        pickled. They are built again by compile_rule() and when the rule is unpickled. The enum
+        index is built again from the enum because its keys for bool items use a marker object
+        that only exists in this process.
+        """
+        state = self.__dict__.copy()
+        state["_compiled"] = None
+        state["_enum_index"] = None
+        state["_assertion_func"] = None
+        state["_func_method"] = None
+        state["_regex_mappings_matcher"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+        if self._enum is not None:
+            self._enum_index = EnumIndex(self._enum)
+
+        if self._assertion is not None:
+            self._assertion_func = compile_assertion(self._assertion)
+
     def keywords(self):
         """
         Returns a list of all keywords that this rule object has defined.
@@ -337,6 +415,7 @@ class Rule(object):
             ('ident', 'ident'),
             ('include_name', 'include'),
             ('length', 'length'),
+            ('map_regex_regexp', 'map_regex_regexp'),
             ('map_regex_rule', 'map_regex_rule'),
             ('mapping', 'mapping'),
             ('matching', 'matching'),
@@ -816,7 +895,7 @@ class Rule(object):
         # TODO: Some form of validation of the regexp? it exists in the source
 
         try:
-            self.pattern_regexp = re.compile(self.pattern)
+            self.pattern_regexp = compile_regex(self.pattern)
         except Exception:
             raise RuleError(
                 msg=u"Syntax error when compiling regex pattern: {0}".format(self.pattern_regexp),
@@ -844,7 +923,7 @@ class Rule(object):
                 path=path,
             )
 
-        lookup = set()
+        self.enum_index = EnumIndex()
         for item in v:
             if not isinstance(item, self.type_class):
                 raise RuleError(
@@ -853,15 +932,13 @@ class Rule(object):
                     path=path,
                 )
 
-            if item in lookup:
+            if not self.enum_index.add(item):
                 raise RuleError(
                     msg=u"Duplicate items: '{0}' found in enum".format(item),
                     error_key=u"enum.duplicate_items",
                     path=path,
                 )
 
-            lookup.add(item)
-
     def init_assert_value(self, v, rule, path):
         """
         """
@@ -883,6 +960,15 @@ class Rule(object):
                 path=path,
             )
 
+        try:
+            self.assertion_func = compile_assertion(self.assertion)
+        except SyntaxError:
+            raise RuleError(
+                msg=u"Syntax error when compiling assertion: {0}".format(self.assertion),
+                error_key=u"assert.syntax_error",
+                path=path,
+            )
+
     def init_range_value(self, v, rule, path):
         """
         """
@@ -1170,7 +1256,7 @@ class Rule(object):
                 else:
                     regex = regex[1]
                     try:
-                        re.compile(regex)
+                        regexp = compile_regex(regex)
                     except Exception as e:
                         log.debug(e)
                         raise RuleError(
@@ -1182,6 +1268,7 @@ class Rule(object):
                     regex_rule = Rule(None, self)
                     regex_rule.init(v, u"{0}/mapping;regex/{1}".format(path, regex[1:-1]))
                     regex_rule.map_regex_rule = regex[1:-1]
+                    regex_rule.map_regex_regexp = regexp
                     self.regex_mappings.append(regex_rule)
                     self.mapping[k] = regex_rule
             else:
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+
+""" pyKwalify - streaming.py """
+
+# python std lib
+import logging
+
+# pyKwalify imports
+from pykwalify.compat import new_yml
+from pykwalify.errors import CoreError, NotMappingError, NotSequenceError, SchemaError, join_path
+
+# 3rd party imports
+from ruamel.yaml.events import (
+    AliasEvent,
+    CollectionEndEvent,
+    CollectionStartEvent,
+    MappingEndEvent,
+    MappingStartEvent,
+    ScalarEvent,
+    SequenceEndEvent,
+    SequenceStartEvent,
+    StreamEndEvent,
+)
+
+log = logging.getLogger(__name__)
+
+MERGE_TAG = u"tag:yaml.org,2002:merge"
+
+
+class StreamValidator(object):
+    """
+    Validates a yaml stream against a CompiledSchema without loading the whole document.
+
+    The Rule tree is walked in step with the parse events from ruamel.yaml. Mappings and sequences
+    that can be checked one item at a time is never built as python objects, only scalars and the
+    subtrees that needs the whole value is built and validated with the compiled rules. That is
+    subtrees with a 'func', sequences with 'unique' or 'ident' values, regex mapping keys, yaml
+    anchors and values that do not have the type the rule expects.
+
+    Errors for mappings and sequences that is not built has None as value.
+    """
+
+    def __init__(self, compiled_schema, fail_fast=False, max_errors=None):
+        """
+        :param fail_fast:
+            Stop parsing the stream when the first error is found.
+        :param max_errors:
+            Stop parsing the stream when this number of errors is found.
+        """
+        self.compiled_schema = compiled_schema
+        self.max_errors = 1 if fail_fast else max_errors
+
+    def validate(self, stream):
+        """
+        Validate the single document in the stream and return a list with all found
+        SchemaError.SchemaErrorEntry objects.
+        """
+        from pykwalify.core import Core, _ErrorLimitReached
+
+        self.core = Core._from_compiled_schema(self.compiled_schema, None, max_errors=self.max_errors)
+        self.done = []
+
+        self.yml = new_yml()
+        self.constructor, self.parser = self.yml.get_constructor_parser(stream)
+        self.composer = self.yml.composer
+
+        try:
+            # Drop the STREAM-START event
+            self.parser.get_event()
+
+            if self.parser.check_event(StreamEndEvent):
+                raise CoreError(u"No data loaded from stream")
+
+            # Drop the DOCUMENT-START event
+            self.parser.get_event()
+            self._validate_node(self.compiled_schema.root_rule, u"")
+            # Drop the DOCUMENT-END event
+            self.parser.get_event()
+
+            if not self.parser.check_event(StreamEndEvent):
+                raise CoreError(u"Expected a single document in the stream")
+        except _ErrorLimitReached:
+            log.debug(u"Stopped validation after %s errors", self.max_errors)
+        finally:
+            self.parser.dispose()
+            self.yml._reader.reset_reader()
+            self.yml._scanner.reset_scanner()
+
+        return self.core.errors
+
+    def _build(self):
+        """
+        Build the next node in the stream as a python object
+        """
+        return self.constructor.construct_document(self.composer.compose_node(None, None))
+
+    def _skip(self):
+        """
+        Skip the next node in the stream without building it. Anchored nodes is still composed
+        so aliases to them can be used later in the stream.
+        """
+        event = self.parser.peek_event()
+
+        if not isinstance(event, AliasEvent) and event.anchor is not None:
+            self.composer.compose_node(None, None)
+            return
+
+        self.parser.get_event()
+
+        if isinstance(event, CollectionStartEvent):
+            while not self.parser.check_event(CollectionEndEvent):
+                self._skip()
+            self.parser.get_event()
+
+    def _resolve_include(self, rule):
+        """
+        Returns the partial schema rule that an include rule points to or None if it do not exist
+        """
+        while rule is not None and rule.include_name is not None:
+            rule = self.core.partial_schemas.get(rule.include_name)
+        return rule
+
+    def _can_stream_mapping(self, rule):
+        if rule.sequence is not None or rule.mapping is None or rule.regex_mappings or rule.func:
+            return False
+
+        # Missing partial schemas is reported from the mapping validation
+        return all(self._resolve_include(r) is not None for r in rule.mapping.values())
+
+    def _can_stream_sequence(self, rule):
+        if rule.sequence is None or len(rule.sequence) != 1 or rule.func:
+            return False
+
+        # Unique and ident values needs all items in the sequence
+        item_rule = rule.sequence[0]
+        if item_rule.unique:
+            return False
+        if item_rule.mapping is not None and any(r.unique or r.ident for r in item_rule.mapping.values()):
+            return False
+
+        return True
+
+    def _validate_node(self, rule, path):
+        """
+        Validate the next node in the stream against the rule
+        """
+        event = self.parser.peek_event()
+
+        # Nodes with a explicit tag or a anchor and all aliases is built as python objects
+        if not isinstance(event, (AliasEvent, ScalarEvent)) and event.anchor is None and event.tag is None:
+            target = self._resolve_include(rule)
+
+            if target is not None:
+                if isinstance(event, MappingStartEvent) and self._can_stream_mapping(target):
+                    self._validate_mapping(target, path)
+                    return
+                if isinstance(event, SequenceStartEvent) and self._can_stream_sequence(target):
+                    self._validate_sequence(target, path)
+                    return
+
+        self.core._validate(self._build(), rule, path, self.done)
+
+    def _validate_mapping(self, rule, path):
+        """
+        Same validation as Core._validate_mapping for mappings without regex keys or func
+        """
+        core = self.core
+        errors = core.errors
+        m = rule.mapping
+        start = len(errors)
+        seen = set()
+        merged = []
+
+        # Drop the MAPPING-START event
+        self.parser.get_event()
+
+        while not self.parser.check_event(MappingEndEvent):
+            key_node = self.composer.compose_node(None, None)
+
+            if str(key_node.tag) == MERGE_TAG:
+                merged.append(self._build())
+                continue
+
+            k = self.constructor.construct_document(key_node)
+
+            try:
+                if k in seen:
+                    raise CoreError(u"Duplicate key '{0}' found in mapping. Path: '{1}'".format(k, join_path(path)))
+                seen.add(k)
+            except TypeError:
+                raise CoreError(u"Mapping key '{0}' is not hashable. Path: '{1}'".format(k, join_path(path)))
+
+            r = m.get(k, m.get('='))
+
+            if r is None:
+                if not rule.allowempty_map:
+                    errors.append(SchemaError.SchemaErrorEntry(
+                        msg=u"Key '{key}' was not defined. Path: '{path}'",
+                        path=path,
+                        value=None,
+                        key=k,
+                        code=u"key_undefined"))
+                self._skip()
+            else:
+                self._validate_node(r, (path, k))
+
+        # Drop the MAPPING-END event
+        self.parser.get_event()
+
+        # Keys from merged mappings is only used if the key is not defined in the mapping itself
+        merged_values = {}
+        for merge in merged:
+            for d in (merge if isinstance(merge, list) else [merge]):
+                for k, v in d.items():
+                    if k not in seen and k not in merged_values:
+                        merged_values[k] = v
+
+        for k, v in merged_values.items():
+            seen.add(k)
+            r = m.get(k, m.get('='))
+
+            if r is not None:
+                core._validate(v, r, (path, k), self.done)
+            elif not rule.allowempty_map:
+                errors.append(SchemaError.SchemaErrorEntry(
+                    msg=u"Key '{key}' was not defined. Path: '{path}'",
+                    path=path,
+                    value=None,
+                    key=k,
+                    code=u"key_undefined"))
+
+        # Range and required keys is checked before the values in Core._validate_mapping so
+        # the errors is moved before the errors for the values in the mapping
+        checkpoint = len(errors)
+
+        if rule.range is not None:
+            r = rule.range
+            core._validate_range(r.get("max"), r.get("min"), r.get("max-ex"), r.get("min-ex"), len(seen), path, "map")
+
+        defaults = []
+
+        for k, rr in m.items():
+            resolved = self._resolve_include(rr)
+
+            if resolved.required and k not in seen and k != "=":
+                errors.append(SchemaError.SchemaErrorEntry(
+                    msg=u"Cannot find required key '{key}'. Path: '{path}'",
+                    path=path,
+                    value=None,
+                    key=k,
+                    code=u"required_nokey"))
+            if k not in seen and resolved.default is not None:
+                defaults.append((k, resolved.default))
+
+        if len(errors) > checkpoint:
+            mapping_errors = errors[checkpoint:]
+            del errors[checkpoint:]
+            errors[start:start] = mapping_errors
+
+        for k, default in defaults:
+            core._validate(default, m[k], (path, k), self.done)
+
+    def _validate_sequence(self, rule, path):
+        """
+        Same validation as Core._validate_sequence for sequences with one rule and no unique values
+        """
+        errors = self.core.errors
+        item_rule = rule.sequence[0]
+        # Errors for items in sequences with matching '*' is removed again so they can't stop the validation
+        discard = rule.matching == "*"
+        suspend = discard and self.max_errors is not None
+        i = 0
+
+        # Drop the SEQUENCE-START event
+        self.parser.get_event()
+
+        while not self.parser.check_event(SequenceEndEvent):
+            if discard:
+                checkpoint = len(errors)
+            if suspend:
+                errors.suspended += 1
+
+            try:
+                self._validate_node(item_rule, (path, i))
+            except (NotMappingError, NotSequenceError):
+                pass
+
+            if suspend:
+                errors.suspended -= 1
+            if discard:
+                del errors[checkpoint:]
+
+            i += 1
+
+        # Drop the SEQUENCE-END event
+        self.parser.get_event()
+
+        if rule.range is not None:
+            rr = rule.range
+            self.core._validate_range(rr.get("max"), rr.get("min"), rr.get("max-ex"), rr.get("min-ex"), i, path, "seq")
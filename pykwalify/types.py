@@ -5,7 +5,6 @@
 # python stdlib
 import datetime
 import re
-from ipaddress import IPv4Address, IPv4Network, IPv6Address, IPv6Network, AddressValueError, NetmaskValueError
 
 from pykwalify.compat import basestring, bytes
 
@@ -177,6 +176,10 @@ def is_ipv4(obj):
         # the ipaddress library will convert integers to IPs
         # but that's not a valid case in this scenario as we don't want to consider 1 as a valid IPv4
         return False
+
+    # ipaddress is only imported when a ip type is validated
+    from ipaddress import IPv4Address, AddressValueError
+
     try:
         IPv4Address(obj)
     except AddressValueError:
@@ -194,6 +197,9 @@ def is_ipv6(obj):
         # the ipaddress library will convert integers to IPs
         # but that's not a valid case in this scenario as we don't want to consider 1 as a valid IPv6
         return False
+
+    from ipaddress import IPv6Address, AddressValueError
+
     try:
         IPv6Address(obj)
     except AddressValueError:
@@ -219,6 +225,9 @@ def is_ipv4_cidr(obj):
         # the ipaddress library will convert integers to IPs
         # but that's not a valid case in this scenario as we don't want to consider 1 as a valid IPv4 network
         return False
+
+    from ipaddress import IPv4Network, AddressValueError, NetmaskValueError
+
     try:
         IPv4Network(obj, strict=True)
     except (AddressValueError, NetmaskValueError, ValueError):
@@ -236,6 +245,9 @@ def is_ipv6_cidr(obj):
         # the ipaddress library will convert integers to IPs
         # but that's not a valid case in this scenario as we don't want to consider 1 as a valid IPv6 network
         return False
+
+    from ipaddress import IPv6Network, AddressValueError, NetmaskValueError
+
     try:
         IPv6Network(obj, strict=True)
     except (AddressValueError, NetmaskValueError, ValueError):
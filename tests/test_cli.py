@@ -7,6 +7,9 @@ import sys
 # pykwalify package imports
 from pykwalify import cli
 
+# 3rd party imports
+import pytest
+
 
 class TestCLI(object):
 
@@ -26,7 +29,8 @@ class TestCLI(object):
         ]
 
         expected = {
-            '--data-file': str(input),
+            '--data-file': [str(input)],
+            '--jobs': 1,
             '--schema-file': [str(schema_file)],
             '--quiet': False,
             '--verbose': 1,
@@ -58,5 +62,140 @@ class TestCLI(object):
         ]
 
         cli_args = cli.parse_cli()
-        c = cli.run(cli_args)
-        assert c.validation_errors == []
+        results = cli.run(cli_args)
+        assert results == [(input, [])]
+
+    def test_run_cli_many_files(self, tmpdir, capsys):
+        """
+        Test that many data files, glob patterns and directories can be validated in one run
+        and that the result is reported in the same order as the files was specified.
+        """
+        schema_file = tmpdir.join("schema.yaml")
+        schema_file.write("type: seq\nsequence:\n  - type: str\n")
+
+        data = tmpdir.mkdir("data")
+        for i in range(12):
+            data.join("{0:02}.yaml".format(i)).write("- foo\n- {0}\n".format("bar" if i % 3 else i))
+        data.mkdir("sub").join("a.json").write('["foo"]')
+        data.join("ignored.txt").write("foo")
+        tmpdir.join("single.yaml").write("- foo\n")
+
+        expected = [(str(tmpdir.join("single.yaml")), []), (str(data.join("sub", "a.json")), [])]
+        for i in range(12):
+            errors = ["Value '{0}' is not of type 'str'. Path: '/1'".format(i)] if i % 3 == 0 else []
+            expected.append((str(data.join("{0:02}.yaml".format(i))), errors))
+
+        for jobs in ("1", "3"):
+            sys.argv = [
+                'scripts/pykwalify',
+                '-d', str(tmpdir.join("single.yaml")),
+                '-d', str(data.join("sub")),
+                '-d', str(data.join("*.yaml")),
+                '-d', str(tmpdir.join("single.yaml")),
+                '-s', str(schema_file),
+                '--jobs', jobs,
+            ]
+
+            results = cli.run(cli.parse_cli())
+            assert results == expected
+
+    def test_cli_entrypoint_exit_code(self, tmpdir):
+        """
+        The cli should exit with a non zero exit code if any data file fails to validate or can't be loaded
+        """
+        schema_file = tmpdir.join("schema.yaml")
+        schema_file.write("type: str")
+        tmpdir.join("ok.yaml").write("foo")
+        tmpdir.join("fail.yaml").write("1")
+
+        sys.argv = ['scripts/pykwalify', '-d', str(tmpdir.join("ok.yaml")), '-s', str(schema_file)]
+        cli.cli_entrypoint()
+
+        for data_file in ("fail.yaml", "missing.yaml"):
+            sys.argv = ['scripts/pykwalify', '-d', str(tmpdir.join("ok.yaml")), '-d', str(tmpdir.join(data_file)), '-s', str(schema_file)]
+            with pytest.raises(SystemExit) as ex:
+                cli.cli_entrypoint()
+            assert ex.value.code == 1
+
+        results = cli.run(cli.parse_cli())
+        assert results == [
+            (str(tmpdir.join("ok.yaml")), []),
+            (str(tmpdir.join("missing.yaml")), ["Provided source_file do not exists on disk: {0}".format(tmpdir.join("missing.yaml"))]),
+        ]
+
+    def test_run_cli_all_documents(self, tmpdir):
+        """
+        Test that all documents in multi-document yaml files is validated with --all-documents
+        """
+        schema_file = tmpdir.join("schema.yaml")
+        schema_file.write("type: str")
+        tmpdir.join("data.yaml").write("foo\n---\n1\n---\nbar\n---\n2\n")
+        tmpdir.join("data.json").write('"foo"')
+
+        sys.argv = [
+            'scripts/pykwalify',
+            '-d', str(tmpdir.join("data.yaml")),
+            '-d', str(tmpdir.join("data.json")),
+            '-s', str(schema_file),
+            '--all-documents',
+        ]
+
+        results = cli.run(cli.parse_cli())
+        assert results == [
+            (str(tmpdir.join("data.yaml")), [
+                "Document 1: Value '1' is not of type 'str'. Path: ''",
+                "Document 3: Value '2' is not of type 'str'. Path: ''",
+            ]),
+            (str(tmpdir.join("data.json")), []),
+        ]
+
+    def test_run_cli_jsonl(self, tmpdir):
+        """
+        Test that each line in .jsonl files is validated as one record
+        """
+        schema_file = tmpdir.join("schema.yaml")
+        schema_file.write("type: map\nmapping:\n  id:\n    type: int\n")
+        tmpdir.join("data.jsonl").write('{"id": 1}\n{"id": "a"}\n\n{"id": 3}\n{"id": "b"}\n')
+
+        for jobs in ("1", "2"):
+            sys.argv = ['scripts/pykwalify', '-d', str(tmpdir.join("data.jsonl")), '-s', str(schema_file), '-j', jobs]
+
+            results = cli.run(cli.parse_cli())
+            assert results == [
+                (str(tmpdir.join("data.jsonl")), [
+                    "Line 2: Value 'a' is not of type 'int'. Path: '/id'",
+                    "Line 5: Value 'b' is not of type 'int'. Path: '/id'",
+                ]),
+            ]
+
+    def test_run_cli_cache_dir(self, tmpdir):
+        """
+        Test that the parsed schema is cached and reused with --cache-dir
+        """
+        schema_file = tmpdir.join("schema.yaml")
+        schema_file.write("type: map\nmapping:\n  id:\n    type: int\n")
+        tmpdir.join("data.yaml").write("id: a\n")
+
+        for i in range(2):
+            sys.argv = ['scripts/pykwalify', '-d', str(tmpdir.join("data.yaml")), '-s', str(schema_file), '--cache-dir', str(tmpdir.join("cache"))]
+
+            results = cli.run(cli.parse_cli())
+            assert results == [(str(tmpdir.join("data.yaml")), ["Value 'a' is not of type 'int'. Path: '/id'"])]
+            assert len(tmpdir.join("cache").listdir()) == 1
+
+    def test_run_cli_loader(self, tmpdir):
+        """
+        Test that --loader selects the loader for all data files
+        """
+        schema_file = tmpdir.join("schema.yaml")
+        schema_file.write("type: map\nmapping:\n  id:\n    type: int\n")
+        tmpdir.join("data.txt").write('{"id": "a"}')
+
+        sys.argv = ['scripts/pykwalify', '-d', str(tmpdir.join("data.txt")), '-s', str(schema_file), '--loader', 'json']
+        results = cli.run(cli.parse_cli())
+        assert results == [(str(tmpdir.join("data.txt")), ["Value 'a' is not of type 'int'. Path: '/id'"])]
+
+        sys.argv = ['scripts/pykwalify', '-d', str(tmpdir.join("data.txt")), '-s', str(schema_file), '--loader', 'foo']
+        with pytest.raises(SystemExit) as ex:
+            cli.parse_cli()
+        assert str(ex.value) == "pykwalify: --loader must be one of json, yaml, yaml-pure"
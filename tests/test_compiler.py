@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+
+""" Unit test for pyKwalify - Compiler """
+
+# python std lib
+import json
+import pickle
+
+# pykwalify imports
+from pykwalify.compiler import EnumIndex, compile_regex, compile_regex_mappings, compile_rule, dedupe_rules
+from pykwalify.core import CompiledSchema, Core
+from pykwalify.rule import Rule
+
+
+def _errors(schema_data, data, **kwargs):
+    schema = CompiledSchema(schema_data=schema_data, **kwargs)
+    return [str(e) for e in schema.iter_errors(data)]
+
+
+class TestCompiler(object):
+
+    def test_compile_rule_tree(self):
+        r = Rule(schema={"type": "seq", "sequence": [{"type": "map", "mapping": {"foo": {"type": "str"}}}]})
+        check = compile_rule(r)
+
+        assert r.compiled is check
+        assert r.sequence[0].compiled is not None
+        assert r.sequence[0].mapping["foo"].compiled is not None
+
+        # Compiling a second time should reuse the already compiled closure
+        assert compile_rule(r) is check
+
+    def test_uncompiled_rule_is_compiled_on_first_use(self):
+        c = Core(source_data={}, schema_data={})
+        r = Rule(schema={"type": "int", "range": {"max": 5}})
+        assert r.compiled is None
+
+        c._validate(10, r, "", None)
+        assert r.compiled is not None
+        assert [str(e) for e in c.errors] == ["Type 'scalar' has size of '10', greater than max limit '5'. Path: ''"]
+
+    def test_scalar_checks(self):
+        assert _errors({"type": "str", "pattern": "^[a-z]+$"}, "foo") == []
+        assert _errors({"type": "str", "pattern": "^[a-z]+$"}, "Foo") == ["Value 'Foo' does not match pattern '^[a-z]+$'. Path: ''"]
+        assert _errors({"type": "str", "enum": ["foo", "bar"], "pattern": "^f"}, 1) == [
+            "Enum '1' does not exist. Path: '' Enum: ['foo', 'bar']",
+            "Value '1' is not of type 'str'. Path: ''",
+        ]
+        assert _errors({"type": "str", "length": {"max": 2}}, "foo") == ["Value: 'foo' has length of '3', greater than max limit '2'. Path: ''"]
+
+    def test_required_and_nullable(self):
+        schema = {"type": "map", "mapping": {"foo": {"type": "str", "required": True}, "bar": {"type": "str", "nullable": False}}}
+        assert sorted(_errors(schema, {"foo": None, "bar": None})) == ["nullable.novalue : '/bar'", "required.novalue : '/foo'"]
+
+    def test_ruby_style_regex(self):
+        schema = {"type": "str", "pattern": "/^[a-z]+$/"}
+
+        assert _errors(schema, "foo", fix_ruby_style_regex=True) == []
+        assert _errors(schema, "Foo", fix_ruby_style_regex=True) == ["Value 'Foo' does not match pattern '^[a-z]+$'. Path: ''"]
+        assert _errors(schema, "foo") == ["Value 'foo' does not match pattern '/^[a-z]+$/'. Path: ''"]
+
+    def test_shared_regex(self):
+        r = Rule(schema={
+            "type": "map",
+            "mapping": {
+                "foo": {"type": "str", "pattern": "^[a-z]+$"},
+                "bar": {"type": "str", "pattern": "^[a-z]+$"},
+                "regex;([a-z]+$)": {"type": "str"},
+            },
+        })
+
+        assert r.mapping["foo"].pattern_regexp is r.mapping["bar"].pattern_regexp
+        assert r.mapping["foo"].pattern_regexp is compile_regex("^[a-z]+$")
+        assert r.mapping["regex;([a-z]+$)"].map_regex_regexp is compile_regex("([a-z]+$)")
+
+    def test_regex_mapping_with_alternatives(self):
+        schema = {"type": "map", "mapping": {"regex;(^a$)|(^b$)": {"type": "int", "required": True}}}
+
+        assert _errors(schema, {"a": 1, "b": 2}) == []
+        assert _errors(schema, {"a": "foo"}) == ["Value 'foo' is not of type 'int'. Path: '/a'"]
+        assert _errors(schema, {"c": 1}) == [
+            "Cannot find required key 'regex;(^a$)|(^b$)'. Path: ''",
+            "Key 'c' does not match any regex '^a$)|(^b$'. Path: ''",
+        ]
+
+    def test_enum_index(self):
+        index = EnumIndex(["a", 1, 2.5, False, [1, 2], {"a": 1}])
+
+        assert "a" in index
+        assert 1 in index
+        assert 1.0 in index
+        assert 2.5 in index
+        assert False in index
+        assert [1, 2] in index
+        assert {"a": 1} in index
+
+        # bool values is not the same as the int values they compare equal to
+        assert True not in index
+        assert 0 not in index
+        assert [2, 1] not in index
+        assert "b" not in index
+
+        assert index.add(True)
+        assert not index.add(1)
+        assert not index.add([1, 2])
+
+    def test_enum_bool_is_not_int(self):
+        assert _errors({"type": "any", "enum": [1, "a"]}, 1) == []
+        assert _errors({"type": "any", "enum": [1, "a"]}, True) == ["Enum 'True' does not exist. Path: '' Enum: [1, 'a']"]
+        assert _errors({"type": "any", "enum": [True, [1]]}, [1]) == []
+        assert _errors({"type": "any", "enum": [True, [1]]}, 1) == ["Enum '1' does not exist. Path: '' Enum: [True, [1]]"]
+
+    def test_regex_mappings_matcher(self):
+        r = Rule(schema={
+            "type": "map",
+            "mapping": {
+                "regex;(^foo)": {"type": "str"},
+                "regex;(bar$)": {"type": "str"},
+                "regex;((a)\\2)": {"type": "str"},
+            },
+        })
+        foo, bar, backref = r.regex_mappings
+
+        match_key = compile_regex_mappings(r.regex_mappings)
+        assert match_key("foobar") == (foo, bar)
+        assert match_key("xbar") == (bar,)
+        assert match_key("xaa") == (backref,)
+        assert match_key("x") == ()
+
+        # Keys is only matched once
+        assert match_key("foobar") == (foo, bar)
+        assert match_key.cache_info().hits == 1
+        assert match_key.cache_info().currsize == 4
+
+        compile_rule(r)
+        assert r.regex_mappings_matcher is not None
+        assert r.mapping["regex;(^foo)"].regex_mappings_matcher is None
+
+    def test_regex_mappings_all(self):
+        schema = {
+            "type": "map",
+            "matching-rule": "all",
+            "mapping": {
+                "regex;(^foo)": {"type": "str", "required": True},
+                "regex;(bar$)": {"type": "str", "required": True},
+            },
+        }
+
+        assert _errors(schema, {"foobar": "a"}) == []
+        assert _errors(schema, {"foo": "a"}) == [
+            "Cannot find required key 'regex;(bar$)'. Path: ''",
+            "Key 'foo' does not match all regex '^foo' and 'bar$'. Path: ''",
+        ]
+        assert _errors(schema, {"foobar": "a", "foo": 1}) == [
+            "Value '1' is not of type 'str'. Path: '/foo'",
+            "Key 'foo' does not match all regex '^foo' and 'bar$'. Path: ''",
+        ]
+
+    def test_dedupe_rules(self):
+        schema = CompiledSchema(schema_data={
+            "schema;person": {
+                "type": "map",
+                "mapping": {"name": {"type": "str", "required": True}},
+            },
+            "type": "map",
+            "mapping": {
+                "a": {"type": "map", "mapping": {"name": {"type": "str", "required": True}}},
+                "b": {"type": "map", "mapping": {"name": {"type": "str", "required": True}}},
+                "c": {"type": "str", "required": True},
+                "d": {"type": "str"},
+                "e": {"type": "int", "enum": [1]},
+                "f": {"type": "bool", "enum": [True]},
+                "g": {"type": "int", "enum": [1]},
+                "regex;(^x)": {"type": "str"},
+            },
+        })
+        mapping = schema.root_rule.mapping
+
+        # Equal rules is shared, also with the partial schemas
+        assert mapping["a"] is mapping["b"]
+        assert mapping["a"] is schema.partial_schemas["person"]
+        assert mapping["a"].mapping["name"] is mapping["c"]
+        assert mapping["c"] is not mapping["d"]
+
+        # Values of different types is not equal, but the keyword values is shared
+        assert mapping["e"] is not mapping["f"]
+        assert mapping["e"] is mapping["g"]
+        assert mapping["d"].type is mapping["c"].type
+
+        # The regex rules is the same objects in the mapping and in regex_mappings
+        assert mapping["regex;(^x)"] is not mapping["d"]
+        assert schema.root_rule.regex_mappings[0] is mapping["regex;(^x)"]
+
+        assert _errors(schema.schema, {"a": {}, "b": {"name": 1}, "e": True, "f": 1, "xx": 1}) == [
+            "Cannot find required key 'c'. Path: ''",
+            "Cannot find required key 'name'. Path: '/a'",
+            "Value '1' is not of type 'str'. Path: '/b/name'",
+            "Enum 'True' does not exist. Path: '/e' Enum: [1]",
+            "Value 'True' is not of type 'int'. Path: '/e'",
+            "Enum '1' does not exist. Path: '/f' Enum: [True]",
+            "Value '1' is not of type 'bool'. Path: '/f'",
+            "Value '1' is not of type 'str'. Path: '/xx'",
+        ]
+
+    def test_dedupe_rules_report(self, tmpdir):
+        schema_data = {
+            "type": "seq",
+            "sequence": [{
+                "type": "map",
+                "mapping": dict(
+                    ("key{0}".format(i), {"type": "map", "mapping": {"name": {"type": "str", "pattern": "^[a-z]+$"}}})
+                    for i in range(20)
+                ),
+            }],
+        }
+        schema = CompiledSchema(schema_data=schema_data, rule_tree_report=True)
+        report = schema.rule_tree_report
+
+        assert (report.nodes_before, report.nodes_after) == (42, 4)
+        assert report.bytes_after < report.bytes_before / 4
+        assert str(report).startswith("Rule tree: 42 rules")
+
+        assert CompiledSchema(schema_data=schema_data).rule_tree_report is None
+
+        # The report is the same when the rules is loaded from the cache
+        schema_file = tmpdir.join("schema.json")
+        schema_file.write(json.dumps(schema_data))
+        cache_dir = str(tmpdir.join("cache"))
+        for i in range(2):
+            report = CompiledSchema(schema_files=[str(schema_file)], cache_dir=cache_dir, rule_tree_report=True).rule_tree_report
+            assert (report.nodes_before, report.nodes_after) == (42, 4)
+        assert CompiledSchema(schema_files=[str(schema_file)], cache_dir=cache_dir).rule_tree_report is None
+
+        # The shared rules is still shared after pickling
+        schema = pickle.loads(pickle.dumps(schema))
+        item = schema.root_rule.sequence[0]
+        assert item.mapping["key0"] is item.mapping["key19"]
+        assert [str(e) for e in schema.iter_errors([{"key3": {"name": "A"}}])] == [
+            "Value 'A' does not match pattern '^[a-z]+$'. Path: '/0/key3/name'",
+        ]
+
+    def test_dedupe_rules_unchanged(self):
+        r = Rule(schema={"type": "seq", "sequence": [{"type": "str"}]})
+        root_rule, report = dedupe_rules(r, {})
+
+        assert root_rule is r
+        assert report is None
@@ -3,12 +3,17 @@
 """ Unit test for pyKwalify - Core """
 
 # python std lib
+import copy
+import logging
 import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
 
 # pykwalify imports
 import pykwalify
-from pykwalify.core import Core
-from pykwalify.errors import SchemaError, CoreError
+from pykwalify.core import CompiledSchema, Core
+from pykwalify.errors import SchemaError, CoreError, RuleError
 
 # 3rd party imports
 import pytest
@@ -218,6 +223,440 @@ class TestCore(object):
         with pytest.raises(SchemaError):
             Core(source_data=True, schema_data={"type": "text"}).validate()
 
+    def test_compiled_schema(self):
+        """
+        A compiled schema should be reusable for any number of documents without keeping
+        any state between the validation runs.
+        """
+        schema = CompiledSchema(schema_data={"type": "seq", "sequence": [{"type": "str"}]})
+
+        assert schema.validate(["foo", "bar"]) == ["foo", "bar"]
+        assert list(schema.iter_errors(["foo", "bar"])) == []
+
+        errors = [str(e) for e in schema.iter_errors(["foo", 1, 2])]
+        assert errors == ["Value '1' is not of type 'str'. Path: '/1'", "Value '2' is not of type 'str'. Path: '/2'"]
+
+        with pytest.raises(SchemaError):
+            schema.validate([1])
+
+        assert schema.validate([1], raise_exception=False) == [1]
+
+        # No errors should leak over from the previous runs
+        assert list(schema.iter_errors(["foo"])) == []
+
+        # Core objects can share the same compiled schema
+        c = Core(source_data=["foo", 1], compiled_schema=schema)
+        c.validate(raise_exception=False)
+        assert c.validation_errors == ["Value '1' is not of type 'str'. Path: '/1'"]
+        assert c.root_rule is schema.root_rule
+
+        with pytest.raises(CoreError) as ex:
+            CompiledSchema()
+        assert "No schema file/data was loaded" in str(ex.value)
+
+    def test_compiled_schema_files(self):
+        schema = CompiledSchema(schema_files=[self.f("cli", "2b.yaml")])
+        c = Core(source_file=self.f("cli", "2a.yaml"), compiled_schema=schema)
+        c.validate(raise_exception=False)
+
+        assert c.validation_errors == [
+            "Value '1' is not of type 'str'. Path: '/0'", "Value '2' is not of type 'str'. Path: '/1'", "Value '3' is not of type 'str'. Path: '/2'"
+        ]
+
+    def test_sequence_matching_any_stops_at_first_match(self, tmpdir):
+        """
+        With matching 'any' the rest of the sequence rules should not be tried once one rule
+        matched an item, and errors from nested sequences must not leak between the rules.
+        """
+        ext_f = tmpdir.join("ext.py")
+        ext_f.write("calls = []\n\ndef track(value, rule_obj, path):\n    calls.append(path)\n    return True\n")
+
+        schema = CompiledSchema(
+            schema_data={
+                "type": "seq",
+                "matching": "any",
+                "sequence": [
+                    {"type": "seq", "sequence": [{"type": "str"}]},
+                    {"type": "seq", "sequence": [{"type": "int", "func": "track"}]},
+                ],
+            },
+            extensions=[str(ext_f)],
+        )
+        calls = schema.loaded_extensions[0].calls
+
+        assert list(schema.iter_errors([["a", "b"], ["c"]])) == []
+        assert calls == []
+
+        assert list(schema.iter_errors([[1, 2]])) == []
+        assert calls == ["/0/0", "/0/1"]
+
+        errors = sorted(str(e) for e in schema.iter_errors([[True]]))
+        assert errors == [
+            "Value 'True' is not of type 'int'. Path: '/0/0'",
+            "Value 'True' is not of type 'str'. Path: '/0/0'",
+        ]
+
+    def test_unique_unhashable_values(self):
+        """
+        Values that can't be hashed should still be checked for uniqueness
+        """
+        c = Core(source_data=[[1], {"a": 1}, [1], "foo"], schema_data={"type": "seq", "sequence": [{"type": "any", "unique": True}]})
+        c.validate(raise_exception=False)
+
+        assert c.validation_errors == ["Value '[1]' is not unique. Previous path: '/0'. Path: '/2'"]
+
+    def test_trace_logging(self, caplog, monkeypatch):
+        """
+        Tracing is only done when debug logging is enabled when the validation starts
+        """
+        # init_logging() from the cli tests disables all existing loggers
+        monkeypatch.setattr(logging.getLogger("pykwalify.core"), "disabled", False)
+
+        schema = CompiledSchema(schema_data={
+            "type": "seq",
+            "matching": "*",
+            "sequence": [{"type": "map", "mapping": {"foo": {"type": "int", "range": {"max": 5}}}}],
+        })
+        data = [{"foo": 1}, {"foo": 10}]
+
+        with caplog.at_level(logging.WARNING, logger="pykwalify"):
+            assert list(schema.iter_errors(data)) == []
+        assert not [r for r in caplog.records if r.levelno == logging.DEBUG]
+
+        with caplog.at_level(logging.DEBUG, logger="pykwalify"):
+            assert list(schema.iter_errors(data)) == []
+        assert "Validate mapping" in caplog.messages
+        assert " * * rule 1 : True" in caplog.messages
+
+    def test_pickle_compiled_schema(self, tmpdir):
+        """
+        A pickled compiled schema is compiled again when it is unpickled
+        """
+        ext = tmpdir.join("ext.py")
+        ext.write("def is_foo(value, rule_obj, path):\n    return value == 'foo' or 'Value is not foo'\n")
+
+        schema = CompiledSchema(
+            schema_data={"schema;item": {"type": "str", "func": "is_foo"}, "type": "seq", "sequence": [{"include": "item"}]},
+            extensions=[str(ext)],
+        )
+        copy = pickle.loads(pickle.dumps(schema))
+
+        assert copy.root_rule is not schema.root_rule
+        assert copy.extensions == schema.extensions
+        assert [str(e) for e in copy.iter_errors(["foo", "bar"])] == ["Value is not foo. Path: /1"]
+
+    def test_extension_functions_is_bound_at_compile_time(self, tmpdir):
+        ext = tmpdir.join("ext.py")
+        ext.write("def is_foo(value, rule_obj, path):\n    return value == 'foo' or 'Value is not foo'\n")
+        schema_data = {"type": "seq", "sequence": [{"type": "str", "func": "is_foo"}]}
+
+        schema = CompiledSchema(schema_data=schema_data, extensions=[str(ext)])
+        module = schema.loaded_extensions[0]
+        assert schema.root_rule.sequence[0].func_method is module.is_foo
+
+        # The extension file is only executed again if it is changed on disk
+        assert CompiledSchema(schema_data=schema_data, extensions=[str(ext)]).loaded_extensions[0] is module
+
+        # The size is changed as the mtime can be the same when the file is written again this fast
+        ext.write("def is_foo(value, rule_obj, path):\n    return value == 'bar' or 'Value is not bar!'\n")
+        changed = CompiledSchema(schema_data=schema_data, extensions=[str(ext)])
+        assert changed.loaded_extensions[0] is not module
+        assert [str(e) for e in changed.iter_errors(["foo", "bar"])] == ["Value is not bar!. Path: /0"]
+
+        # Each file is loaded into its own module and the first file that defines the function is used
+        other = tmpdir.join("other.py")
+        other.write("def is_foo(value, rule_obj, path):\n    return True\n")
+        both = CompiledSchema(schema_data=schema_data, extensions=[str(ext), str(other)])
+        assert both.loaded_extensions[0] is changed.loaded_extensions[0]
+        assert both.root_rule.sequence[0].func_method is changed.loaded_extensions[0].is_foo
+
+        # Functions that is not defined in any extension is found when the schema is compiled
+        with pytest.raises(CoreError) as ex:
+            CompiledSchema(schema_data={"type": "map", "mapping": {"foo": {"type": "str", "func": "is_bar"}}}, extensions=[str(ext)])
+        assert ex.value.msg == "Did not find method 'is_bar' in any loaded extension file"
+
+    def test_extension_module_is_importable(self, tmpdir):
+        # dataclasses and pickle looks up the module of a class in sys.modules
+        ext = tmpdir.join("ext.py")
+        ext.write(
+            "from __future__ import annotations\n"
+            "import dataclasses\n"
+            "from typing import ClassVar\n\n"
+            "@dataclasses.dataclass\n"
+            "class Limit:\n"
+            "    default: ClassVar[int] = 3\n"
+            "    value: int = 3\n\n"
+            "def is_short(value, rule_obj, path):\n"
+            "    return len(value) <= Limit().value or 'Value is too long'\n"
+        )
+        schema = CompiledSchema(schema_data={"type": "str", "func": "is_short"}, extensions=[str(ext)])
+        module = schema.loaded_extensions[0]
+
+        assert [str(e) for e in schema.iter_errors("abcd")] == ["Value is too long. Path: "]
+        assert pickle.loads(pickle.dumps(module.Limit(5))) == module.Limit(5)
+
+    def test_schema_cache(self, tmpdir, monkeypatch):
+        import pykwalify.cache
+        import pykwalify.core
+
+        ext = tmpdir.join("ext.py")
+        ext.write("def is_foo(value, rule_obj, path):\n    return value == 'foo' or 'Value is not foo'\n")
+        schema_file = tmpdir.join("schema.yaml")
+        schema_file.write(
+            "schema;name:\n  type: str\n  func: is_foo\n"
+            "type: map\n"
+            "mapping:\n"
+            "  name:\n    include: name\n"
+            "  id:\n    type: int\n    assert: val > 0\n"
+            "  regex;(^x-):\n    type: str\n    pattern: ^[a-z]+$\n"
+        )
+        cache_dir = tmpdir.join("cache")
+        kwargs = {"schema_files": [str(schema_file)], "extensions": [str(ext)], "allow_assertions": True, "cache_dir": str(cache_dir)}
+        data = {"name": "bar", "id": 0, "x-a": "A"}
+        expected = sorted([
+            "Value is not foo. Path: /name",
+            "Value: '0' assertion expression failed (val > 0)",
+            "Value 'A' does not match pattern '^[a-z]+$'. Path: '/x-a'",
+        ])
+
+        schema = CompiledSchema(**kwargs)
+        assert len(cache_dir.listdir()) == 1
+        assert sorted(str(e) for e in schema.iter_errors(data)) == expected
+
+        # The schema files is not parsed again when the cached rules is used
+        with monkeypatch.context() as m:
+            m.setattr(pykwalify.core, "_load_schema_files", None)
+            cached = CompiledSchema(**kwargs)
+
+        assert cached.root_rule is not schema.root_rule
+        assert cached.root_rule.mapping["id"].assertion_func is not None
+        assert sorted(str(e) for e in cached.iter_errors(data)) == expected
+
+        # Changed schema files and flags gets new entries
+        schema_file.write("type: map\nmapping:\n  id:\n    type: str\n")
+        assert [str(e) for e in CompiledSchema(**kwargs).iter_errors({"id": 1})] == ["Value '1' is not of type 'str'. Path: '/id'"]
+        CompiledSchema(strict_rule_validation=True, **kwargs)
+        assert len(cache_dir.listdir()) == 3
+
+        # Bool enum values still only matches bool values when the rules is loaded from the cache
+        schema_file.write("type: seq\nsequence:\n  - type: any\n    enum: [true, 1]\n")
+        for i in range(2):
+            schema = CompiledSchema(**kwargs)
+            assert [str(e) for e in schema.iter_errors([True, 1, False, 0])] == [
+                "Enum 'False' does not exist. Path: '/2' Enum: [True, 1]",
+                "Enum '0' does not exist. Path: '/3' Enum: [True, 1]",
+            ]
+        assert len(cache_dir.listdir()) == 4
+        schema_file.write("type: map\nmapping:\n  id:\n    type: str\n")
+
+        # Broken entries is replaced
+        for entry in cache_dir.listdir():
+            entry.write("broken")
+        assert [str(e) for e in CompiledSchema(**kwargs).iter_errors({"id": 1})] == ["Value '1' is not of type 'str'. Path: '/id'"]
+
+        # The least recently used entries is removed when the cache is full
+        monkeypatch.setattr(pykwalify.cache, "MAX_CACHE_ENTRIES", 2)
+        schema_file.write("type: int\n")
+        CompiledSchema(**kwargs)
+        assert len(cache_dir.listdir()) == 2
+
+    def test_iter_document_errors(self):
+        schema = CompiledSchema(schema_data={"type": "map", "mapping": {"name": {"type": "str", "required": True}}})
+        stream = StringIO(u"name: foo\n---\nname: 1\n---\nfoo: bar\n---\nname: bar\n")
+
+        results = [(index, [str(e) for e in errors]) for index, errors in schema.iter_document_errors(stream)]
+        assert results == [
+            (0, []),
+            (1, ["Value '1' is not of type 'str'. Path: '/name'"]),
+            (2, ["Cannot find required key 'name'. Path: ''", "Key 'foo' was not defined. Path: ''"]),
+            (3, []),
+        ]
+
+        # Documents is validated one at a time so documents before a broken document is still validated
+        results = schema.iter_document_errors(StringIO(u"name: foo\n---\nname: [foo\n"))
+        assert next(results) == (0, [])
+        with pytest.raises(Exception):
+            next(results)
+
+    def test_max_errors(self):
+        schema = CompiledSchema(schema_data={"type": "seq", "sequence": [{"type": "int"}]})
+        data = [1, "a", 2, "b", "c"]
+
+        assert len(list(schema.iter_errors(data))) == 3
+        assert [str(e) for e in schema.iter_errors(data, max_errors=2)] == [
+            "Value 'a' is not of type 'int'. Path: '/1'",
+            "Value 'b' is not of type 'int'. Path: '/3'",
+        ]
+        assert len(list(schema.iter_errors(data, max_errors=10))) == 3
+
+        with pytest.raises(SchemaError) as ex:
+            schema.validate(data, max_errors=1)
+        assert "Path: '/3'" not in str(ex.value)
+
+        with pytest.raises(CoreError):
+            schema.validate(data, max_errors=0)
+
+    def test_max_errors_ignores_errors_that_is_removed(self):
+        """
+        Errors from sequence items that are allowed to fail must not stop the validation
+        """
+        schema = CompiledSchema(schema_data={
+            "type": "map",
+            "mapping": {
+                "any": {"type": "seq", "matching": "any", "sequence": [{"type": "int"}, {"type": "str"}]},
+                "all": {"type": "seq", "matching": "*", "sequence": [{"type": "int"}]},
+                "id": {"type": "int"},
+            },
+        })
+
+        assert [str(e) for e in schema.iter_errors({"any": [1, "a"], "all": ["a"], "id": "b"}, max_errors=1)] == [
+            "Value 'b' is not of type 'int'. Path: '/id'",
+        ]
+        assert [str(e) for e in schema.iter_errors({"any": [1.5], "id": "b"}, max_errors=1)] == [
+            "Value '1.5' is not of type 'int'. Path: '/any/0'",
+        ]
+
+    def test_is_valid(self):
+        schema = CompiledSchema(schema_data={
+            "type": "seq",
+            "matching": "*",
+            "sequence": [{"type": "map", "mapping": {"id": {"type": "int", "required": True}}}],
+        })
+        assert schema.is_valid(["a"])
+
+        schema = CompiledSchema(schema_data={"type": "map", "mapping": {"id": {"type": "int", "required": True}}})
+        assert schema.is_valid({"id": 1})
+        assert not schema.is_valid({"id": "a"})
+        assert not schema.is_valid({"foo": 1})
+        assert not schema.is_valid([])
+
+    def test_iso_datetime_fast_path(self):
+        """
+        Values accepted without dateutil must also be accepted by dateutil
+        """
+        from dateutil.parser import parse
+        from pykwalify.core import _is_iso_datetime
+
+        valid = ["2021-01-31", "2021-01-31T10:00", "2021-01-31 10:00:59", "2021-01-31T10:00:00.123456Z", "2021-01-31T10:00:00+01:00",
+                 "2021-01-31T10:00:00-0130", "2020-02-29"]
+        fallback = ["2021-02-29", "2021-13-01", "2021-01-31T24:00:00", "2021-01-31T10:00:00+24:00", " 2021-01-31", "31-01-2021", "2021-1-31",
+                    "2021-01-31T10:00:00.1234567", "foobar", ""]
+
+        for value in valid:
+            assert _is_iso_datetime(value), value
+            parse(value)
+
+        for value in fallback:
+            assert not _is_iso_datetime(value), value
+
+        schema = CompiledSchema(schema_data={"type": "seq", "sequence": [{"type": "timestamp"}]})
+        assert [str(e) for e in schema.iter_errors(valid + ["2021-02-29", "31 jan 2021"])] == [
+            "Timestamp: '2021-02-29'' is invalid. Path: '/7'",
+        ]
+
+    def test_date_format_cache(self):
+        schema = CompiledSchema(schema_data={"type": "seq", "sequence": [{"type": "date", "format": ["%Y-%m-%d", "%d/%m/%Y", "%Y"]}]})
+        data = ["2021-01-31", "31/01/2021", "31/01/2021", "2021-01-31", "31-01-2021", "2021", "31/01/2021"]
+
+        # The format that matched the last value is tried first but errors still report the last format
+        assert [str(e) for e in schema.iter_errors(data)] == ["Not a valid date: 31-01-2021 format: %Y. Path: '/4'"]
+        assert [str(e) for e in schema.iter_errors(data)] == ["Not a valid date: 31-01-2021 format: %Y. Path: '/4'"]
+
+    def test_assert_values(self):
+        schema = CompiledSchema(schema_data={"type": "seq", "sequence": [{"type": "str", "assert": "'\\'' not in val and len(val) < 9"}]},
+                                allow_assertions=True)
+        data = ["foo", 'say "hi"', "it's", "foobarbaz"]
+
+        # Values is bound to val and not written into the expression so quotes in values works
+        assert [(e.code, e.path) for e in schema.iter_errors(data)] == [("assert_failed", "/2"), ("assert_failed", "/3")]
+
+        # The expression is compiled once and shared by all rules with the same expression
+        schema = CompiledSchema(schema_data={"type": "seq", "sequence": [{"type": "int", "assert": "val > 1"}]}, allow_assertions=True)
+        other = CompiledSchema(schema_data={"type": "map", "mapping": {"a": {"type": "int", "assert": "val > 1"}}}, allow_assertions=True)
+        assert schema.root_rule.sequence[0].assertion_func is other.root_rule.mapping["a"].assertion_func
+        assert [e.code for e in schema.iter_errors([1, 2, 0])] == ["assert_failed", "assert_failed"]
+
+    def test_assert_only_expressions(self, capsys):
+        """
+        Statements and code after a newline in assert is rejected when the schema is parsed and never runs
+        """
+        for assertion in ['True\nprint("EXECUTED")\nx = 1', "val > 0\nx = 1", "x = 1", "del val"]:
+            for allow_assertions in (False, True):
+                with pytest.raises(RuleError) as r:
+                    CompiledSchema(schema_data={"type": "int", "assert": assertion}, allow_assertions=allow_assertions)
+                assert r.value.error_key == "assert.syntax_error"
+
+        assert capsys.readouterr().out == ""
+
+        # Whitespace around the expression is allowed
+        schema = CompiledSchema(schema_data={"type": "int", "assert": " val > 0\n"}, allow_assertions=True)
+        assert [e.code for e in schema.iter_errors(0)] == ["assert_failed"]
+        assert list(schema.iter_errors(1)) == []
+
+    def test_assert_message(self):
+        """
+        An expression followed by a message fails like the assert statement and is not a tuple that is always true
+        """
+        schema = CompiledSchema(schema_data={"type": "int", "assert": "val < 5, 'too big'"}, allow_assertions=True)
+        assert [str(e) for e in schema.iter_errors(10)] == ["Value: '10' assertion expression failed (val < 5, 'too big')"]
+        assert list(schema.iter_errors(1)) == []
+
+        for assertion in ["val < 5, 'too big', 'other'", "(val < 5, )"]:
+            with pytest.raises(RuleError) as r:
+                CompiledSchema(schema_data={"type": "int", "assert": assertion}, allow_assertions=True)
+            assert r.value.error_key == "assert.syntax_error"
+
+    def test_partial_schemas_is_scoped_to_schema(self):
+        """
+        Two schemas can define partial schemas with the same name without affecting each other
+        """
+        schema_a = CompiledSchema(schema_data={"schema;item": {"type": "int"}, "type": "seq", "sequence": [{"include": "item"}]})
+        schema_b = CompiledSchema(schema_data={"schema;item": {"type": "str"}, "type": "seq", "sequence": [{"include": "item"}]})
+        schema_c = CompiledSchema(schema_data={"type": "seq", "sequence": [{"include": "item"}]})
+
+        assert [str(e) for e in schema_a.iter_errors([1, "a"])] == ["Value 'a' is not of type 'int'. Path: '/1'"]
+        assert [str(e) for e in schema_b.iter_errors([1, "a"])] == ["Value '1' is not of type 'str'. Path: '/0'"]
+        assert [str(e) for e in schema_c.iter_errors([1])] == [
+            "Cannot find partial schema with name 'item'. Existing partial schemas: ''. Path: '/0'"
+        ]
+
+    def test_concurrent_validation(self):
+        """
+        Validating from many threads at the same time should give the same result as validating in one thread
+        """
+        schemas = [
+            CompiledSchema(schema_data={
+                "schema;item": {
+                    "type": "map",
+                    "mapping": {
+                        "id": {"type": "int", "unique": True},
+                        "name": {"type": "str", "pattern": "^[a-z]+$", "enum": ["foo", "bar", "baz"]},
+                        "regex;(^x_)": {"type": item_type},
+                    },
+                },
+                "type": "seq",
+                "sequence": [{"include": "item"}],
+            })
+            for item_type in ("int", "str")
+        ]
+
+        def work(i):
+            schema = schemas[i % 2]
+            data = "\n".join(
+                "- {{id: {0}, name: {1}, x_{2}: {3}}}".format(j % 15, ["foo", "bar", "Foo"][j % 3], i, j)
+                for j in range(20)
+            )
+            c = Core(data_file_obj=StringIO(data), compiled_schema=schema)
+            c.validate(raise_exception=False)
+            return c.validation_errors
+
+        expected = [work(i) for i in range(64)]
+        assert all(errors for errors in expected)
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            for _ in range(2):
+                assert list(executor.map(work, range(64))) == expected
+
     def test_multi_file_support(self):
         """
         This should test that multiple files is supported correctly
@@ -279,7 +718,7 @@ class TestCore(object):
                 ],
                 self.f("partial_schemas", "1f-data.yaml"),
                 SchemaError,
-                ["Cannot find partial schema with name 'fooonez'. Existing partial schemas: 'bar, fooone, foothree, footwo'. Path: '/0'"]
+                ["Cannot find partial schema with name 'fooonez'. Existing partial schemas: 'fooone, footwo'. Path: '/0'"]
             ),
             (
                 [
@@ -620,3 +1059,17 @@ class TestCore(object):
 
                     compare(sorted(c.validation_errors), sorted(errors), prefix="Wrong validation errors when parsing files : {0} : {1} : {2}".format(
                         f, document_index, document.get('name', 'UNKNOWN')))
+
+                    # The validation must find the same errors in the same order when max_errors is not reached
+                    # and stop at a error from the full list when it is reached
+                    for max_errors, expected in ((len(c.validation_errors) + 1, c.validation_errors), (1, None)):
+                        limited = Core(source_data=copy.deepcopy(data), schema_data=schema, strict_rule_validation=True, allow_assertions=True,
+                                       max_errors=max_errors)
+                        limited.validate(raise_exception=False)
+
+                        if expected is None:
+                            assert len(limited.validation_errors) == 1
+                            assert limited.validation_errors[0] in c.validation_errors
+                        else:
+                            compare(limited.validation_errors, expected, prefix="Wrong validation errors with max_errors : {0} : {1}".format(
+                                f, document_index))
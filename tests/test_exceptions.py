@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
 
+# python std lib
+import pickle
+
 # pykwalify imports
 from pykwalify import errors
+from pykwalify.core import CompiledSchema
 
 
 class TestCLI(object):
@@ -27,3 +31,59 @@ class TestCLI(object):
 
         sc_e = errors.SchemaConflict()
         assert sc_e.retcode == 5
+
+    def test_schema_error_entry(self):
+        entry = errors.SchemaError.SchemaErrorEntry(
+            msg=u"Key '{key}' was not defined. Path: '{path}'",
+            path=u"/foo",
+            value={"bar": 1},
+            key=u"bar",
+            code=u"key_undefined",
+        )
+
+        assert entry.code == u"key_undefined"
+        assert entry.path == u"/foo"
+        assert entry.args == {"key": u"bar"}
+        assert entry.key == u"bar"
+        assert not hasattr(entry, "__dict__")
+        assert not hasattr(entry, "foo")
+
+        assert str(entry) == u"Key 'bar' was not defined. Path: '/foo'"
+
+        # Errors is compared by code, path and args and not by the rendered message
+        same = errors.SchemaError.SchemaErrorEntry(msg=u"Other message", path=u"/foo", value=None, key=u"bar", code=u"key_undefined")
+        other = errors.SchemaError.SchemaErrorEntry(msg=entry.msg, path=u"/foo", value=None, key=u"baz", code=u"key_undefined")
+        assert entry == same
+        assert entry != other
+        assert len({entry, same, other}) == 2
+
+        copy = pickle.loads(pickle.dumps(entry))
+        assert (copy.code, copy.path, copy.args, str(copy)) == (entry.code, entry.path, entry.args, str(entry))
+
+    def test_schema_error_entry_codes(self):
+        schema = CompiledSchema(schema_data={
+            "type": "map",
+            "mapping": {
+                "id": {"type": "int", "required": True},
+                "tags": {"type": "seq", "sequence": [{"type": "str", "unique": True}]},
+            },
+        })
+
+        assert [(e.code, e.path) for e in schema.iter_errors({"tags": ["a", "a", 1], "foo": 1})] == [
+            (u"required_nokey", u""),
+            (u"value_notunique", u"/tags/1"),
+            (u"type_unmatch", u"/tags/2"),
+            (u"key_undefined", u""),
+        ]
+
+    def test_join_path(self):
+        assert errors.join_path(u"") == u""
+        assert errors.join_path(((u"", u"a"), 0)) == u"/a/0"
+        assert errors.join_path((((u"", u"a"), 0), (1, 2))) == u"/a/0/(1, 2)"
+
+        # The path string of a error is only built when it is used
+        entry = errors.SchemaError.SchemaErrorEntry(msg=u"Path: '{path}'", path=((u"", u"a"), 0), value=None)
+        assert entry._path == ((u"", u"a"), 0)
+        assert str(entry) == u"Path: '/a/0'"
+        assert entry.path == u"/a/0"
+        assert entry._path == u"/a/0"
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+""" Unit test for pyKwalify - import time """
+
+# python std lib
+import os
+import subprocess
+import sys
+
+# Max time in milliseconds for a cold `import pykwalify.core` and `import pykwalify.cli`, with compiled
+# bytecode. Both is below 20 ms on a normal machine, before the lazy imports it was around 75 ms.
+IMPORT_TIME_BUDGET_MS = 60
+
+# Modules that is only imported when a schema or data file needs them
+LAZY_MODULES = [
+    "concurrent.futures",
+    "dateutil",
+    "docopt",
+    "hashlib",
+    "importlib.util",
+    "ipaddress",
+    "json",
+    "logging.config",
+    "multiprocessing",
+    "pickle",
+    "ruamel",
+    "tempfile",
+]
+
+# Module __getattr__ is only supported from python 3.7, before that pykwalify.compat imports ruamel.yaml
+if sys.version_info < (3, 7):
+    LAZY_MODULES.remove("ruamel")
+
+
+def _import_time(module, pycache_dir, runs=3):
+    """
+    Import module in new python processes with `-X importtime`. Returns the set of all imported
+    modules and the lowest cumulative import time of module in milliseconds.
+    """
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+
+    # PYTHONPYCACHEPREFIX is only supported from python 3.8, before that the bytecode is written to __pycache__ in the source tree
+    if sys.version_info >= (3, 8):
+        env["PYTHONPYCACHEPREFIX"] = str(pycache_dir)
+
+    cmd = [sys.executable, "-X", "importtime", "-c", "import {0}".format(module)]
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    # The first run writes the bytecode
+    subprocess.run(cmd, env=env, cwd=cwd, check=True, stderr=subprocess.PIPE)
+
+    times = []
+    for i in range(runs):
+        stderr = subprocess.run(cmd, env=env, cwd=cwd, check=True, stderr=subprocess.PIPE).stderr.decode("utf-8")
+        imported = {}
+        for line in stderr.splitlines():
+            if line.startswith("import time:") and "|" in line:
+                self_us, cumulative_us, name = line[len("import time:"):].split("|")
+                if cumulative_us.strip().isdigit():
+                    imported[name.strip()] = int(cumulative_us)
+        times.append(imported[module] / 1000.0)
+
+    return set(imported), min(times)
+
+
+class TestImportTime(object):
+
+    def test_import_time(self, tmpdir):
+        for module in ("pykwalify.core", "pykwalify.cli"):
+            imported, elapsed = _import_time(module, tmpdir.join("pycache"))
+
+            for lazy in LAZY_MODULES:
+                assert not [m for m in imported if m == lazy or m.startswith(lazy + ".")], "{0} imports {1}".format(module, lazy)
+
+            assert elapsed < IMPORT_TIME_BUDGET_MS, "import {0} took {1:.1f} ms".format(module, elapsed)
@@ -0,0 +1,436 @@
+# -*- coding: utf-8 -*-
+
+""" Unit test for pyKwalify - incremental validation """
+
+# python std lib
+import copy
+import random
+
+# pykwalify imports
+from pykwalify import incremental
+from pykwalify.compat import unicode
+from pykwalify.core import CompiledSchema
+from pykwalify.errors import CoreError
+from pykwalify.incremental import IncrementalValidator, parse_pointer
+
+# 3rd party imports
+import pytest
+
+
+SCHEMA = {
+    "type": "map",
+    "mapping": {
+        "name": {"type": "str", "required": True, "pattern": "^[a-z]+$"},
+        "owner": {"include": "person"},
+        "items": {
+            "type": "seq",
+            "range": {"min": 1, "max": 6},
+            "sequence": [{
+                "type": "map",
+                "mapping": {
+                    "id": {"type": "int", "required": True, "unique": True},
+                    "kind": {"type": "str", "enum": ["a", "b"], "default": "a"},
+                    "tags": {"type": "seq", "sequence": [{"type": "str", "unique": True}]},
+                    "regex;(^x_)": {"type": "int"},
+                },
+            }],
+        },
+        "any": {
+            "type": "seq",
+            "matching": "any",
+            "sequence": [{"type": "int", "range": {"max": 5}}, {"type": "str"}],
+        },
+    },
+    "schema;person": {
+        "type": "map",
+        "mapping": {
+            "first": {"type": "str", "required": True},
+            "age": {"type": "int", "range": {"min": 0}},
+        },
+    },
+}
+
+
+def _document():
+    return {
+        "name": "foo",
+        "owner": {"first": "a", "age": 3},
+        "items": [
+            {"id": 1, "kind": "a", "tags": ["x", "y"]},
+            {"id": 2, "kind": "b", "tags": ["x", "x"], "x_1": "bad"},
+            {"id": 1, "kind": "c"},
+        ],
+        "any": [1, "two", 9, None],
+    }
+
+
+def _errors(errors):
+    return [unicode(e) for e in errors]
+
+
+VALUES = [
+    1, 2, 7, -1, "a", "b", "c", "Foo", "x", None, True,
+    {"id": 1}, {"id": 3, "tags": ["x"]}, {"first": "b"}, {"kind": "b"},
+    ["x", "x"], [1, "y"],
+]
+
+KEYS = ["id", "kind", "x_2", "new", "first"]
+
+
+def _random_pointer(rng, data):
+    tokens = []
+    value = data
+
+    while rng.random() < 0.7:
+        if isinstance(value, dict) and value:
+            key = rng.choice(sorted(value, key=str))
+        elif isinstance(value, list) and value:
+            key = rng.randrange(len(value))
+        else:
+            break
+
+        tokens.append(str(key))
+        value = value[key]
+
+    return u"".join(u"/" + t for t in tokens), value
+
+
+def _random_operation(rng, data, values=VALUES, keys=KEYS):
+    pointer, value = _random_pointer(rng, data)
+    kind = rng.choice(["add", "replace", "remove", "move", "copy"])
+
+    if kind == "add":
+        if isinstance(value, list):
+            return {"op": "add", "path": pointer + "/" + rng.choice(["-", str(rng.randint(0, len(value)))]), "value": copy.deepcopy(rng.choice(values))}
+        if isinstance(value, dict):
+            return {"op": "add", "path": pointer + "/" + rng.choice(keys), "value": copy.deepcopy(rng.choice(values))}
+        kind = "replace"
+
+    if kind in ("remove", "move", "copy") and pointer:
+        if kind == "remove":
+            return {"op": "remove", "path": pointer}
+
+        target, target_value = _random_pointer(rng, data)
+        if isinstance(target_value, list) and not (target + "/").startswith(pointer + "/"):
+            return {"op": kind, "from": pointer, "path": target + "/0"}
+
+    return {"op": "replace", "path": pointer, "value": copy.deepcopy(rng.choice(values))}
+
+
+# Used with a small MIN_STATE_WIDTH so the state of the mappings and sequences is kept
+WIDE_SCHEMA = {
+    "type": "map",
+    "mapping": {
+        "records": {
+            "type": "seq",
+            "range": {"max": 12},
+            "sequence": [{
+                "type": "map",
+                "mapping": {
+                    "id": {"type": "int", "required": True, "unique": True},
+                    "name": {"type": "str", "unique": True},
+                    "tags": {"type": "seq", "sequence": [{"type": "str", "unique": True}]},
+                },
+            }],
+        },
+        "mixed": {
+            "type": "seq",
+            "matching": "any",
+            "sequence": [
+                {"type": "map", "mapping": {"id": {"type": "int", "unique": True}, "x": {"type": "int"}}},
+                {"type": "int", "unique": True, "range": {"max": 5}},
+                {"type": "str"},
+            ],
+        },
+        "all": {
+            "type": "seq",
+            "matching": "all",
+            "sequence": [{"type": "str", "unique": True}, {"type": "str", "pattern": "^[a-c]+$"}],
+        },
+        "checked": {"type": "seq", "sequence": [{"type": "str", "func": "is_short"}]},
+        "props": {
+            "type": "map",
+            "range": {"max": 6},
+            "mapping": {
+                "regex;(^r_)": {"type": "int", "required": True},
+                "regex;(^s_)": {"type": "str"},
+                "fixed": {"type": "str", "default": "x"},
+            },
+        },
+    },
+}
+
+WIDE_VALUES = [
+    1, 2, 7, "a", "ab", "abcd", "d", None,
+    {"id": 1}, {"id": 2, "name": "a"}, {"id": 3, "x": "bad"}, {"name": "b", "tags": ["a", "a"]},
+    ["a", "b"], [1, 2], [[1], [1]],
+]
+
+WIDE_KEYS = ["id", "name", "x", "tags", "r_1", "r_2", "s_1", "fixed", "other"]
+
+
+def _wide_document():
+    return {
+        "records": [
+            {"id": 1, "name": "a", "tags": ["a", "b"]},
+            {"id": 2, "name": "b"},
+            {"id": 1, "name": "c", "tags": ["c", "c"]},
+            {"id": 4},
+        ],
+        "mixed": [{"id": 1}, 3, "s", 9, {"id": 1, "x": 2}, 3, None],
+        "all": ["a", "ab", "a", "d"],
+        "checked": ["ab", "abcd", "a", "abcde"],
+        "props": {"r_1": 1, "s_1": "a", "fixed": "y", "t_1": 2},
+    }
+
+
+class TestIncremental(object):
+
+    def setup_method(self):
+        self.schema = CompiledSchema(schema_data=SCHEMA)
+
+    def test_parse_pointer(self):
+        assert parse_pointer("") == []
+        assert parse_pointer("/") == [""]
+        assert parse_pointer("/a~1b/~01/0") == ["a/b", "~1", "0"]
+
+        with pytest.raises(CoreError):
+            parse_pointer("a/b")
+
+    def test_initial_errors(self):
+        data = _document()
+        validator = IncrementalValidator(self.schema, data)
+
+        assert _errors(validator.errors) == _errors(self.schema.iter_errors(copy.deepcopy(data)))
+        assert len(validator.errors) > 0
+
+    def test_patch(self):
+        data = _document()
+        validator = IncrementalValidator(self.schema, data)
+
+        errors = validator.revalidate([
+            {"op": "test", "path": "/name", "value": "foo"},
+            {"op": "replace", "path": "/items/1/tags/1", "value": "z"},
+            {"op": "remove", "path": "/items/1/x_1"},
+            {"op": "replace", "path": "/items/2/kind", "value": "b"},
+            {"op": "replace", "path": "/items/2/id", "value": 3},
+            {"op": "remove", "path": "/any/2"},
+        ])
+
+        assert validator.data is data
+        assert data["items"][1]["tags"] == ["x", "z"]
+        assert data["any"] == [1, "two", None]
+        assert errors == []
+
+        errors = validator.revalidate([{"op": "add", "path": "/items/-", "value": {"id": 3}}])
+
+        assert data["items"][3] == {"id": 3, "kind": "a"}
+        assert [(e.code, e.path) for e in errors] == [("value_notunique", "/items/3/id")]
+
+        errors = validator.revalidate([{"op": "move", "from": "/items/3", "path": "/items/0"}])
+        assert [(e.code, e.path) for e in errors] == [("value_notunique", "/items/3/id")]
+
+        assert _errors(validator.revalidate([{"op": "remove", "path": "/owner/first"}])) == [
+            "Cannot find required key 'first'. Path: '/owner'",
+            "Value '3' is not unique. Previous path: '/items/0/id'. Path: '/items/3/id'",
+        ]
+
+    def test_patch_errors(self):
+        validator = IncrementalValidator(self.schema, _document())
+
+        for operation in [
+            {"op": "test", "path": "/name", "value": "bar"},
+            {"op": "replace", "path": "/missing", "value": 1},
+            {"op": "remove", "path": "/items/5"},
+            {"op": "add", "path": "/items/01", "value": 1},
+            {"op": "add", "path": "/name"},
+            {"op": "move", "from": "/items", "path": "/items/0"},
+            {"op": "foo", "path": "/name"},
+            {"op": "remove", "path": ""},
+        ]:
+            with pytest.raises(CoreError):
+                validator.revalidate([operation])
+
+    def test_changed_paths(self):
+        data = _document()
+        validator = IncrementalValidator(self.schema, data)
+
+        # The document is changed without a patch and the changed paths is given instead
+        data["items"].insert(0, {"id": 2})
+        data["owner"]["age"] = -1
+        data["name"] = "Foo"
+
+        errors = validator.revalidate(["/items/0", "/owner/age", "/name"])
+        assert _errors(errors) == _errors(self.schema.iter_errors(copy.deepcopy(data)))
+
+        # A new document object where the root is changed
+        new_data = copy.deepcopy(data)
+        new_data["items"] = []
+        errors = validator.revalidate(["/items"], data=new_data)
+
+        assert validator.data is new_data
+        assert _errors(errors) == _errors(self.schema.iter_errors(copy.deepcopy(new_data)))
+
+        errors = validator.revalidate([""], data={"name": "foo", "items": [{"id": 1}]})
+        assert errors == []
+
+    @pytest.mark.parametrize("seed", range(20))
+    def test_random_patches(self, seed):
+        rng = random.Random(seed)
+        data = _document()
+        validator = IncrementalValidator(self.schema, data)
+
+        for i in range(30):
+            patch = [_random_operation(rng, validator.data) for j in range(rng.randint(1, 3))]
+            expected = copy.deepcopy(validator.data)
+
+            try:
+                errors = validator.revalidate(patch)
+            except CoreError:
+                # A later operation in the patch could be invalid after a earlier operation,
+                # the whole document is validated again to start from a known state
+                errors = validator.revalidate([""])
+
+            assert _errors(errors) == _errors(self.schema.iter_errors(copy.deepcopy(validator.data))), (i, patch, expected)
+
+    @pytest.fixture
+    def wide_schema(self, tmpdir):
+        ext = tmpdir.join("ext.py")
+        # The message contains the path so items with func is validated again when they are moved
+        ext.write("def is_short(value, rule_obj, path):\n    return len(str(value)) < 4 or 'Value at {0} is too long'.format(path)\n")
+        return CompiledSchema(schema_data=WIDE_SCHEMA, extensions=[str(ext)])
+
+    @pytest.mark.parametrize("width", [0, 64])
+    @pytest.mark.parametrize("seed", range(20))
+    def test_random_patches_state(self, wide_schema, monkeypatch, width, seed):
+        """
+        The state of the mappings and sequences is updated with the changed keys and items
+        """
+        monkeypatch.setattr(incremental, "MIN_STATE_WIDTH", width)
+        # Only a few items can be added between two items before they are labeled again
+        monkeypatch.setattr(incremental, "_LABEL_GAP", 4)
+
+        rng = random.Random(seed)
+        validator = IncrementalValidator(wide_schema, _wide_document())
+
+        for i in range(40):
+            patch = [_random_operation(rng, validator.data, WIDE_VALUES, WIDE_KEYS) for j in range(rng.randint(1, 3))]
+
+            try:
+                errors = validator.revalidate(patch)
+            except CoreError:
+                # The operations before the failed operation is applied and validated
+                errors = validator.errors
+
+            assert _errors(errors) == _errors(wide_schema.iter_errors(copy.deepcopy(validator.data))), (i, patch)
+
+    @pytest.mark.parametrize("seed", range(10))
+    def test_random_changed_paths_state(self, wide_schema, monkeypatch, seed):
+        """
+        Changes made to the document without a patch is found from the changed paths
+        """
+        monkeypatch.setattr(incremental, "MIN_STATE_WIDTH", 0)
+
+        rng = random.Random(seed)
+        data = _wide_document()
+        validator = IncrementalValidator(wide_schema, data)
+
+        for i in range(40):
+            pointer, value = _random_pointer(rng, data)
+            parent = _random_pointer(rng, data)[0] if not pointer else pointer.rsplit("/", 1)[0]
+            container = parse_pointer(parent)
+            container = data if not container else None
+
+            if container is None:
+                container = data
+                for token in parse_pointer(parent):
+                    container = container[int(token)] if isinstance(container, list) else container[token]
+
+            if isinstance(container, list) and container and rng.random() < 0.5:
+                index = rng.randrange(len(container) + 1)
+                if index < len(container) and rng.random() < 0.5:
+                    del container[index]
+                else:
+                    container.insert(index, copy.deepcopy(rng.choice(WIDE_VALUES)))
+                changed = parent + "/" + str(index)
+            elif isinstance(container, dict) and container and rng.random() < 0.5:
+                key = rng.choice(sorted(container, key=str))
+                del container[key]
+                changed = parent + "/" + key
+            elif pointer:
+                tokens = parse_pointer(pointer)
+                target = data
+                for token in tokens[:-1]:
+                    target = target[int(token)] if isinstance(target, list) else target[token]
+                target[int(tokens[-1]) if isinstance(target, list) else tokens[-1]] = copy.deepcopy(rng.choice(WIDE_VALUES))
+                changed = pointer
+            else:
+                continue
+
+            errors = validator.revalidate([changed])
+            assert _errors(errors) == _errors(wide_schema.iter_errors(copy.deepcopy(data))), (i, changed)
+
+    def test_wide_sequence(self, monkeypatch):
+        """
+        Items added and removed in a wide sequence moves the errors of the items after them
+        """
+        schema = CompiledSchema(schema_data=WIDE_SCHEMA["mapping"]["records"])
+        data = [{"id": i, "name": "n{0}".format(i)} for i in range(200)]
+        data[150]["tags"] = ["a", "a"]
+        validator = IncrementalValidator(schema, data)
+
+        assert [e.path for e in validator.errors] == ["/150/tags/1", ""]
+
+        errors = validator.revalidate([
+            {"op": "add", "path": "/0", "value": {"id": 199}},
+            {"op": "remove", "path": "/50"},
+            {"op": "add", "path": "/100", "value": {"id": 3, "name": "n1"}},
+        ])
+
+        assert _errors(errors) == _errors(schema.iter_errors(copy.deepcopy(data)))
+        assert [e.path for e in errors] == ["/100/id", "/200/id", "/100/name", "/151/tags/1", ""]
+
+        # Only the changed items is validated again
+        calls = []
+        validate_item = incremental._IncrementalCore._validate_sequence_item
+
+        def counted(core, item, rule, path, i, done=None):
+            calls.append(i)
+            return validate_item(core, item, rule, path, i, done)
+
+        monkeypatch.setattr(incremental._IncrementalCore, "_validate_sequence_item", counted)
+        errors = validator.revalidate([{"op": "remove", "path": "/0"}, {"op": "replace", "path": "/20/id", "value": -1}])
+
+        assert calls == [20]
+        assert _errors(errors) == _errors(schema.iter_errors(copy.deepcopy(data)))
+
+    def test_relabel(self, monkeypatch):
+        """
+        The items is labeled again when there is no free label between two items
+        """
+        monkeypatch.setattr(incremental, "_LABEL_GAP", 2)
+        schema = CompiledSchema(schema_data={"type": "seq", "sequence": [{"type": "int", "unique": True}]})
+        data = [1, 2, "a"]
+        validator = IncrementalValidator(schema, data)
+
+        for i in range(5):
+            errors = validator.revalidate([{"op": "add", "path": "/1", "value": i}])
+            assert _errors(errors) == _errors(schema.iter_errors(copy.deepcopy(data)))
+
+    def test_wide_mapping(self, monkeypatch):
+        """
+        Keys that is removed and added again is moved last in the mapping
+        """
+        schema = CompiledSchema(schema_data=WIDE_SCHEMA["mapping"]["props"])
+        data = dict(("r_{0}".format(i), i) for i in range(100))
+        data.update({"s_1": 1, "t_1": 2})
+        validator = IncrementalValidator(schema, data)
+
+        for patch in [
+            [{"op": "remove", "path": "/s_1"}, {"op": "add", "path": "/s_1", "value": 2}],
+            [{"op": "replace", "path": "/r_5", "value": "a"}, {"op": "move", "from": "/r_7", "path": "/r_7"}],
+            [{"op": "remove", "path": "/r_{0}".format(i)} for i in range(100)],
+            [{"op": "add", "path": "/r_0", "value": 0}, {"op": "remove", "path": "/fixed"}],
+        ]:
+            errors = validator.revalidate(patch)
+            assert _errors(errors) == _errors(schema.iter_errors(copy.deepcopy(data))), patch
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+""" Unit test for pyKwalify - JSON Lines """
+
+# python std lib
+from io import StringIO
+
+# pykwalify imports
+from pykwalify.core import CompiledSchema
+from pykwalify.errors import CoreError
+from pykwalify.jsonl import JsonlValidator
+
+# 3rd party imports
+import pytest
+
+
+def _stream():
+    lines = []
+    for i in range(1, 26):
+        if i == 7:
+            lines.append(u"")
+        elif i == 13:
+            lines.append(u'{"id": 13, "name": ')
+        else:
+            lines.append(u'{{"id": {0}, "name": {1}}}'.format(i, i if i % 10 == 0 else '"foo"'))
+    return StringIO(u"\n".join(lines) + u"\n")
+
+
+class TestJsonl(object):
+
+    def setup_method(self):
+        self.schema = CompiledSchema(schema_data={
+            "type": "map",
+            "mapping": {
+                "id": {"type": "int", "required": True},
+                "name": {"type": "str"},
+            },
+        })
+
+    @pytest.mark.parametrize("jobs", [1, 2])
+    def test_iter_errors(self, jobs):
+        validator = JsonlValidator(self.schema, chunk_size=4, jobs=jobs)
+        results = list(validator.iter_errors(_stream()))
+
+        assert [line_number for line_number, errors in results] == [10, 13, 20]
+        assert results[0] == (10, ["Value '10' is not of type 'str'. Path: '/name'"])
+        assert results[1][1][0].startswith("Unable to parse line as json: ")
+        assert results[2] == (20, ["Value '20' is not of type 'str'. Path: '/name'"])
+
+        # The empty line is not a record
+        assert validator.records == 24
+        assert validator.failed_records == 3
+        assert validator.records_per_second > 0
+
+    def test_errors_is_yielded_for_each_chunk(self):
+        validator = JsonlValidator(self.schema, chunk_size=10)
+        results = validator.iter_errors(_stream())
+
+        assert next(results)[0] == 10
+        assert validator.records == 10
+
+    def test_invalid_chunk_size(self):
+        with pytest.raises(CoreError) as ex:
+            JsonlValidator(self.schema, chunk_size=0)
+        assert ex.value.msg == "chunk_size must be at least 1"
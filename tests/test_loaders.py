@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+""" Unit test for pyKwalify - loaders """
+
+# pykwalify imports
+from pykwalify import loaders
+from pykwalify.core import Core
+from pykwalify.errors import CoreError
+
+# 3rd party imports
+import pytest
+
+
+class TestLoaders(object):
+
+    def test_loader_for_file(self):
+        assert loaders.loader_for_file("data.json") is loaders.load_json
+        assert loaders.loader_for_file("data.yaml") is loaders.load_yaml
+        assert loaders.loader_for_file("data.yml") is loaders.load_yaml
+        assert loaders.loader_for_file("data.txt") is None
+        assert loaders.loader_for_file("data.txt", "yaml-pure") is loaders.load_yaml_pure
+
+        with pytest.raises(CoreError) as ex:
+            loaders.loader_for_file("data.json", "foo")
+        assert ex.value.msg == "Unknown loader: foo. Available loaders is [json, yaml, yaml-pure]"
+
+    def test_json_encoding(self, tmpdir):
+        f = tmpdir.join("data.json")
+
+        f.write_binary(u'{"name": "åäö"}'.encode("utf-16"))
+        assert loaders.load_json(str(f)) == {"name": u"åäö"}
+
+        f.write_binary(u'{"name": "åäö"}'.encode("latin-1"))
+        assert loaders.load_json(str(f), "latin-1") == {"name": u"åäö"}
+
+    def test_yaml_loaders(self, tmpdir):
+        f = tmpdir.join("data.yaml")
+        f.write_binary(u"name: åäö\nitems: !!python/tuple [1, 2]\nwhen: 2021-01-31\n".encode("utf-8"))
+
+        data = loaders.load_yaml(str(f))
+        assert data == loaders.load_yaml_pure(str(f))
+        assert data["name"] == u"åäö"
+        assert data["items"] == (1, 2)
+
+    def test_register_loader(self, tmpdir, monkeypatch):
+        monkeypatch.setattr(loaders, "loaders", dict(loaders.loaders))
+        monkeypatch.setattr(loaders, "file_endings", dict(loaders.file_endings))
+
+        def load_lines(path, encoding=None):
+            with open(path, encoding=encoding) as stream:
+                return stream.read().splitlines()
+
+        loaders.register_loader("lines", load_lines, [".txt"])
+
+        f = tmpdir.join("data.txt")
+        f.write("foo\nbar\n")
+        schema = {"type": "seq", "sequence": [{"type": "str", "enum": ["foo"]}]}
+
+        c = Core(source_file=str(f), schema_data=schema)
+        assert c.source == ["foo", "bar"]
+
+        # The loader can also be selected by name
+        c = Core(source_file=str(f), schema_data=schema, loader="yaml")
+        assert c.source == "foo bar"
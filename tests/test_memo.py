@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+""" Unit test for pyKwalify - subtree memo """
+
+# python std lib
+import copy
+import pickle
+
+# pykwalify imports
+from pykwalify.compat import unicode
+from pykwalify.core import CompiledSchema
+from pykwalify.errors import CoreError
+from pykwalify.incremental import IncrementalValidator
+from pykwalify.memo import MAX_MEMO_SIZE, KeyTooLarge, freeze, pure_rules
+
+# 3rd party imports
+import pytest
+
+
+SCHEMA = {
+    "type": "seq",
+    "sequence": [{
+        "type": "map",
+        "mapping": {
+            "name": {"type": "str", "required": True},
+            "limits": {
+                "type": "map",
+                "mapping": {
+                    "cpu": {"type": "str", "pattern": "^[0-9]+m$"},
+                    "memory": {"type": "int", "range": {"min": 1}},
+                },
+            },
+            "ports": {
+                "type": "seq",
+                "sequence": [{
+                    "type": "map",
+                    "mapping": {
+                        "port": {"type": "int", "unique": True},
+                        "protocol": {"type": "str", "enum": ["TCP", "UDP"], "default": "TCP"},
+                    },
+                }],
+            },
+            "labels": {"type": "seq", "sequence": [{"type": "str", "unique": True}]},
+        },
+    }],
+}
+
+
+def _document():
+    return [
+        {
+            "name": "app-{0}".format(i),
+            "limits": {"cpu": "500m" if i % 2 else "half", "memory": 0},
+            "ports": [{"port": 80}, {"port": 80, "protocol": "SCTP"}],
+            "labels": ["a", "b", "a"],
+        }
+        for i in range(20)
+    ]
+
+
+def _errors(schema, data):
+    return [unicode(e) for e in schema.iter_errors(data)]
+
+
+class TestMemo(object):
+
+    def test_pure_rules(self):
+        schema = CompiledSchema(schema_data=SCHEMA)
+        rules = pure_rules(schema.root_rule, schema.partial_schemas)
+        item = schema.root_rule.sequence[0]
+
+        assert id(item.mapping["limits"]) in rules
+        assert id(item.mapping["labels"]) in rules
+        # The default below ports is set in the data
+        assert id(item.mapping["ports"]) not in rules
+        assert id(item) not in rules
+        assert id(schema.root_rule) not in rules
+        # Scalar rules is never memoized
+        assert id(item.mapping["name"]) not in rules
+
+    def test_pure_rules_recursive(self):
+        schema = CompiledSchema(schema_data={
+            "schema;node": {
+                "type": "map",
+                "mapping": {
+                    "value": {"type": "int"},
+                    "children": {"type": "seq", "sequence": [{"include": "node"}]},
+                },
+            },
+            "schema;other": {
+                "type": "map",
+                "mapping": {
+                    "value": {"type": "int", "default": 1},
+                    "children": {"type": "seq", "sequence": [{"include": "other"}]},
+                },
+            },
+            "type": "map",
+            "mapping": {
+                "a": {"include": "node"},
+                "b": {"include": "other"},
+            },
+        })
+        rules = pure_rules(schema.root_rule, schema.partial_schemas)
+
+        assert id(schema.partial_schemas["node"]) in rules
+        assert id(schema.root_rule.mapping["a"]) in rules
+        assert id(schema.partial_schemas["other"]) not in rules
+        assert id(schema.root_rule.mapping["b"]) not in rules
+
+    def test_freeze(self):
+        assert freeze({"a": 1}, {}) != freeze({"a": True}, {})
+        assert freeze({"a": 0.0}, {}) != freeze({"a": -0.0}, {})
+        assert freeze({"a": 1}, {}) != freeze({"a": 1.0}, {})
+        assert freeze([1, 2], {}) != freeze([2, 1], {})
+        assert freeze({"a": 1, "b": 2}, {}) != freeze({"b": 2, "a": 1}, {})
+        assert freeze({"a": [1, {"b": None}]}, {}) == freeze({"a": [1, {"b": None}]}, {})
+
+        with pytest.raises(TypeError):
+            freeze([{1, 2}], {})
+
+        assert freeze([[1, 2], [3]], {}).size == 5
+        assert freeze([[1, 2], [3]], {}, max_size=5).size == 5
+        with pytest.raises(KeyTooLarge):
+            freeze([[1, 2], [3]], {}, max_size=4)
+
+    def test_max_size(self):
+        schema = CompiledSchema(schema_data={
+            "type": "map",
+            "mapping": {"items": {"type": "seq", "sequence": [{"type": "map", "mapping": {"a": {"type": "int"}}}]}},
+        }, memo_size=1000)
+        data = {"items": [{"a": i % 10} for i in range(MAX_MEMO_SIZE)]}
+
+        # The root and the sequence have more values below them than MAX_MEMO_SIZE so only the items is memoized
+        assert list(schema.iter_errors(data)) == []
+        assert len(schema.memo) == 10
+        assert schema.memo.hits == MAX_MEMO_SIZE - 10
+
+    def test_same_errors(self):
+        schema = CompiledSchema(schema_data=SCHEMA)
+        memo_schema = CompiledSchema(schema_data=SCHEMA, memo_size=100)
+
+        expected = _errors(schema, _document())
+
+        # The first document fills the memo and the second only uses it
+        for i in range(2):
+            data = _document()
+            assert _errors(memo_schema, data) == expected
+            # Defaults is still set in every copy of the ports
+            assert all("protocol" in p for item in data for p in item["ports"])
+
+        memo = memo_schema.memo
+        assert memo.hits > 0
+        assert len(memo) == 3
+
+        errors = list(memo_schema.iter_errors(_document()))
+        unique_errors = [e for e in errors if e.code == "value_notunique"]
+        assert [(e.path, e.prev_path) for e in unique_errors[-2:]] == [
+            ("/19/ports/1/port", "/19/ports/0/port"),
+            ("/19/labels/2", "/19/labels/0"),
+        ]
+
+    def test_lru(self):
+        schema = CompiledSchema(schema_data={"type": "seq", "sequence": [{"type": "seq", "sequence": [{"type": "int"}]}]}, memo_size=2)
+        data = [[1], [2], [3], [1], ["a"], ["a"]]
+
+        assert [e.path for e in schema.iter_errors(data)] == ["/4/0", "/5/0"]
+        assert len(schema.memo) == 2
+        assert schema.memo.hits == 1
+
+        with pytest.raises(CoreError):
+            CompiledSchema(schema_data=SCHEMA, memo_size=0)
+
+    def test_max_errors(self):
+        schema = CompiledSchema(schema_data={
+            "type": "map",
+            "mapping": {"items": {"type": "seq", "sequence": [{
+                "type": "map",
+                "mapping": {"id": {"type": "int", "unique": True}, "n": {"type": "str"}},
+            }]}},
+        }, memo_size=100)
+        data = {"items": [{"id": 1, "n": 1}, {"id": 1}]}
+
+        # The item errors is found before the unique errors with max_errors, the same with and without a filled memo
+        cold = [e.code for e in schema.iter_errors(data, max_errors=1)]
+        list(schema.iter_errors(data))
+        assert [e.code for e in schema.iter_errors(data, max_errors=1)] == cold == ["type_unmatch"]
+        assert [e.code for e in schema.iter_errors(data)] == ["value_notunique", "type_unmatch"]
+
+    def test_pickle(self):
+        schema = pickle.loads(pickle.dumps(CompiledSchema(schema_data=SCHEMA, memo_size=10)))
+
+        assert schema.memo.max_entries == 10
+        assert _errors(schema, _document()) == _errors(CompiledSchema(schema_data=SCHEMA), _document())
+
+    def test_incremental(self):
+        schema = CompiledSchema(schema_data=SCHEMA, memo_size=100)
+        data = _document()
+        validator = IncrementalValidator(schema, data)
+
+        errors = validator.revalidate([{"op": "replace", "path": "/3/limits/memory", "value": 1}])
+        assert [unicode(e) for e in errors] == _errors(CompiledSchema(schema_data=SCHEMA), copy.deepcopy(data))
+
+    def test_switch_off(self):
+        schema = CompiledSchema(schema_data={"type": "seq", "sequence": [{"type": "seq", "sequence": [{"type": "int"}]}]}, memo_size=1000)
+        item_rule = id(schema.root_rule.sequence[0])
+
+        # The root sequence is too large to be memoized
+        list(schema.iter_errors([[i] for i in range(200)]))
+        assert len(schema.memo) == 100
+
+        # The items was never repeated so the rule is no longer memoized
+        assert item_rule not in schema.memo.rules
+        assert schema.memo.misses == 100
@@ -161,6 +161,11 @@ class TestRule(unittest.TestCase):
         assert str(r.value) == "<RuleError: error code 4: Value: '__import__' contain invalid content that is not allowed to be present in assertion keyword: Path: '/sequence/0'>"  # NOQA: E501
         assert r.value.error_key == 'assert.unsupported_content'
 
+        with pytest.raises(RuleError) as r:
+            Rule(schema={"type": "seq", "sequence": [{"type": "int", "assert": "val <"}]})
+        assert str(r.value) == "<RuleError: error code 4: Syntax error when compiling assertion: val <: Path: '/sequence/0'>"
+        assert r.value.error_key == 'assert.syntax_error'
+
     def test_length(self):
         r = Rule(schema={"type": "int", "length": {"max": 10, "min": 1}})
         assert r.length is not None, "length var not set proper"
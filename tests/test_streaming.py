@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+""" Unit test for pyKwalify - Streaming """
+
+# python std lib
+import copy
+import glob
+import os
+from io import StringIO
+
+# pykwalify imports
+from pykwalify.compat import new_yml, unicode
+from pykwalify.core import CompiledSchema
+from pykwalify.errors import CoreError, PyKwalifyException
+from pykwalify.streaming import StreamValidator
+
+# 3rd party imports
+import pytest
+
+
+def _documents():
+    """
+    All documents from the test files that have both a schema and data
+    """
+    files_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "files")
+
+    for f in sorted(glob.glob(os.path.join(files_dir, "success", "*.yaml")) + glob.glob(os.path.join(files_dir, "fail", "*.yaml"))):
+        with open(f, "r") as stream:
+            for document in new_yml().load_all(stream):
+                if "schema" in document and "data" in document:
+                    yield document
+
+
+def _dump(data):
+    stream = StringIO()
+    new_yml().dump(data, stream)
+    return stream.getvalue()
+
+
+class TestStreaming(object):
+
+    def setup_method(self):
+        self.schema = CompiledSchema(schema_data={
+            "type": "seq",
+            "sequence": [{
+                "type": "map",
+                "mapping": {
+                    "id": {"type": "int", "required": True},
+                    "name": {"type": "str", "pattern": "^[a-z]+$"},
+                    "tags": {"type": "seq", "sequence": [{"type": "str"}], "range": {"max": 2}},
+                },
+            }],
+        })
+
+    def test_same_errors_as_tree_validation(self):
+        """
+        Validating a document while it is parsed must find the same errors as the tree validation
+        """
+        compared = 0
+
+        for document in _documents():
+            try:
+                schema = CompiledSchema(schema_data=document["schema"])
+                expected = sorted(unicode(e) for e in schema.iter_errors(copy.deepcopy(document["data"])))
+            except PyKwalifyException:
+                continue
+
+            found = sorted(unicode(e) for e in schema.iter_stream_errors(StringIO(_dump(document["data"]))))
+            assert found == expected, document["name"]
+            compared += 1
+
+        assert compared > 100
+
+    def test_errors(self):
+        data = u"\n".join([
+            u"- id: 1",
+            u"  name: foo",
+            u"  tags: [a, b, c]",
+            u"- id: foo",
+            u"  name: Bar",
+            u"  other: 1",
+            u"- name: baz",
+            u"",
+        ])
+
+        errors = [unicode(e) for e in self.schema.iter_stream_errors(StringIO(data))]
+
+        # Same errors in the same order as the validation of the loaded document
+        assert errors == [unicode(e) for e in self.schema.iter_errors(new_yml().load(data))]
+        assert errors == [
+            u"Type 'seq' has size of '3', greater than max limit '2'. Path: '/0/tags'",
+            u"Value 'foo' is not of type 'int'. Path: '/1/id'",
+            u"Value 'Bar' does not match pattern '^[a-z]+$'. Path: '/1/name'",
+            u"Key 'other' was not defined. Path: '/1'",
+            u"Cannot find required key 'id'. Path: '/2'",
+        ]
+
+    def test_fail_fast(self):
+        # The parser is stopped at the first error so the broken yaml at the end is never parsed
+        data = u"- id: 1\n- id: foo\n- id: 3\n- [unclosed\n"
+
+        errors = [unicode(e) for e in self.schema.iter_stream_errors(StringIO(data), fail_fast=True)]
+
+        assert errors == [u"Value 'foo' is not of type 'int'. Path: '/1/id'"]
+
+    def test_max_errors(self):
+        data = u"- id: a\n- id: 2\n- id: b\n- id: c\n- [unclosed\n"
+
+        errors = [unicode(e) for e in self.schema.iter_stream_errors(StringIO(data), max_errors=2)]
+
+        assert errors == [
+            u"Value 'a' is not of type 'int'. Path: '/0/id'",
+            u"Value 'b' is not of type 'int'. Path: '/2/id'",
+        ]
+
+    def test_fail_fast_ignores_matching_any_errors(self):
+        schema = CompiledSchema(schema_data={
+            "type": "map",
+            "mapping": {
+                "items": {"type": "seq", "matching": "*", "sequence": [{"type": "int"}]},
+                "id": {"type": "int"},
+            },
+        })
+
+        errors = [unicode(e) for e in schema.iter_stream_errors(StringIO(u"items: [a, 1]\nid: b\n"), fail_fast=True)]
+
+        assert errors == [u"Value 'b' is not of type 'int'. Path: '/id'"]
+
+    def test_anchors_and_merge(self):
+        data = u"\n".join([
+            u"- &base",
+            u"  id: 1",
+            u"  name: foo",
+            u"- <<: *base",
+            u"  name: Bar",
+            u"- *base",
+            u"- <<: *base",
+            u"  extra: 1",
+            u"",
+        ])
+
+        errors = sorted(unicode(e) for e in self.schema.iter_stream_errors(StringIO(data)))
+
+        assert errors == [
+            u"Key 'extra' was not defined. Path: '/3'",
+            u"Value 'Bar' does not match pattern '^[a-z]+$'. Path: '/1/name'",
+        ]
+
+    def test_skipped_anchor_can_be_used_later(self):
+        schema = CompiledSchema(schema_data={
+            "type": "map",
+            "allowempty": True,
+            "mapping": {"id": {"type": "int"}},
+        })
+
+        errors = list(schema.iter_stream_errors(StringIO(u"other: &a 1\nid: *a\n")))
+
+        assert errors == []
+
+    def test_single_document(self):
+        with pytest.raises(CoreError) as ex:
+            list(self.schema.iter_stream_errors(StringIO(u"--- []\n--- []\n")))
+        assert u"Expected a single document in the stream" in str(ex.value)
+
+        with pytest.raises(CoreError) as ex:
+            list(self.schema.iter_stream_errors(StringIO(u"")))
+        assert u"No data loaded from stream" in str(ex.value)
+
+    def test_validator_is_reusable(self):
+        validator = StreamValidator(self.schema)
+
+        assert len(validator.validate(StringIO(u"- id: a\n"))) == 1
+        assert validator.validate(StringIO(u"- id: 1\n")) == []